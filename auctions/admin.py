@@ -1,12 +1,153 @@
 from django.contrib import admin
+from django.contrib.auth.admin import UserAdmin
+from django.db.models import Q
 
-from .models import Bid, Category, Contact, Comment, Listing, User, Watchlist
+from .bidding import end_listings, refresh_bid_stats
+from .cards import bump_card_versions
+from .models import Bid, Category, Contact, Comment, Listing, User, Watchlist, new_version
 
-# Register your models here.
-admin.site.register(Bid)
-admin.site.register(Category)
-admin.site.register(Contact)
-admin.site.register(Comment)
-admin.site.register(Listing)
-admin.site.register(User)
-admin.site.register(Watchlist)
+
+# Every changelist joins objects used by __str__ and list_display,
+# so rendering a page costs the same number of queries for any number of rows.
+
+# Upper bound of strings starting with searched prefix.
+PREFIX_END = chr(0x10FFFF)
+
+
+class IndexedSearchMixin:
+    '''
+    Admin search answered from B-tree indexes of searched columns.
+    Django's default search uses LIKE and iexact, which are case-insensitive
+    on SQLite and scan whole table (SQLite uses index for them only when
+    column is indexed with NOCASE collation, which Django 3.1 cannot declare).
+    On tables of our size that makes changelist search unusable, so here
+    the whole search term is matched case-sensitively: '=field' as exact
+    value, '^field' as prefix (range of values), e.g. 'Book' finds
+    'Book 1', 'book' doesn't. Fields of related model are searched
+    in subquery, so its index is used as well.
+    '''
+    def get_search_results(self, request, queryset, search_term):
+        search_term = search_term.strip()
+        if not search_term:
+            return queryset, False
+
+        query = Q()
+        for field in self.get_search_fields(request):
+            query |= self.search_lookup(field, search_term)
+        return queryset.filter(query), False
+
+    def search_lookup(self, field, search_term):
+        kind, name = field[0], field[1:]
+        relation, _, column = name.partition('__')
+        if not column:
+            relation, column = None, relation
+
+        if kind == '=':
+            lookups = {column: search_term}
+        elif kind == '^':
+            lookups = {f'{column}__gte': search_term, f'{column}__lt': search_term + PREFIX_END}
+        else:
+            raise ValueError(f"Search field {field!r} has to start with '=' or '^'.")
+
+        if relation is None:
+            return Q(**lookups)
+        related_model = self.model._meta.get_field(relation).related_model
+        return Q(**{f'{relation}__in': related_model.objects.filter(**lookups).values('pk')})
+
+
+@admin.register(Bid)
+class BidAdmin(IndexedSearchMixin, admin.ModelAdmin):
+    list_display = ('id', 'listing', 'user', 'value')
+    list_select_related = ('listing__user', 'user')
+    search_fields = ('^listing__title', '=user__username')
+    raw_id_fields = ('listing', 'user')
+    show_full_result_count = False
+
+    # Bids changed here bypass place_bid, so statistics of their listings are recomputed.
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        listing_ids = {obj.listing_id, form.initial.get('listing')} - {None}
+        refresh_bid_stats(Listing.objects.filter(id__in=listing_ids))
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        refresh_bid_stats(Listing.objects.filter(id=obj.listing_id))
+
+    def delete_queryset(self, request, queryset):
+        listing_ids = set(queryset.values_list('listing_id', flat=True))
+        super().delete_queryset(request, queryset)
+        refresh_bid_stats(Listing.objects.filter(id__in=listing_ids))
+
+
+@admin.register(Category)
+class CategoryAdmin(IndexedSearchMixin, admin.ModelAdmin):
+    list_display = ('id', 'name')
+    search_fields = ('^name',)
+
+
+@admin.register(Contact)
+class ContactAdmin(IndexedSearchMixin, admin.ModelAdmin):
+    list_display = ('id', 'user', 'city', 'country')
+    list_select_related = ('user',)
+    search_fields = ('=user__username', '^city')
+    raw_id_fields = ('user',)
+    show_full_result_count = False
+
+
+@admin.register(Comment)
+class CommentAdmin(IndexedSearchMixin, admin.ModelAdmin):
+    list_display = ('id', 'listing', 'author', 'date_added', 'content')
+    list_select_related = ('listing__user', 'author')
+    search_fields = ('^listing__title', '=author__username')
+    raw_id_fields = ('listing', 'author')
+    date_hierarchy = 'date_added'
+    show_full_result_count = False
+    actions = ['clear_reply']
+
+    def clear_reply(self, request, queryset):
+        updated = queryset.update(reply=None)
+        self.message_user(request, f"Cleared reply of {updated} comment(s).")
+    clear_reply.short_description = "Clear seller reply of selected comments"
+
+
+@admin.register(Listing)
+class ListingAdmin(IndexedSearchMixin, admin.ModelAdmin):
+    list_display = ('id', 'title', 'user', 'category', 'current_price', 'active', 'date_added')
+    list_select_related = ('user', 'category')
+    list_filter = ('active', 'category')
+    search_fields = ('^title', '=user__username')
+    raw_id_fields = ('user',)
+    date_hierarchy = 'date_added'
+    show_full_result_count = False
+    actions = ['activate', 'deactivate', 'end']
+
+    def activate(self, request, queryset):
+        listing_ids = list(queryset.values_list('id', flat=True))
+        updated = Listing.objects.filter(id__in=listing_ids).update(active=True, version=new_version())
+        bump_card_versions(listing_ids)
+        self.message_user(request, f"Activated {updated} listing(s).")
+    activate.short_description = "Activate selected listings"
+
+    def deactivate(self, request, queryset):
+        listing_ids = list(queryset.values_list('id', flat=True))
+        updated = Listing.objects.filter(id__in=listing_ids).update(active=False, version=new_version())
+        bump_card_versions(listing_ids)
+        self.message_user(request, f"Deactivated {updated} listing(s).")
+    deactivate.short_description = "Deactivate selected listings"
+
+    def end(self, request, queryset):
+        ended = end_listings(queryset)
+        self.message_user(request, f"Ended {ended} listing(s).")
+    end.short_description = "End selected auctions (top bidder wins)"
+
+
+@admin.register(Watchlist)
+class WatchlistAdmin(IndexedSearchMixin, admin.ModelAdmin):
+    list_display = ('id', 'user', 'listing')
+    list_select_related = ('user', 'listing__user')
+    search_fields = ('=user__username', '^listing__title')
+    raw_id_fields = ('user', 'listing')
+    show_full_result_count = False
+
+
+admin.site.register(User, UserAdmin)
@@ -0,0 +1,265 @@
+'''
+Read-only JSON API (version 1) for listing feed, listing detail,
+bid history and categories.
+
+Responses carry strong ETags derived from database state, so every worker
+process computes the same ETag for the same data, and they are computed
+before rows are loaded, so request with matching If-None-Match gets 304
+without loading or serializing them. Listings are labelled with their
+version (replaced by every write of listing, see Listing.version)
+and names of joined category and seller, when requested. Bid history
+is labelled with listing's bid state (bid count, top bid, last bid time,
+status and winner), categories with content of category registry.
+
+Clients may limit serialized fields with ?fields=id,title,...
+Prices are JSON numbers with up to 2 decimal places.
+Lists are paginated with opaque ?cursor= tokens returned as "next".
+'''
+import hashlib
+
+from django.conf import settings
+from django.http import JsonResponse
+from django.utils.cache import get_conditional_response
+from django.views.decorators.http import require_safe
+
+from .bidding import top_bids
+from .browsing import SORTS, ListingFilters, parse_price
+from .categories import get_registry
+from .images import get_widths
+from .models import Listing, PriceField
+from .pagination import keyset_paginate
+
+
+API_VERSION = 'v1'
+
+# Serialized field: (columns loaded for it, function returning its value).
+LISTING_FIELDS = {
+    'id': (('id',), lambda listing: listing.id),
+    'title': (('title',), lambda listing: listing.title),
+    'description': (('description',), lambda listing: listing.description),
+    'starting_price': (('starting_price',), lambda listing: float(listing.starting_price)),
+    'current_price': (('current_price',), lambda listing: float(listing.current_price)),
+    'category_id': (('category_id',), lambda listing: listing.category_id),
+    'category': (('category__name',), lambda listing: listing.category.name),
+    'seller': (('user__username',), lambda listing: listing.user.username),
+    'active': (('active',), lambda listing: listing.active),
+    'date_added': (('date_added',), lambda listing: listing.date_added),
+    'photo': (('photo',), lambda listing: listing.photo.url),
+    'photo_widths': (('photo_widths',), get_widths),
+}
+
+BID_FIELDS = {
+    'id': (('id',), lambda bid: bid.id),
+    'value': (('value',), lambda bid: float(bid.value)),
+    'bidder': (('user__username',), lambda bid: bid.user.username),
+}
+
+CATEGORY_FIELDS = {
+    'id': (('id',), lambda category: category.id),
+    'name': (('name',), lambda category: category.name),
+}
+
+
+class FieldError(ValueError):
+    pass
+
+
+def get_fields(request, available):
+    '''
+    Returns list of fields requested with ?fields= (all fields by default).
+    '''
+    requested = request.GET.get('fields')
+    if not requested:
+        return list(available)
+
+    fields = [field.strip() for field in requested.split(',') if field.strip()]
+    unknown = [field for field in fields if field not in available]
+    if unknown or not fields:
+        raise FieldError(f"Unknown fields: {', '.join(unknown)}. Available fields: {', '.join(available)}.")
+    return fields
+
+
+def load_fields(queryset, fields, available, extra=()):
+    '''
+    Limits queryset to columns (and joins) needed by fields and extra columns.
+    '''
+    columns = [column for field in fields for column in available[field][0]] + list(extra)
+    related = {column.split('__')[0] for column in columns if '__' in column}
+    if related:
+        queryset = queryset.select_related(*related)
+    return queryset.only(*columns)
+
+
+def serialize(obj, fields, available):
+    return {field: available[field][1](obj) for field in fields}
+
+
+def make_etag(*parts):
+    digest = hashlib.sha256(':'.join(str(part) for part in (API_VERSION,) + parts).encode()).hexdigest()
+    return f'"{digest[:32]}"'
+
+
+def listing_state_fields(fields):
+    '''
+    Returns fields whose columns, with listing's version, make up ETag of listing:
+    id and names of joined rows, which change without writing listing.
+    '''
+    return ['id'] + [field for field in ('category', 'seller') if field in fields]
+
+
+def listing_etag(listing, fields):
+    state = serialize(listing, listing_state_fields(fields), LISTING_FIELDS)
+    return make_etag('listing', ','.join(fields), listing.version, *state.values())
+
+
+def api_response(data, etag=None, status=200):
+    response = JsonResponse(data, status=status, json_dumps_params={'separators': (',', ':')})
+    if etag:
+        response['ETag'] = etag
+        # Clients and proxies may keep response, but have to revalidate it.
+        response['Cache-Control'] = 'public, no-cache'
+    return response
+
+
+def error_response(message, status):
+    return api_response({'error': message}, status=status)
+
+
+def not_modified(request, etag):
+    '''
+    Returns 304 response when client's copy has given ETag, otherwise None.
+    '''
+    response = get_conditional_response(request, etag=etag)
+    if response is not None:
+        response['Cache-Control'] = 'public, no-cache'
+    return response
+
+
+@require_safe
+def listings(request):
+    '''
+    Returns page of active listings, newest first, optionally limited
+    to category (?category=<id>) and price range (?min_price=, ?max_price=)
+    and sorted by price (?sort=price or ?sort=price_desc).
+    '''
+    try:
+        fields = get_fields(request, LISTING_FIELDS)
+    except FieldError as error:
+        return error_response(str(error), 400)
+
+    category_id = request.GET.get('category')
+    if category_id and not category_id.isdigit():
+        return error_response("Category has to be a number.", 400)
+    for name in ('min_price', 'max_price'):
+        if request.GET.get(name) and parse_price(request.GET[name]) is None:
+            return error_response(f"{name} has to be a non-negative number with at most 2 decimal places, up to {PriceField.MAX_VALUE}.", 400)
+    if request.GET.get('sort') and request.GET['sort'] not in SORTS:
+        return error_response(f"Unknown sort. Available sorts: {', '.join(SORTS)}.", 400)
+    filters = ListingFilters.from_query(request.GET)
+
+    # Page is read from state columns first (ordering columns are loaded
+    # for cursor of the next page), rows are loaded only when ETag doesn't match.
+    keys = filters.paginate(
+        load_fields(
+            Listing.objects.filter(active=True), listing_state_fields(fields), LISTING_FIELDS,
+            extra=['version'] + [field.lstrip('-') for field in filters.ordering]
+        ),
+        request.GET.get('cursor')
+    )
+    etag = make_etag('listings', keys.next_cursor or '', *(listing_etag(listing, fields) for listing in keys))
+
+    response = not_modified(request, etag)
+    if response is not None:
+        return response
+
+    listings = load_fields(Listing.objects.filter(id__in=[listing.id for listing in keys]), fields, LISTING_FIELDS)
+    by_id = {listing.id: listing for listing in listings}
+    return api_response({
+        # Listing deleted after its key was read is left out.
+        'results': [serialize(by_id[listing.id], fields, LISTING_FIELDS) for listing in keys if listing.id in by_id],
+        'next': keys.next_cursor,
+    }, etag)
+
+
+@require_safe
+def listing_detail(request, id):
+    '''
+    Returns single listing.
+    '''
+    try:
+        fields = get_fields(request, LISTING_FIELDS)
+    except FieldError as error:
+        return error_response(str(error), 400)
+
+    state = load_fields(
+        Listing.objects.filter(id=id), listing_state_fields(fields), LISTING_FIELDS, extra=['version']
+    ).first()
+    if state is None:
+        return error_response("Listing not found.", 404)
+    etag = listing_etag(state, fields)
+
+    response = not_modified(request, etag)
+    if response is not None:
+        return response
+
+    listing = load_fields(Listing.objects.filter(id=id), fields, LISTING_FIELDS).first()
+    if listing is None:
+        return error_response("Listing not found.", 404)
+    return api_response(serialize(listing, fields, LISTING_FIELDS), etag)
+
+
+@require_safe
+def listing_bids(request, id):
+    '''
+    Returns page of listing's bids, from winning one.
+    '''
+    try:
+        fields = get_fields(request, BID_FIELDS)
+    except FieldError as error:
+        return error_response(str(error), 400)
+
+    # Bid state changes with every placed bid (see auctions/bidding.py)
+    # and with bids edited in admin (refresh_bid_stats).
+    state = (
+        Listing.objects.filter(id=id)
+        .values_list('bid_count', 'top_bid_id', 'last_bid_at', 'active', 'winner').first()
+    )
+    if state is None:
+        return error_response("Listing not found.", 404)
+
+    cursor = request.GET.get('cursor')
+    etag = make_etag('bids', id, ','.join(fields), *state, cursor or '')
+
+    response = not_modified(request, etag)
+    if response is not None:
+        return response
+
+    # Ordering columns are loaded for cursor of the next page.
+    bids = load_fields(top_bids(id), fields, BID_FIELDS, extra=('value',))
+    page = keyset_paginate(bids, cursor, ordering=('-value', 'id'), per_page=settings.API_PER_PAGE)
+
+    return api_response({
+        'results': [serialize(bid, fields, BID_FIELDS) for bid in page],
+        'next': page.next_cursor,
+    }, etag)
+
+
+@require_safe
+def categories(request):
+    '''
+    Returns all categories ordered by name.
+    '''
+    try:
+        fields = get_fields(request, CATEGORY_FIELDS)
+    except FieldError as error:
+        return error_response(str(error), 400)
+
+    registry = get_registry()
+    etag = make_etag('categories', ','.join(fields), registry.digest)
+
+    response = not_modified(request, etag)
+    if response is not None:
+        return response
+    return api_response({
+        'results': [serialize(category, fields, CATEGORY_FIELDS) for category in registry.categories],
+    }, etag)
@@ -3,3 +3,16 @@ from django.apps import AppConfig
 
 class AuctionsConfig(AppConfig):
     name = 'auctions'
+
+    def ready(self):
+        # Connects signal receivers.
+        from . import signals
+
+        from django.db.backends.signals import connection_created
+        from .sqlite import apply_pragmas
+        connection_created.connect(apply_pragmas)
+
+        # Installed on every connection, also ones opened before the first
+        # request or in other threads, so timing middleware counts all queries.
+        from .timing import install_query_wrapper
+        connection_created.connect(install_query_wrapper)
@@ -0,0 +1,158 @@
+'''
+Async versions of read-heavy views, served instead of sync ones
+when site runs under ASGI (see ASYNC_READ_VIEWS in settings).
+
+Django 3.1 has no async ORM, so queries still run in threads,
+but independent ones (e.g. listing, its comments and watchlist entry)
+run concurrently, each in its own thread with own database connection,
+instead of one after another in single thread.
+Templates are rendered in request's thread, because they read lazy
+user and session.
+'''
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.views import redirect_to_login
+from django.db import close_old_connections
+from django.http import Http404
+from django.shortcuts import redirect, render
+
+from .browsing import ListingFilters
+from .categories import get_categories, get_category, get_listing_counts
+from .views import (
+    get_category_page, get_comments_page, get_feed_page,
+    get_listing, get_watchlist_entry, get_watchlist_page
+)
+
+
+async def run_query(func, *args, **kwargs):
+    '''
+    Runs query function in thread of its own,
+    so it doesn't wait for queries of other coroutines.
+    '''
+    def call():
+        try:
+            return func(*args, **kwargs)
+        finally:
+            close_old_connections()
+    return await sync_to_async(call, thread_sensitive=False)()
+
+
+async def get_user(request):
+    '''
+    Returns logged user, loading it (and session) in request's thread.
+    '''
+    def load():
+        user = request.user
+        user.is_authenticated
+        return user
+    return await sync_to_async(load)()
+
+
+async def render_async(request, template_name, context):
+    return await sync_to_async(render)(request, template_name, context)
+
+
+async def index(request):
+    '''
+    Renders page with all active listings, optionally filtered by category
+    and price range and sorted by price.
+    '''
+    filters = ListingFilters.from_query(request.GET)
+    listings, categories = await asyncio.gather(
+        run_query(get_feed_page, request.GET.get('cursor'), filters),
+        run_query(get_categories)
+    )
+
+    return await render_async(request, "auctions/browse_listings.html", {
+        "listings": listings,
+        "header_title": "All listings",
+        "logged_user_id": "No winner",
+        "filters": filters,
+        "categories": categories,
+        "query_string": filters.query_string(category=True)
+    })
+
+
+async def categories_view(request):
+    '''
+    Renders page with all avaiable categories.
+    '''
+    categories, counts = await asyncio.gather(run_query(get_categories), run_query(get_listing_counts))
+    categories = [(category, counts.get(category.id, 0)) for category in categories]
+
+    return await render_async(request, "auctions/categories.html", {
+        "categories": categories
+    })
+
+
+async def single_listing_view(request, id):
+    '''
+    Renders page for single listing.
+    Watchlist entry, listing and comments are fetched concurrently.
+    '''
+    logged_user = await get_user(request)
+
+    watchlist, listing, comments = await asyncio.gather(
+        run_query(get_watchlist_entry, logged_user.id, id),
+        run_query(get_listing, id),
+        run_query(get_comments_page, id, request.GET.get('cursor'))
+    )
+
+    return await render_async(request, "auctions/listing_single_view.html", {
+        "logged_user_id": logged_user.id,
+        "listing": listing,
+        "comments": comments,
+        "watchlist": watchlist
+    })
+
+
+async def browse_listings_category(request):
+    '''
+    Renders page with all active listings matching selected category.
+    Category and its listings are fetched concurrently.
+    '''
+    # Category comes from form on first page and from query string on next pages.
+    category_id = request.POST.get('category_id') or request.GET.get('category_id')
+
+    if category_id:
+        # Invalid id is unknown category, as in get_category.
+        try:
+            category_id = int(category_id)
+        except ValueError:
+            raise Http404("Category does not exist.")
+
+        filters = ListingFilters.from_query(request.GET, category_id=category_id)
+        category, listings = await asyncio.gather(
+            run_query(get_category, category_id),
+            run_query(get_category_page, category_id, request.GET.get('cursor'), filters)
+        )
+        if category is None:
+            raise Http404("Category does not exist.")
+
+        return await render_async(request, "auctions/browse_listings_category.html", {
+            "listings": listings,
+            "category": category,
+            "filters": filters,
+            "query_string": filters.query_string()
+        })
+
+    else:
+        return redirect('categories_view')
+
+
+async def watchlist_view(request):
+    '''
+    Allows logged user to view listings added to watchlist.
+    '''
+    logged_user = await get_user(request)
+    if not logged_user.is_authenticated:
+        return redirect_to_login(request.get_full_path())
+
+    watchlist = await run_query(get_watchlist_page, logged_user.id, request.GET.get('cursor'))
+
+    return await render_async(request, "auctions/browse_listings.html", {
+        "listings": watchlist,
+        "header_title": "My watchlist",
+        "logged_user_id": str(logged_user.id)
+    })
@@ -0,0 +1,15 @@
+'''
+SQLite backend starting transactions with BEGIN IMMEDIATE.
+
+Deferred transaction (plain BEGIN) takes write lock only at its first write.
+When another connection writes in between, the upgrade fails with
+"database is locked" at once, busy timeout doesn't help. IMMEDIATE transaction
+takes write lock up front, so concurrent writers wait in busy timeout
+for their turn instead. Readers are not blocked in WAL mode.
+'''
+from django.db.backends.sqlite3 import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def _start_transaction_under_autocommit(self):
+        self.cursor().execute('BEGIN IMMEDIATE')
@@ -0,0 +1,70 @@
+'''
+Helpers shared by benchmark management commands.
+'''
+import os
+import tempfile
+import time
+from contextlib import contextmanager
+
+from django.db import connections
+
+
+@contextmanager
+def isolated_database(alias='default'):
+    '''
+    Creates throwaway copy of database schema for benchmark run
+    and destroys it afterwards, so benchmarks never touch real data.
+    SQLite database is created as a file (not in memory),
+    so that concurrent connections lock it like in production.
+    '''
+    connection = connections[alias]
+    path = None
+    if connection.vendor == 'sqlite':
+        handle, path = tempfile.mkstemp(prefix='auctions-bench-', suffix='.sqlite3')
+        os.close(handle)
+        connection.settings_dict['TEST']['NAME'] = path
+
+    old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+    try:
+        yield connection
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        if path and os.path.exists(path):
+            os.remove(path)
+
+
+def percentile(sorted_values, fraction):
+    '''
+    Returns nearest-rank percentile of already sorted values.
+    '''
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, int(round(fraction * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+def summarize(latencies):
+    '''
+    Returns count and p50/p95/p99/max of latencies (in seconds) as milliseconds.
+    '''
+    values = sorted(latencies)
+    return {
+        'count': len(values),
+        'p50_ms': round(percentile(values, 0.50) * 1000, 3),
+        'p95_ms': round(percentile(values, 0.95) * 1000, 3),
+        'p99_ms': round(percentile(values, 0.99) * 1000, 3),
+        'max_ms': round(values[-1] * 1000, 3) if values else 0.0,
+    }
+
+
+class Timer:
+    '''
+    Context manager measuring elapsed wall time in seconds.
+    '''
+    def __enter__(self):
+        self.start = time.perf_counter()
+        self.elapsed = 0.0
+        return self
+
+    def __exit__(self, *exc_info):
+        self.elapsed = time.perf_counter() - self.start
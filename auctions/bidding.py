@@ -0,0 +1,191 @@
+from django.db import connection, models, transaction
+from django.db.models import Count, F, Max, OuterRef, Subquery
+from django.db.models.functions import Cast
+from django.utils import timezone
+
+from . import live
+from .cards import bump_card_version, bump_card_versions
+from .models import Bid, Listing, new_version
+
+
+# Number of listings ended with single UPDATE statement.
+END_BATCH_SIZE = 500
+
+# Number of listings whose bid statistics are recomputed in single transaction.
+REFRESH_BATCH_SIZE = 2000
+
+
+class BidResult:
+    '''
+    Outcome of bid placement.
+    Contains status, created bid (only when accepted)
+    and listing's current price after placement attempt.
+    '''
+    ACCEPTED = 'accepted'
+    OUTBID = 'outbid'
+    CLOSED = 'closed'
+    OWN_LISTING = 'own_listing'
+    NOT_FOUND = 'not_found'
+
+    def __init__(self, status, bid=None, current_price=None):
+        self.status = status
+        self.bid = bid
+        self.current_price = current_price
+
+    @property
+    def accepted(self):
+        return self.status == self.ACCEPTED
+
+    def __repr__(self):
+        return f"<BidResult {self.status} current_price={self.current_price}>"
+
+
+def place_bid(user_id, listing_id, value):
+    '''
+    Places bid of given value on listing.
+    Price is raised with single conditional UPDATE, which succeeds only
+    if value is higher than current price, and bid row is inserted
+    in the same transaction. Concurrent bids cannot overwrite each other,
+    because database serializes UPDATEs on listing row.
+    Listing's bid count, last bid time and top bid are updated in the same
+    transaction (accepted bid always becomes the top one).
+    '''
+    # Exact price in cents, also when value comes as float.
+    value = Bid._meta.get_field('value').to_python(value)
+    with transaction.atomic():
+        updated = (
+            Listing.objects
+            .filter(id=listing_id, active=True, current_price__lt=value)
+            .exclude(user_id=user_id)
+            .update(
+                current_price=value, bid_count=F('bid_count') + 1, last_bid_at=timezone.now(),
+                version=new_version()
+            )
+        )
+
+        if updated:
+            bid = Bid.objects.create(value=value, user_id=user_id, listing_id=listing_id)
+            Listing.objects.filter(id=listing_id).update(top_bid_id=bid.id)
+            transaction.on_commit(lambda: bump_card_version(listing_id))
+            transaction.on_commit(lambda: live.publish_listing(listing_id, live.BID))
+            return BidResult(BidResult.ACCEPTED, bid=bid, current_price=value)
+
+    # Bid was refused, checks why.
+    listing = Listing.objects.filter(id=listing_id).values('user_id', 'active', 'current_price').first()
+    if listing is None:
+        return BidResult(BidResult.NOT_FOUND)
+
+    if listing['user_id'] == user_id:
+        status = BidResult.OWN_LISTING
+    elif not listing['active']:
+        status = BidResult.CLOSED
+    else:
+        status = BidResult.OUTBID
+
+    return BidResult(status, current_price=listing['current_price'])
+
+
+def top_bids(listing_ref):
+    '''
+    Returns bids of listing ordered from winning one.
+    Highest value wins, on tie the earliest bid (lowest id) wins.
+    Ordering matches bid_listing_top_idx, so first row is read from index.
+    '''
+    return Bid.objects.filter(listing=listing_ref).order_by('-value', 'id')
+
+
+def top_bid(listing_id):
+    '''
+    Returns winning bid (with its user) of listing or None if there are no bids.
+    '''
+    return top_bids(listing_id).select_related('user').first()
+
+
+def end_listings(queryset):
+    '''
+    Ends every active listing from queryset which has no winner yet,
+    with one UPDATE statement per batch. Winner is set to user of top bid
+    (or stays empty if there were no bids) and listing is deactivated.
+    Bids placed concurrently are refused, because bid placement
+    requires active listing and database serializes both UPDATEs.
+    Only listings actually ended get their cards bumped and closing published.
+    Returns number of ended listings.
+    '''
+    winner = top_bids(OuterRef('pk')).values('user_id')[:1]
+
+    with transaction.atomic():
+        # UPDATEs end exactly the selected listings: rows are locked where database
+        # supports it, SQLite fails the UPDATE rather than write over newer data.
+        listing_ids = list(
+            queryset.filter(active=True, winner__isnull=True)
+            .select_for_update().values_list('id', flat=True)
+        )
+        for start in range(0, len(listing_ids), END_BATCH_SIZE):
+            batch = listing_ids[start:start + END_BATCH_SIZE]
+            Listing.objects.filter(id__in=batch).update(
+                winner=Cast(Subquery(winner), output_field=models.CharField()),
+                active=False,
+                version=new_version()
+            )
+        if listing_ids:
+            transaction.on_commit(lambda: bump_card_versions(listing_ids))
+            transaction.on_commit(lambda: live.publish_listings(listing_ids, live.CLOSED))
+
+    return len(listing_ids)
+
+
+def bid_stats(listing_ids):
+    '''
+    Returns {listing_id: (bid count, top bid id)} of listings which have bids.
+    Bids are aggregated once (count and top value per listing), then the earliest
+    bid with top value of each listing is joined back from bid_listing_top_idx.
+    '''
+    stats = (
+        Bid.objects.filter(listing_id__in=listing_ids).order_by()
+        .values('listing').annotate(bid_count=Count('id'), top_value=Max('value'))
+    )
+    stats_sql, params = stats.query.sql_with_params()
+    sql = f"""
+        SELECT stats.listing_id, stats.bid_count, MIN(b.id)
+        FROM ({stats_sql}) stats
+        JOIN auctions_bid b ON b.listing_id = stats.listing_id AND b.value = stats.top_value
+        GROUP BY stats.listing_id, stats.bid_count
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return {listing_id: (bid_count, top_bid_id) for listing_id, bid_count, top_bid_id in cursor.fetchall()}
+
+
+def refresh_bid_stats(queryset):
+    '''
+    Recomputes bid count and top bid of every listing from queryset
+    from its bids, batch by batch, each in its own transaction.
+    Bids of batch are aggregated with one grouped query and results
+    are written with bulk UPDATEs. Listings without bids are reset with single UPDATE.
+    Bids don't store when they were placed, so last bid time is kept,
+    unless listing has no bids any more.
+    Returns number of updated listings.
+    '''
+    listing_ids = list(queryset.values_list('id', flat=True))
+
+    updated = 0
+    for start in range(0, len(listing_ids), REFRESH_BATCH_SIZE):
+        batch = listing_ids[start:start + REFRESH_BATCH_SIZE]
+        with transaction.atomic():
+            stats = bid_stats(batch)
+            version = new_version()
+            updated += Listing.objects.filter(id__in=batch).exclude(id__in=list(stats)).update(
+                bid_count=0, top_bid=None, last_bid_at=None, version=version
+            )
+            Listing.objects.bulk_update(
+                [
+                    Listing(id=listing_id, bid_count=bid_count, top_bid_id=top_bid_id, version=version)
+                    for listing_id, (bid_count, top_bid_id) in stats.items()
+                ],
+                ['bid_count', 'top_bid', 'version']
+            )
+            # Bids reference their listing, so every listing with bids exists.
+            updated += len(stats)
+            transaction.on_commit(lambda batch=batch: bump_card_versions(batch))
+
+    return updated
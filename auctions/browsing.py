@@ -0,0 +1,101 @@
+'''
+Filters and orderings of listing browse pages (feed, category page and API).
+
+Browse pages show active listings only, optionally of one category,
+so every ordering has partial index on active listings behind it
+and each page is one indexed range query with keyset pagination:
+- newest: listing_active_date_idx, per category listing_category_date_idx,
+- price (either direction): listing_active_price_idx, per category
+  listing_category_price_idx, price range is range of the same index.
+'''
+from decimal import ROUND_HALF_UP, Decimal, InvalidOperation
+
+from django.utils.http import urlencode
+
+from .models import PriceField
+from .pagination import keyset_paginate
+
+
+SORTS = {
+    'newest': ('-date_added', '-id'),
+    'price': ('current_price', 'id'),
+    'price_desc': ('-current_price', '-id'),
+}
+DEFAULT_SORT = 'newest'
+
+
+def parse_price(value):
+    '''
+    Returns price as Decimal with 2 places or None if value is not valid price:
+    not a number, negative, above PriceField.MAX_VALUE or with fractions of cent.
+    '''
+    try:
+        price = Decimal(str(value).strip())
+    except (InvalidOperation, ValueError):
+        return None
+    if not price.is_finite() or not 0 <= price <= PriceField.MAX_VALUE:
+        return None
+    cents = price.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+    if cents != price:
+        return None
+    return cents
+
+
+class ListingFilters:
+    '''
+    Price range, category and sort of browse page.
+    Read from query string with from_query, invalid values are ignored.
+    '''
+    def __init__(self, category_id=None, min_price=None, max_price=None, sort=DEFAULT_SORT):
+        self.category_id = category_id
+        self.min_price = min_price
+        self.max_price = max_price
+        self.sort = sort
+
+    @classmethod
+    def from_query(cls, query, category_id=None):
+        if category_id is None:
+            category = query.get('category', '')
+            category_id = int(category) if category.isdigit() else None
+        sort = query.get('sort')
+        return cls(
+            category_id=category_id,
+            min_price=parse_price(query['min_price']) if query.get('min_price') else None,
+            max_price=parse_price(query['max_price']) if query.get('max_price') else None,
+            sort=sort if sort in SORTS else DEFAULT_SORT,
+        )
+
+    @property
+    def ordering(self):
+        return SORTS[self.sort]
+
+    def apply(self, queryset):
+        if self.category_id is not None:
+            queryset = queryset.filter(category_id=self.category_id)
+        if self.min_price is not None:
+            queryset = queryset.filter(current_price__gte=self.min_price)
+        if self.max_price is not None:
+            queryset = queryset.filter(current_price__lte=self.max_price)
+        return queryset
+
+    def paginate(self, queryset, cursor, per_page=None):
+        '''
+        Returns KeysetPage of filtered queryset in selected order.
+        '''
+        return keyset_paginate(self.apply(queryset), cursor, ordering=self.ordering, per_page=per_page)
+
+    def query_string(self, category=False):
+        '''
+        Returns query string of filters, carried by next page links.
+        Category is left out unless asked for, category page has it in its own parameter.
+        '''
+        params = {}
+        if category and self.category_id is not None:
+            params['category'] = self.category_id
+        if self.min_price is not None:
+            params['min_price'] = self.min_price
+        if self.max_price is not None:
+            params['max_price'] = self.max_price
+        if self.sort != DEFAULT_SORT:
+            params['sort'] = self.sort
+        return urlencode(params)
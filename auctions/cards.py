@@ -0,0 +1,143 @@
+'''
+Fragment cache of rendered listing cards.
+
+Every listing has version token stored in cache. Card is cached under key
+built from listing id and its version, so bumping version (whenever listing
+changes) makes old card unreachable, and it expires on its own.
+Category names are shown on cards too, so cards also depend on
+one global generation token bumped whenever any category changes.
+
+Versions must be read before listing rows (see load_listings), so card
+can be cached under older version than its data, never the other way round.
+Otherwise bid committed between the two reads would leave card with old
+price cached under new version until it expires.
+'''
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.template.loader import render_to_string
+
+
+CARD_TEMPLATE = 'auctions/listing_card.html'
+GENERATION_KEY = 'listing-card-generation'
+
+
+def get_cache():
+    return caches[settings.LISTING_CARD_CACHE]
+
+
+def version_key(listing_id):
+    return f'listing-card-version:{listing_id}'
+
+
+def card_key(listing_id, version, generation, won, show_category):
+    return f'listing-card:{listing_id}:{version}:{generation}:{int(won)}:{int(show_category)}'
+
+
+def new_version():
+    return uuid.uuid4().hex
+
+
+def bump_card_version(listing_id):
+    '''
+    Invalidates cached card of listing.
+    '''
+    get_cache().set(version_key(listing_id), new_version(), None)
+
+
+def bump_card_versions(listing_ids):
+    '''
+    Invalidates cached cards of many listings with one cache call.
+    '''
+    if listing_ids:
+        get_cache().set_many({version_key(listing_id): new_version() for listing_id in listing_ids}, None)
+
+
+def bump_card_generation():
+    '''
+    Invalidates all cached cards.
+    '''
+    get_cache().set(GENERATION_KEY, new_version(), None)
+
+
+def get_versions(cache, listing_ids):
+    '''
+    Returns version of each listing and generation token.
+    Missing versions get fresh token (never reused one),
+    so cards stored before version was evicted cannot be served again.
+    '''
+    keys = {version_key(listing_id): listing_id for listing_id in listing_ids}
+    found = cache.get_many(list(keys) + [GENERATION_KEY])
+
+    generation = found.pop(GENERATION_KEY, None)
+    missing = {}
+    if generation is None:
+        generation = new_version()
+        missing[GENERATION_KEY] = generation
+
+    versions = {}
+    for key, listing_id in keys.items():
+        if key not in found:
+            found[key] = missing[key] = new_version()
+        versions[listing_id] = found[key]
+
+    if missing:
+        cache.set_many(missing, None)
+    return versions, generation
+
+
+def load_listings(ids, queryset):
+    '''
+    Returns listings of queryset with given ids (in that order)
+    and their card versions, which are read before the rows.
+    '''
+    card_versions = get_versions(get_cache(), ids)
+    rows = queryset.in_bulk(ids)
+    return [rows[listing_id] for listing_id in ids if listing_id in rows], card_versions
+
+
+def render_cards(listings, logged_user_id=None, show_category=True):
+    '''
+    Returns list of rendered cards for listings.
+    Cached cards are fetched with one multi-get,
+    only missing ones are rendered and stored.
+    Page with card_versions (see load_listings) is rendered under them,
+    otherwise versions are read now and only cached cards are safe to use.
+    '''
+    card_versions = getattr(listings, 'card_versions', None)
+    listings = list(listings)
+    if not listings:
+        return []
+
+    cache = get_cache()
+    if card_versions is None:
+        versions, generation = get_versions(cache, [listing.id for listing in listings])
+        store = False
+    else:
+        versions, generation = card_versions
+        store = True
+
+    keys = []
+    for listing in listings:
+        won = logged_user_id is not None and listing.winner == logged_user_id
+        keys.append((card_key(listing.id, versions[listing.id], generation, won, show_category), won))
+
+    cached = cache.get_many([key for key, _ in keys])
+
+    cards = []
+    rendered = {}
+    for listing, (key, won) in zip(listings, keys):
+        card = cached.get(key)
+        if card is None:
+            card = render_to_string(CARD_TEMPLATE, {
+                'listing': listing,
+                'won': won,
+                'show_category': show_category
+            })
+            rendered[key] = card
+        cards.append(card)
+
+    if rendered and store:
+        cache.set_many(rendered, settings.LISTING_CARD_TIMEOUT)
+    return cards
@@ -0,0 +1,172 @@
+'''
+Listing catalog files (CSV or JSON Lines) read by import_listings
+and written by export_listings.
+
+Every row describes one listing with columns listed in COLUMNS.
+Category and seller are referenced by name, so files can be moved
+between databases. Files are read and written row by row,
+so memory use doesn't depend on their size.
+'''
+import csv
+import json
+import sys
+from contextlib import contextmanager
+
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import browsing
+from .models import Listing, PriceField
+
+
+COLUMNS = ('title', 'description', 'starting_price', 'current_price', 'category', 'seller', 'date_added', 'active')
+REQUIRED_COLUMNS = ('title', 'description', 'starting_price', 'category')
+
+FORMATS = ('csv', 'jsonl')
+
+TRUE_VALUES = ('1', 'true', 'yes')
+FALSE_VALUES = ('0', 'false', 'no')
+
+
+class RowError(ValueError):
+    pass
+
+
+def guess_format(path, format=None):
+    '''
+    Returns format given explicitly or guessed from file extension.
+    '''
+    if format:
+        return format
+    for extension in FORMATS:
+        if path.endswith(f'.{extension}'):
+            return extension
+    return 'csv'
+
+
+@contextmanager
+def open_catalog(path, mode):
+    '''
+    Opens catalog file, '-' stands for stdin/stdout.
+    '''
+    if path == '-':
+        yield sys.stdin if mode == 'r' else sys.stdout
+        return
+    with open(path, mode, newline='', encoding='utf-8') as file:
+        yield file
+
+
+def read_rows(file, format):
+    '''
+    Yields (line number, row dict) pairs.
+    Malformed JSON line is yielded as RowError instead of row.
+    '''
+    if format == 'csv':
+        reader = csv.DictReader(file)
+        for row in reader:
+            yield reader.line_num, row
+    else:
+        for line_number, line in enumerate(file, 1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as error:
+                yield line_number, RowError(f"Malformed JSON: {error}.")
+                continue
+            if not isinstance(row, dict):
+                yield line_number, RowError("Row has to be JSON object.")
+                continue
+            yield line_number, row
+
+
+def parse_price(value, name):
+    # Same rules as for prices entered on site. Floats from JSON go through str,
+    # so price keeps its written cents.
+    price = browsing.parse_price(value)
+    if price is None:
+        raise RowError(
+            f"{name} has to be a non-negative number with at most 2 decimal places, up to {PriceField.MAX_VALUE}."
+        )
+    return price
+
+
+def parse_bool(value):
+    if isinstance(value, bool):
+        return value
+    value = str(value).strip().lower()
+    if value in TRUE_VALUES:
+        return True
+    if value in FALSE_VALUES:
+        return False
+    raise RowError(f"Active has to be one of {', '.join(TRUE_VALUES + FALSE_VALUES)}.")
+
+
+def parse_row(row, category_ids, seller_ids, default_seller_id=None):
+    '''
+    Returns unsaved Listing built from row.
+    Category and seller are resolved with given name to id maps.
+    Raises RowError describing the first problem found.
+    '''
+    values = {column: row.get(column) for column in COLUMNS}
+    for column in REQUIRED_COLUMNS:
+        if values[column] in (None, ''):
+            raise RowError(f"Missing {column}.")
+
+    title = str(values['title'])
+    description = str(values['description'])
+    if len(title) > Listing._meta.get_field('title').max_length:
+        raise RowError("Title is too long.")
+    if len(description) > Listing._meta.get_field('description').max_length:
+        raise RowError("Description is too long.")
+
+    starting_price = parse_price(values['starting_price'], "Starting price")
+    current_price = starting_price
+    if values['current_price'] not in (None, ''):
+        current_price = parse_price(values['current_price'], "Current price")
+
+    category_id = category_ids.get(str(values['category']))
+    if category_id is None:
+        raise RowError(f"Unknown category {values['category']!r}.")
+
+    if values['seller'] not in (None, ''):
+        user_id = seller_ids.get(str(values['seller']))
+        if user_id is None:
+            raise RowError(f"Unknown seller {values['seller']!r}.")
+    elif default_seller_id is not None:
+        user_id = default_seller_id
+    else:
+        raise RowError("Missing seller.")
+
+    listing = Listing(
+        title=title, description=description, starting_price=starting_price, current_price=current_price,
+        category_id=category_id, user_id=user_id
+    )
+
+    if values['date_added'] not in (None, ''):
+        try:
+            date_added = parse_datetime(str(values['date_added']))
+        except ValueError:
+            date_added = None
+        if date_added is None:
+            raise RowError("Date added has to be ISO 8601 date and time.")
+        if timezone.is_naive(date_added):
+            date_added = timezone.make_aware(date_added)
+        listing.date_added = date_added
+
+    if values['active'] not in (None, ''):
+        listing.active = parse_bool(values['active'])
+
+    return listing
+
+
+def format_row(values):
+    '''
+    Returns row of exported listing from values ordered as COLUMNS.
+    '''
+    row = dict(zip(COLUMNS, values))
+    row['date_added'] = row['date_added'].isoformat()
+    # Prices are written as decimal strings, exact for every PriceField value.
+    row['starting_price'] = str(row['starting_price'])
+    row['current_price'] = str(row['current_price'])
+    return row
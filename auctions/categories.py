@@ -0,0 +1,113 @@
+'''
+Registry of categories held in process memory.
+
+Categories are read on many pages but almost never change, so all of them
+are loaded with one query and kept until any category is saved or deleted
+(see auctions/signals.py) or CATEGORY_REGISTRY_TIMEOUT seconds pass.
+Every process compares its copy with version token in default cache.
+When that cache is shared (SHARED_CACHE), change made by one process reloads
+registry in all of them. With local-memory cache only the process which made
+the change reloads at once, others within CATEGORY_REGISTRY_TIMEOUT.
+Categories from registry are shared between requests and must not be modified.
+
+Numbers of open listings per category are computed by one grouped query
+and cached for CATEGORY_COUNTS_TIMEOUT seconds (per process with local-memory cache).
+'''
+import hashlib
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count
+
+from .models import Category, Listing
+
+
+VERSION_KEY = 'category-registry-version'
+COUNTS_KEY = 'category-listing-counts'
+
+_lock = threading.Lock()
+_registry = None
+
+
+class Registry:
+    def __init__(self, version, categories):
+        self.version = version
+        self.categories = categories
+        self.by_id = {category.id: category for category in categories}
+        # Identifies content (unlike version, which is per cache), same in every process.
+        self.digest = hashlib.sha256(repr([(category.id, category.name) for category in categories]).encode()).hexdigest()
+        self.loaded = time.monotonic()
+
+    def is_current(self, version):
+        return (
+            version is not None and self.version == version
+            and time.monotonic() - self.loaded < settings.CATEGORY_REGISTRY_TIMEOUT
+        )
+
+
+def get_registry():
+    global _registry
+
+    version = cache.get(VERSION_KEY)
+    registry = _registry
+    if registry is not None and registry.is_current(version):
+        return registry
+
+    with _lock:
+        if _registry is not None and _registry.is_current(version):
+            return _registry
+        if version is None:
+            version = uuid.uuid4().hex
+            cache.set(VERSION_KEY, version, None)
+        _registry = Registry(version, list(Category.objects.order_by('name')))
+        return _registry
+
+
+def get_categories():
+    '''
+    Returns list of all categories ordered by name.
+    '''
+    return list(get_registry().categories)
+
+
+def get_category(category_id):
+    '''
+    Returns category with given id or None.
+    '''
+    try:
+        return get_registry().by_id.get(int(category_id))
+    except (TypeError, ValueError):
+        return None
+
+
+def invalidate_categories():
+    '''
+    Drops registry in this process and, with shared cache, in all of them. Repeated after commit,
+    so registry reloaded before changes were committed is dropped too.
+    '''
+    def invalidate():
+        global _registry
+        _registry = None
+        cache.set(VERSION_KEY, uuid.uuid4().hex, None)
+
+    invalidate()
+    transaction.on_commit(invalidate)
+
+
+def get_listing_counts():
+    '''
+    Returns numbers of open listings (active, without winner) by category id.
+    Counted from listing_open_category_idx, without reading listing rows.
+    '''
+    counts = cache.get(COUNTS_KEY)
+    if counts is None:
+        counts = dict(
+            Listing.objects.filter(active=True, winner__isnull=True)
+            .order_by().values('category').annotate(count=Count('id')).values_list('category', 'count')
+        )
+        cache.set(COUNTS_KEY, counts, settings.CATEGORY_COUNTS_TIMEOUT)
+    return counts
@@ -0,0 +1,46 @@
+'''
+SQL of full-text index over listing's title and description.
+
+It is external content FTS5 table (it stores only index, text stays in
+auctions_listing) kept in sync by triggers. Update trigger fires only when
+title or description changes, so bids (which update current_price) never
+touch the index.
+
+SQLite drops triggers together with their table, so every migration
+that makes Django rebuild auctions_listing has to create them again.
+Migrations carry their own frozen copies of this SQL and must not import
+this module, as its later changes would rewrite already applied history.
+'''
+
+CREATE_TRIGGERS = [
+    """
+    CREATE TRIGGER IF NOT EXISTS auctions_listing_fts_insert AFTER INSERT ON auctions_listing BEGIN
+        INSERT INTO auctions_listing_fts(rowid, title, description)
+        VALUES (new.id, new.title, new.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS auctions_listing_fts_delete AFTER DELETE ON auctions_listing BEGIN
+        INSERT INTO auctions_listing_fts(auctions_listing_fts, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS auctions_listing_fts_update AFTER UPDATE OF title, description ON auctions_listing BEGIN
+        INSERT INTO auctions_listing_fts(auctions_listing_fts, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+        INSERT INTO auctions_listing_fts(rowid, title, description)
+        VALUES (new.id, new.title, new.description);
+    END
+    """,
+]
+
+DROP_TRIGGERS = [
+    "DROP TRIGGER IF EXISTS auctions_listing_fts_insert",
+    "DROP TRIGGER IF EXISTS auctions_listing_fts_delete",
+    "DROP TRIGGER IF EXISTS auctions_listing_fts_update",
+]
+
+# Reindexes all listings from auctions_listing.
+REBUILD = "INSERT INTO auctions_listing_fts(auctions_listing_fts) VALUES ('rebuild')"
+
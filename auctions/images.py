@@ -0,0 +1,134 @@
+'''
+Responsive variants of listing photos.
+
+Every uploaded photo gets resized copies (WebP and JPEG) in few widths,
+generated in background on local process pool. Until they are ready
+templates fall back to original photo.
+'''
+import logging
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import connection
+
+
+logger = logging.getLogger(__name__)
+
+VARIANT_FORMATS = {
+    'webp': 'WEBP',
+    'jpg': 'JPEG',
+}
+
+# Value of photo_widths of processed photo which needed no variants.
+NO_VARIANTS = '0'
+
+_pool = None
+
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=settings.PHOTO_VARIANT_WORKERS)
+    return _pool
+
+
+def variant_name(photo_name, width, extension):
+    '''
+    Returns storage name of photo variant,
+    e.g. listing_images/variants/phone-400w.webp.
+    '''
+    directory, filename = os.path.split(photo_name)
+    stem = os.path.splitext(filename)[0]
+    return os.path.join(directory, 'variants', f'{stem}-{width}w.{extension}')
+
+
+def variant_url(photo_name, width, extension):
+    return default_storage.url(variant_name(photo_name, width, extension))
+
+
+def generate_variants(source_path, target_paths, quality):
+    '''
+    Resizes image into every requested width and format.
+    target_paths maps width to {extension: path}.
+    Widths not smaller than original are skipped, photos are never upscaled.
+    Returns list of generated widths.
+    Runs in worker process, so it uses only Pillow and file paths.
+    '''
+    from PIL import Image, ImageOps
+
+    with Image.open(source_path) as original:
+        image = ImageOps.exif_transpose(original)
+        if image.mode not in ('RGB', 'L'):
+            image = image.convert('RGB')
+
+        generated = []
+        for width, paths in sorted(target_paths.items()):
+            if width >= image.width:
+                break
+            height = max(1, round(image.height * width / image.width))
+            resized = image.resize((width, height), Image.LANCZOS)
+            for extension, path in paths.items():
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                resized.save(path, VARIANT_FORMATS[extension], quality=quality, optimize=True)
+            generated.append(width)
+        return generated
+
+
+def variant_job(photo_name):
+    '''
+    Returns arguments of generate_variants for photo.
+    '''
+    target_paths = {
+        width: {
+            extension: default_storage.path(variant_name(photo_name, width, extension))
+            for extension in VARIANT_FORMATS
+        }
+        for width in settings.LISTING_PHOTO_WIDTHS
+    }
+    return default_storage.path(photo_name), target_paths, settings.LISTING_PHOTO_QUALITY
+
+
+def get_widths(listing):
+    '''
+    Returns widths of ready photo variants of listing.
+    '''
+    return [int(width) for width in listing.photo_widths.split(',') if width and width != NO_VARIANTS]
+
+
+def save_widths(listing_id, photo_name, widths):
+    '''
+    Marks variants as ready, unless photo was replaced in the meantime.
+    Photo smaller than every width is marked as processed without variants.
+    '''
+    from .cards import bump_card_version
+    from .models import Listing, new_version
+
+    Listing.objects.filter(id=listing_id, photo=photo_name).update(
+        photo_widths=','.join(str(width) for width in widths) or NO_VARIANTS,
+        version=new_version()
+    )
+    bump_card_version(listing_id)
+
+
+def queue_photo_variants(listing):
+    '''
+    Schedules generation of photo variants on process pool.
+    Result is saved by callback thread in this process.
+    '''
+    listing_id, photo_name = listing.id, listing.photo.name
+    submitter = threading.current_thread()
+
+    def done(future):
+        try:
+            save_widths(listing_id, photo_name, future.result())
+        except Exception:
+            logger.exception("Generating variants of %s failed.", photo_name)
+        finally:
+            # Callback usually runs in pool's management thread, which opened its own connection.
+            if threading.current_thread() is not submitter:
+                connection.close()
+
+    get_pool().submit(generate_variants, *variant_job(photo_name)).add_done_callback(done)
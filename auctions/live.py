@@ -0,0 +1,269 @@
+'''
+Live listing updates pushed to browsers with Server-Sent Events.
+
+Every listing has its own channel. When bid placement or ending of listing
+commits, message with listing's current price, number of bids and state
+is published to broker, which delivers it to every subscriber of channel.
+
+InMemoryBroker delivers messages within single process, so it fits
+deployment with one ASGI worker serving both pages and event streams.
+With several workers (or nodes) LIVE_BROKER should point to Broker subclass
+relaying messages between them (e.g. over Redis or PostgreSQL LISTEN/NOTIFY).
+
+Event streams are served by events_application, ASGI app wrapping Django's one
+in commerce/asgi.py, because Django's streaming responses cannot wait
+for messages without blocking worker thread.
+'''
+import asyncio
+from abc import ABC, abstractmethod
+import json
+import re
+import threading
+from collections import defaultdict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils.module_loading import import_string
+
+
+EVENTS_PATH = re.compile(r'^/listing/(?P<id>\d+)/events$')
+
+BID = 'bid'
+CLOSED = 'closed'
+SNAPSHOT = 'snapshot'
+
+
+class Subscription:
+    '''
+    Queue of messages published to channel, consumed by single event stream.
+    When subscriber cannot keep up, the oldest messages are dropped,
+    as every message carries complete state of listing.
+    '''
+    def __init__(self, broker, channel, maxsize):
+        self.broker = broker
+        self.channel = channel
+        self.loop = asyncio.get_event_loop()
+        self.queue = asyncio.Queue(maxsize=maxsize)
+
+    def deliver(self, message):
+        # Runs in subscriber's event loop thread.
+        if self.queue.full():
+            self.queue.get_nowait()
+        self.queue.put_nowait(message)
+
+    def get(self):
+        return self.queue.get()
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class Broker(ABC):
+    '''
+    Base of message brokers, keeping subscriptions of this process.
+    Subclasses implement publish, which may be called from any thread
+    (usually from transaction's on_commit in sync view), subscribe
+    is called from event loop of ASGI worker.
+    Broker relaying messages between processes has to call deliver_local
+    with messages received from other processes.
+    '''
+    def __init__(self, queue_size=None):
+        self.queue_size = queue_size or settings.LIVE_QUEUE_SIZE
+        self.lock = threading.Lock()
+        self.subscriptions = defaultdict(set)
+
+    @abstractmethod
+    def publish(self, channel, message):
+        '''
+        Sends message to every subscriber of channel.
+        '''
+
+    def has_subscribers(self, channel):
+        '''
+        Tells if publishing to channel can reach anybody.
+        Brokers which cannot tell (subscribers in other processes) return True.
+        '''
+        return True
+
+    def subscribe(self, channel):
+        subscription = Subscription(self, channel, self.queue_size)
+        with self.lock:
+            self.subscriptions[channel].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            subscriptions = self.subscriptions.get(subscription.channel)
+            if subscriptions is not None:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self.subscriptions[subscription.channel]
+
+    def subscriber_count(self):
+        with self.lock:
+            return sum(len(subscriptions) for subscriptions in self.subscriptions.values())
+
+    def deliver_local(self, channel, message):
+        '''
+        Hands message over to subscribers of channel in this process.
+        '''
+        with self.lock:
+            subscriptions = list(self.subscriptions.get(channel, ()))
+        for subscription in subscriptions:
+            subscription.loop.call_soon_threadsafe(subscription.deliver, message)
+
+
+class InMemoryBroker(Broker):
+    '''
+    Broker delivering messages only to subscribers in this process.
+    '''
+    def publish(self, channel, message):
+        self.deliver_local(channel, message)
+
+    def has_subscribers(self, channel):
+        with self.lock:
+            return channel in self.subscriptions
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                _broker = import_string(settings.LIVE_BROKER)()
+    return _broker
+
+
+def listing_channel(listing_id):
+    return f'listing-{listing_id}'
+
+
+def listing_state(listing_id):
+    '''
+    Returns current state of listing sent to subscribers or None if listing doesn't exist.
+    '''
+    from .models import Listing
+
+    listing = (
+        Listing.objects.filter(id=listing_id)
+        .values('id', 'current_price', 'active', 'bid_count').first()
+    )
+    if listing is None:
+        return None
+
+    return {
+        'listing': listing['id'],
+        # Sent as JSON number.
+        'current_price': float(listing['current_price']),
+        'bid_count': listing['bid_count'],
+        'active': listing['active'],
+    }
+
+
+def publish_listing(listing_id, event):
+    '''
+    Publishes current state of listing to its channel.
+    Called after transaction commits, so subscribers never see
+    price which may be rolled back.
+    '''
+    broker = get_broker()
+    channel = listing_channel(listing_id)
+    if not broker.has_subscribers(channel):
+        return
+    state = listing_state(listing_id)
+    if state is not None:
+        broker.publish(channel, {'event': event, 'data': state})
+
+
+def publish_listings(listing_ids, event):
+    for listing_id in listing_ids:
+        publish_listing(listing_id, event)
+
+
+def format_event(message):
+    data = json.dumps(message['data'], default=str)
+    return f"event: {message['event']}\ndata: {data}\n\n".encode()
+
+
+def get_state(listing_id):
+    close_old_connections()
+    try:
+        return listing_state(listing_id)
+    finally:
+        close_old_connections()
+
+
+async def stream_events(scope, receive, send, listing_id):
+    '''
+    Streams events of listing until client disconnects.
+    First event is snapshot of current state, so client which reconnects
+    never misses price change. Comment lines sent every LIVE_KEEPALIVE seconds
+    keep idle connection open through proxies.
+    '''
+    broker = get_broker()
+    # Subscribes before reading snapshot, so no update is lost in between.
+    subscription = broker.subscribe(listing_channel(listing_id))
+    try:
+        state = await sync_to_async(get_state)(listing_id)
+        if state is None:
+            await send({'type': 'http.response.start', 'status': 404, 'headers': [(b'content-type', b'text/plain')]})
+            await send({'type': 'http.response.body', 'body': b'Listing not found.'})
+            return
+
+        await send({
+            'type': 'http.response.start',
+            'status': 200,
+            'headers': [
+                (b'content-type', b'text/event-stream'),
+                (b'cache-control', b'no-cache'),
+                # Disables response buffering in nginx.
+                (b'x-accel-buffering', b'no'),
+            ],
+        })
+        await send({'type': 'http.response.body', 'body': format_event({'event': SNAPSHOT, 'data': state}), 'more_body': True})
+
+        disconnected = asyncio.ensure_future(wait_for_disconnect(receive))
+        try:
+            while True:
+                message = asyncio.ensure_future(subscription.get())
+                done, _ = await asyncio.wait({message, disconnected}, timeout=settings.LIVE_KEEPALIVE, return_when=asyncio.FIRST_COMPLETED)
+                if disconnected in done:
+                    message.cancel()
+                    break
+                if message in done:
+                    body = format_event(message.result())
+                else:
+                    message.cancel()
+                    body = b': keepalive\n\n'
+                await send({'type': 'http.response.body', 'body': body, 'more_body': True})
+        finally:
+            disconnected.cancel()
+    finally:
+        subscription.close()
+
+
+async def wait_for_disconnect(receive):
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            return
+
+
+def events_application(application):
+    '''
+    Returns ASGI app serving event streams of listings
+    and passing every other request to given app.
+    '''
+    async def app(scope, receive, send):
+        if scope['type'] == 'http' and scope['method'] == 'GET':
+            match = EVENTS_PATH.match(scope['path'])
+            if match:
+                return await stream_events(scope, receive, send, int(match.group('id')))
+        return await application(scope, receive, send)
+
+    return app
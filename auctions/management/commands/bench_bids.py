@@ -0,0 +1,271 @@
+import json
+import multiprocessing
+import random
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection
+from django.db.models import Max
+from django.test import Client
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.urls import reverse
+
+from auctions.benchmark import Timer, isolated_database, summarize
+from auctions.models import Bid, Category, Contact, Listing, User, Watchlist
+from auctions.sqlite import current_pragmas
+
+
+class Command(BaseCommand):
+    help = (
+        "Load-tests bidding: seeds users and listings in throwaway database, "
+        "fires concurrent bids, comments and watchlist toggles through Django "
+        "test client and reports latency, throughput, lock errors and price correctness."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=50, help="Number of bidding users.")
+        parser.add_argument('--listings', type=int, default=5, help="Number of listings (fewer means hotter).")
+        parser.add_argument('--bids', type=int, default=2000, help="Number of bid requests.")
+        parser.add_argument('--comments', type=int, default=200, help="Number of comment requests.")
+        parser.add_argument('--toggles', type=int, default=200, help="Number of watchlist toggle requests.")
+        parser.add_argument('--workers', type=int, default=8, help="Number of concurrent worker threads.")
+        parser.add_argument(
+            '--processes', action='store_true',
+            help="Runs workers in separate processes instead of threads, so they contend for database "
+                 "like processes of production server."
+        )
+        parser.add_argument('--seed', type=int, default=1, help="Random seed, same seed gives same workload.")
+        parser.add_argument('--json', action='store_true', help="Print report as JSON.")
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        try:
+            with isolated_database():
+                report = self.run_benchmark(options)
+        finally:
+            teardown_test_environment()
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+        else:
+            self.print_report(report)
+
+        if not report['correctness']['ok']:
+            raise CommandError("Final current_price does not match highest accepted bid.")
+
+    def run_benchmark(self, options):
+        rng = random.Random(options['seed'])
+        users, listings = self.seed(options['users'], options['listings'])
+        workload = self.build_workload(rng, users, listings, options)
+
+        # Each user's operations go to one worker, so single user
+        # never sends two requests at the same time.
+        workers = max(1, options['workers'])
+        partitions = defaultdict(list)
+        for operation in workload:
+            partitions[operation[1] % workers].append(operation)
+
+        if options['processes']:
+            results, timer = self.run_processes(list(partitions.values()))
+        else:
+            results, timer = self.run_threads(list(partitions.values()))
+
+        latencies = defaultdict(list)
+        lock_errors = 0
+        other_errors = 0
+        for worker_latencies, worker_lock_errors, worker_other_errors in results:
+            for kind, values in worker_latencies.items():
+                latencies[kind].extend(values)
+            lock_errors += worker_lock_errors
+            other_errors += worker_other_errors
+
+        total = sum(len(values) for values in latencies.values())
+        return {
+            'database': self.describe_database(),
+            'workers': len(partitions),
+            'elapsed_s': round(timer.elapsed, 3),
+            'requests': total,
+            'throughput_rps': round(total / timer.elapsed, 1) if timer.elapsed else 0.0,
+            'latency': {kind: summarize(values) for kind, values in sorted(latencies.items())},
+            'lock_errors': lock_errors,
+            'other_errors': other_errors,
+            'accepted_bids': Bid.objects.count(),
+            'correctness': self.check_correctness(listings),
+        }
+
+    def describe_database(self):
+        '''
+        Returns database settings the benchmark ran with.
+        '''
+        description = {
+            'engine': connection.settings_dict['ENGINE'],
+            'conn_max_age': connection.settings_dict['CONN_MAX_AGE'],
+        }
+        if connection.vendor == 'sqlite':
+            description['pragmas'] = current_pragmas(connection)
+        return description
+
+    def seed(self, user_count, listing_count):
+        '''
+        Creates seller, bidders and seller's listings.
+        '''
+        password = make_password('benchmark')
+        User.objects.bulk_create(
+            [User(username=f'bench_user_{i}', password=password) for i in range(user_count + 1)]
+        )
+        users = list(User.objects.order_by('id'))
+        Contact.objects.bulk_create([Contact(user=user) for user in users])
+
+        seller, bidders = users[0], users[1:]
+        category = Category.objects.create(name='Benchmark')
+        Listing.objects.bulk_create([
+            Listing(title=f'Listing {i}', description='Benchmark listing', starting_price=1.0,
+                    current_price=1.0, user=seller, category=category)
+            for i in range(listing_count)
+        ])
+        return bidders, list(Listing.objects.order_by('id'))
+
+    def build_workload(self, rng, users, listings, options):
+        '''
+        Returns shuffled list of (kind, user_id, listing_id, value) operations.
+        Bid values arrive in random order, so many of them get outbid.
+        '''
+        workload = []
+        for _ in range(options['bids']):
+            listing = rng.choice(listings)
+            value = round(float(listing.starting_price) + rng.uniform(0, options['bids']), 2)
+            workload.append(('bid', rng.choice(users).id, listing.id, value))
+        for _ in range(options['comments']):
+            workload.append(('comment', rng.choice(users).id, rng.choice(listings).id, None))
+        for _ in range(options['toggles']):
+            workload.append(('toggle', rng.choice(users).id, rng.choice(listings).id, None))
+        rng.shuffle(workload)
+        return workload
+
+    def run_threads(self, partitions):
+        barrier = threading.Barrier(len(partitions))
+        with Timer() as timer:
+            with ThreadPoolExecutor(max_workers=len(partitions)) as pool:
+                results = list(pool.map(lambda ops: self.run_worker(ops, barrier), partitions))
+        return results, timer
+
+    def run_processes(self, partitions):
+        '''
+        Runs workers in forked processes, each with its own connection.
+        '''
+        context = multiprocessing.get_context('fork')
+        barrier = context.Barrier(len(partitions))
+        queue = context.Queue()
+        # Children must not share parent's connection.
+        connection.close()
+
+        processes = [
+            context.Process(target=lambda ops=ops: queue.put(self.run_worker(ops, barrier)))
+            for ops in partitions
+        ]
+        with Timer() as timer:
+            for process in processes:
+                process.start()
+            results = [queue.get() for _ in processes]
+            for process in processes:
+                process.join()
+        return results, timer
+
+    def run_worker(self, operations, barrier):
+        latencies = defaultdict(list)
+        lock_errors = 0
+        other_errors = 0
+        watched = set()
+
+        # Logs users in before the clock starts.
+        clients = {}
+        users = User.objects.in_bulk({operation[1] for operation in operations})
+        for user_id, user in users.items():
+            clients[user_id] = Client()
+            clients[user_id].force_login(user)
+        watched.update(Watchlist.objects.filter(user_id__in=clients).values_list('user_id', 'listing_id'))
+
+        barrier.wait()
+        try:
+            for kind, user_id, listing_id, value in operations:
+                client = clients[user_id]
+                # Browser shows flashed messages on page it is redirected to,
+                # which empties messages cookie (redirects are not followed here).
+                client.cookies.pop('messages', None)
+                try:
+                    with Timer() as timer:
+                        if kind == 'bid':
+                            client.post(reverse('add_bid'), {'bid_value': value, 'listing_id': listing_id})
+                        elif kind == 'comment':
+                            client.post(reverse('add_comment'), {
+                                'listing_id': listing_id,
+                                'comment_content': 'Benchmark comment',
+                                'comment_author': user_id
+                            })
+                        elif (user_id, listing_id) in watched:
+                            client.post(reverse('remove_from_watchlist'), {'listing_id': listing_id})
+                            watched.discard((user_id, listing_id))
+                        else:
+                            client.post(reverse('add_to_watchlist'), {'listing_id': listing_id})
+                            watched.add((user_id, listing_id))
+                    latencies[kind].append(timer.elapsed)
+                except OperationalError as error:
+                    if 'locked' in str(error):
+                        lock_errors += 1
+                    else:
+                        other_errors += 1
+                except Exception:
+                    other_errors += 1
+        finally:
+            connection.close()
+
+        return latencies, lock_errors, other_errors
+
+    def check_correctness(self, listings):
+        '''
+        Checks that every listing's current price equals
+        its highest accepted bid (or starting price without bids)
+        and that accepted bids were strictly increasing.
+        '''
+        top_bids = dict(
+            Bid.objects.values_list('listing_id').annotate(top=Max('value')).values_list('listing_id', 'top')
+        )
+        mismatched = []
+        for listing in Listing.objects.filter(id__in=[listing.id for listing in listings]):
+            expected = top_bids.get(listing.id, listing.starting_price)
+            if listing.current_price != expected:
+                mismatched.append(listing.id)
+
+        not_increasing = []
+        previous = {}
+        for listing_id, value in Bid.objects.order_by('id').values_list('listing_id', 'value'):
+            if listing_id in previous and value <= previous[listing_id]:
+                not_increasing.append(listing_id)
+            previous[listing_id] = value
+
+        return {
+            'ok': not mismatched and not not_increasing,
+            'mismatched_listings': mismatched,
+            'non_increasing_listings': sorted(set(not_increasing)),
+        }
+
+    def print_report(self, report):
+        self.stdout.write(f"Database: {report['database']}")
+        self.stdout.write(
+            f"{report['requests']} requests from {report['workers']} workers "
+            f"in {report['elapsed_s']}s ({report['throughput_rps']} req/s)"
+        )
+        for kind, stats in report['latency'].items():
+            self.stdout.write(
+                f"  {kind:<8} n={stats['count']:<6} p50={stats['p50_ms']}ms "
+                f"p95={stats['p95_ms']}ms p99={stats['p99_ms']}ms max={stats['max_ms']}ms"
+            )
+        self.stdout.write(f"Accepted bids: {report['accepted_bids']}")
+        self.stdout.write(f"Lock errors: {report['lock_errors']}, other errors: {report['other_errors']}")
+        if report['correctness']['ok']:
+            self.stdout.write(self.style.SUCCESS("Correctness: OK"))
+        else:
+            self.stdout.write(self.style.ERROR(f"Correctness: FAILED {report['correctness']}"))
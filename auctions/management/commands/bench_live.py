@@ -0,0 +1,164 @@
+import asyncio
+import json
+import time
+import tracemalloc
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+
+from auctions import live
+from auctions.benchmark import Timer, isolated_database, summarize
+from auctions.bidding import place_bid
+from auctions.models import Category, Listing, User
+
+
+class Command(BaseCommand):
+    help = (
+        "Measures how many concurrent live update subscribers single worker holds: "
+        "opens event streams of one listing through ASGI app in this process, "
+        "places bids and reports connect time, memory per subscriber "
+        "and latency from bid commit to delivery to every subscriber. "
+        "Socket and HTTP server overhead is not included."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--subscribers', default='100,1000,5000',
+                            help="Comma separated numbers of concurrent subscribers to measure.")
+        parser.add_argument('--bids', type=int, default=20, help="Number of bids placed at every step.")
+        parser.add_argument('--json', action='store_true', help="Print report as JSON.")
+
+    def handle(self, *args, **options):
+        steps = [int(count) for count in options['subscribers'].split(',') if count.strip()]
+
+        with isolated_database():
+            bidder, listing = self.seed()
+            report = [asyncio.run(self.run_step(count, options['bids'], bidder, listing)) for count in steps]
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+        else:
+            self.print_report(report)
+
+        if any(step['missed'] for step in report):
+            raise CommandError("Some subscribers did not receive every bid.")
+
+    def seed(self):
+        password = make_password('benchmark')
+        seller = User.objects.create(username='bench_seller', password=password)
+        bidder = User.objects.create(username='bench_bidder', password=password)
+        category = Category.objects.create(name='Benchmark')
+        listing = Listing.objects.create(
+            title='Listing', description='Benchmark listing', starting_price=1.0,
+            current_price=1.0, user=seller, category=category
+        )
+        return bidder, listing
+
+    async def run_step(self, count, bids, bidder, listing):
+        from commerce.asgi import application
+
+        scope = {'type': 'http', 'method': 'GET', 'path': f'/listing/{listing.id}/events', 'headers': []}
+        subscribers = [Subscriber() for _ in range(count)]
+
+        tracemalloc.start()
+        with Timer() as connect_timer:
+            streams = [asyncio.ensure_future(application(scope, subscriber.receive, subscriber.send))
+                       for subscriber in subscribers]
+            await asyncio.gather(*(subscriber.connected.wait() for subscriber in subscribers))
+        memory, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        broker = live.get_broker()
+        connected = broker.subscriber_count()
+
+        latencies = []
+        loop = asyncio.get_event_loop()
+        for number in range(bids):
+            value = float(listing.current_price or listing.starting_price) + number + 1
+            for subscriber in subscribers:
+                subscriber.expect(loop)
+            started = time.perf_counter()
+            await sync_to_async(self.bid, thread_sensitive=False)(bidder.id, listing.id, value)
+            try:
+                await asyncio.wait_for(
+                    asyncio.gather(*(subscriber.delivered for subscriber in subscribers)), timeout=30
+                )
+            except asyncio.TimeoutError:
+                pass
+            latencies.extend(
+                subscriber.received_at - started for subscriber in subscribers if subscriber.received_at
+            )
+        # Keeps next step's prices increasing.
+        listing.current_price = await sync_to_async(self.current_price, thread_sensitive=False)(listing.id)
+
+        for subscriber in subscribers:
+            subscriber.disconnect()
+        await asyncio.gather(*streams)
+
+        return {
+            'subscribers': count,
+            'connected': connected,
+            'connect_s': round(connect_timer.elapsed, 3),
+            'memory_per_subscriber_kb': round(memory / count / 1024, 2) if count else 0.0,
+            'deliveries': len(latencies),
+            'missed': count * bids - len(latencies),
+            'fanout_latency': summarize(latencies),
+            'left_subscribed': broker.subscriber_count(),
+        }
+
+    def bid(self, user_id, listing_id, value):
+        try:
+            result = place_bid(user_id, listing_id, value)
+        finally:
+            close_old_connections()
+        if not result.accepted:
+            raise CommandError(f"Benchmark bid was refused: {result}.")
+
+    def current_price(self, listing_id):
+        try:
+            return Listing.objects.values_list('current_price', flat=True).get(id=listing_id)
+        finally:
+            close_old_connections()
+
+    def print_report(self, report):
+        for step in report:
+            stats = step['fanout_latency']
+            self.stdout.write(
+                f"{step['subscribers']} subscribers: connected in {step['connect_s']}s, "
+                f"{step['memory_per_subscriber_kb']}KB each, {step['deliveries']} deliveries "
+                f"({step['missed']} missed), fan-out p50={stats['p50_ms']}ms "
+                f"p95={stats['p95_ms']}ms p99={stats['p99_ms']}ms max={stats['max_ms']}ms"
+            )
+
+
+class Subscriber:
+    '''
+    Fake ASGI client of event stream, recording when bid events arrive.
+    '''
+    def __init__(self):
+        self.connected = asyncio.Event()
+        self.disconnected = asyncio.Event()
+        self.delivered = None
+        self.received_at = None
+
+    def expect(self, loop):
+        self.delivered = loop.create_future()
+        self.received_at = None
+
+    def disconnect(self):
+        self.disconnected.set()
+
+    async def receive(self):
+        await self.disconnected.wait()
+        return {'type': 'http.disconnect'}
+
+    async def send(self, message):
+        if message['type'] == 'http.response.start':
+            if message['status'] != 200:
+                raise CommandError(f"Event stream responded with {message['status']}.")
+        elif message['body'].startswith(b'event: snapshot'):
+            self.connected.set()
+        elif message['body'].startswith(b'event: bid') and self.delivered and not self.delivered.done():
+            self.received_at = time.perf_counter()
+            self.delivered.set_result(None)
@@ -0,0 +1,80 @@
+import json
+
+from django.core.management.base import BaseCommand
+from django.template import Context, Template
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from auctions.benchmark import Timer
+from auctions.models import Category, Listing
+
+
+# Category cell as it was rendered before listings were joined with categories.
+NESTED_LOOP_TEMPLATE = Template(
+    "{% for listing in listings %}"
+    "{% for category in categories %}{% if category.id == listing.category_id %}{{ category.name }}{% endif %}{% endfor %}"
+    "{% endfor %}"
+)
+
+JOINED_TEMPLATE = Template(
+    "{% for listing in listings %}{{ listing.category.name }}{% endfor %}"
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Measures rendering of listing cards with in-memory data: category cell rendered "
+        "by looping over all categories versus read from joined category, "
+        "and full browse_listings.html page."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--listings', type=int, default=10000, help="Number of listing cards.")
+        parser.add_argument('--categories', type=int, default=200, help="Number of categories.")
+        parser.add_argument('--repeat', type=int, default=3, help="Renders each variant this many times, best time wins.")
+        parser.add_argument('--json', action='store_true', help="Print report as JSON.")
+
+    def handle(self, *args, **options):
+        categories = [Category(id=i, name=f'Category {i}') for i in range(1, options['categories'] + 1)]
+        now = timezone.now()
+        listings = []
+        for i in range(1, options['listings'] + 1):
+            category = categories[i % len(categories)]
+            # Assigning category object fills the cache select_related would fill.
+            listings.append(Listing(
+                id=i, title=f'Listing {i}', description='Benchmark listing', starting_price=1.0,
+                current_price=1.0, user_id=1, category=category, date_added=now
+            ))
+
+        report = {
+            'listings': len(listings),
+            'categories': len(categories),
+            'nested_loop_category_s': self.best_of(
+                options['repeat'], lambda: NESTED_LOOP_TEMPLATE.render(Context({'listings': listings, 'categories': categories}))
+            ),
+            'joined_category_s': self.best_of(
+                options['repeat'], lambda: JOINED_TEMPLATE.render(Context({'listings': listings}))
+            ),
+            'browse_page_s': self.best_of(
+                options['repeat'], lambda: render_to_string('auctions/browse_listings.html', {
+                    'listings': listings, 'header_title': 'Benchmark', 'logged_user_id': 'No winner'
+                })
+            ),
+        }
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+        else:
+            self.stdout.write(f"{report['listings']} listings x {report['categories']} categories")
+            self.stdout.write(f"  category cell, nested loop: {report['nested_loop_category_s']}s")
+            self.stdout.write(f"  category cell, joined:      {report['joined_category_s']}s")
+            self.stdout.write(f"  full browse page:           {report['browse_page_s']}s")
+
+    def best_of(self, repeat, render):
+        best = None
+        for _ in range(max(1, repeat)):
+            with Timer() as timer:
+                render()
+            if best is None or timer.elapsed < best:
+                best = timer.elapsed
+        return round(best, 4)
@@ -0,0 +1,145 @@
+import json
+from collections import Counter
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client, override_settings
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.urls import reverse
+
+from auctions.benchmark import isolated_database
+from auctions.models import Category, Contact, Listing, User
+
+
+SESSION_ENGINES = {
+    'db': 'django.contrib.sessions.backends.db',
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+    'signed_cookies': 'django.contrib.sessions.backends.signed_cookies',
+}
+
+MESSAGE_STORAGES = {
+    'fallback': 'django.contrib.messages.storage.fallback.FallbackStorage',
+    'session': 'django.contrib.messages.storage.session.SessionStorage',
+    'cookie': 'django.contrib.messages.storage.cookie.CookieStorage',
+}
+
+
+class WriteCounter:
+    '''
+    Database execute wrapper counting write statements (per table),
+    write transactions and session reads. Statements run in autocommit mode
+    are transactions of their own, atomic block with writes is one transaction.
+    '''
+    def __init__(self):
+        self.statements = Counter()
+        self.transactions = 0
+        self.session_reads = 0
+        self.in_write_transaction = False
+
+    def __call__(self, execute, sql, params, many, context):
+        words = sql.split(None, 3)
+        verb = words[0].upper() if words else ''
+        if verb in ('INSERT', 'UPDATE', 'DELETE', 'REPLACE'):
+            table = words[2] if verb in ('INSERT', 'DELETE', 'REPLACE') else words[1]
+            self.statements[table.strip('"')] += 1
+            if not context['connection'].in_atomic_block:
+                self.transactions += 1
+            elif not self.in_write_transaction:
+                self.transactions += 1
+                self.in_write_transaction = True
+                transaction.on_commit(self.end_transaction)
+        elif verb == 'SELECT' and 'django_session' in sql:
+            self.session_reads += 1
+        return execute(sql, params, many, context)
+
+    def end_transaction(self):
+        self.in_write_transaction = False
+
+
+class Command(BaseCommand):
+    help = (
+        "Counts database writes and session reads caused by placing bid "
+        "(POST and redirect with flashed message) "
+        "for every combination of session engine and message storage."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--bids', type=int, default=100, help="Number of bids per combination.")
+        parser.add_argument('--sessions', default=','.join(SESSION_ENGINES),
+                            help="Comma separated session engines to compare.")
+        parser.add_argument('--messages', default=','.join(MESSAGE_STORAGES),
+                            help="Comma separated message storages to compare.")
+        parser.add_argument('--json', action='store_true', help="Print report as JSON.")
+
+    def handle(self, *args, **options):
+        combinations = [
+            (session, message)
+            for session in options['sessions'].split(',')
+            for message in options['messages'].split(',')
+        ]
+        for session, message in combinations:
+            if session not in SESSION_ENGINES or message not in MESSAGE_STORAGES:
+                raise CommandError(f"Unknown combination {session}/{message}.")
+
+        setup_test_environment()
+        try:
+            with isolated_database():
+                bidder, listing = self.seed()
+                report = [self.measure(session, message, bidder, listing, options['bids'])
+                          for session, message in combinations]
+        finally:
+            teardown_test_environment()
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+        else:
+            self.print_report(report)
+
+    def seed(self):
+        password = make_password('benchmark')
+        seller = User.objects.create(username='bench_seller', password=password)
+        bidder = User.objects.create(username='bench_bidder', password=password)
+        Contact.objects.bulk_create([Contact(user=seller), Contact(user=bidder)])
+        category = Category.objects.create(name='Benchmark')
+        listing = Listing.objects.create(
+            title='Listing', description='Benchmark listing', starting_price=1.0,
+            current_price=1.0, user=seller, category=category
+        )
+        return bidder, listing
+
+    def measure(self, session, message, bidder, listing, bids):
+        with override_settings(SESSION_ENGINE=SESSION_ENGINES[session], MESSAGE_STORAGE=MESSAGE_STORAGES[message]):
+            client = Client()
+            client.force_login(bidder)
+
+            counter = WriteCounter()
+            price = Listing.objects.values_list('current_price', flat=True).get(id=listing.id)
+            with connection.execute_wrapper(counter):
+                for number in range(bids):
+                    response = client.post(
+                        reverse('add_bid'), {'bid_value': price + number + 1, 'listing_id': listing.id}, follow=True
+                    )
+                    if response.status_code != 200 or not list(response.context['messages']):
+                        raise CommandError(f"Bid was not shown with message under {session}/{message}.")
+
+        session_writes = counter.statements.get('django_session', 0)
+        return {
+            'session': session,
+            'messages': message,
+            'bids': bids,
+            'write_transactions_per_bid': round(counter.transactions / bids, 2),
+            'write_statements_per_bid': round(sum(counter.statements.values()) / bids, 2),
+            'session_writes_per_bid': round(session_writes / bids, 2),
+            'session_reads_per_bid': round(counter.session_reads / bids, 2),
+            'writes_by_table': dict(counter.statements),
+        }
+
+    def print_report(self, report):
+        self.stdout.write(f"{'session':<16}{'messages':<10}{'txn/bid':>9}{'stmt/bid':>10}{'session w/bid':>15}{'session r/bid':>15}")
+        for row in report:
+            self.stdout.write(
+                f"{row['session']:<16}{row['messages']:<10}{row['write_transactions_per_bid']:>9}"
+                f"{row['write_statements_per_bid']:>10}{row['session_writes_per_bid']:>15}"
+                f"{row['session_reads_per_bid']:>15}"
+            )
@@ -0,0 +1,206 @@
+import asyncio
+import io
+import json
+import os
+import random
+import subprocess
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from auctions.benchmark import Timer, isolated_database, summarize
+from auctions.models import Category, Comment, Contact, Listing, User, Watchlist
+
+
+MODES = {
+    # Mode: (server interface, serve read views with async views).
+    'wsgi': ('wsgi', False),
+    'asgi-sync': ('asgi', False),
+    'asgi': ('asgi', True),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Compares read-heavy pages served by sync views under WSGI with async views "
+        "under ASGI: seeds throwaway database and fires concurrent requests "
+        "straight at Django's WSGI handler (from thread pool, like threaded server) "
+        "and ASGI handler (from event loop). Every mode runs in its own process."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--modes', default='wsgi,asgi-sync,asgi',
+                            help=f"Comma separated modes to compare ({', '.join(MODES)}).")
+        parser.add_argument('--requests', type=int, default=2000, help="Number of requests per mode.")
+        parser.add_argument('--concurrency', type=int, default=64, help="Number of requests in flight.")
+        parser.add_argument('--listings', type=int, default=500, help="Number of seeded listings.")
+        parser.add_argument('--seed', type=int, default=1, help="Random seed, same seed gives same workload.")
+        parser.add_argument('--json', action='store_true', help="Print report as JSON.")
+        parser.add_argument('--mode', choices=MODES, help="Runs single mode in this process (used internally).")
+
+    def handle(self, *args, **options):
+        if options['mode']:
+            report = self.run_mode(options)
+            self.stdout.write(json.dumps(report))
+            return
+
+        reports = []
+        for mode in options['modes'].split(','):
+            if mode not in MODES:
+                raise CommandError(f"Unknown mode {mode}.")
+            reports.append(self.spawn(mode, options))
+
+        if options['json']:
+            self.stdout.write(json.dumps(reports, indent=2))
+        else:
+            self.print_report(reports)
+
+    def spawn(self, mode, options):
+        '''
+        Runs mode in child process, because URLconf picks views at import.
+        '''
+        env = dict(os.environ, AUCTIONS_ASYNC_READ_VIEWS='1' if MODES[mode][1] else '0')
+        command = [
+            sys.executable, '-m', 'django', 'bench_views', '--mode', mode,
+            '--requests', str(options['requests']), '--concurrency', str(options['concurrency']),
+            '--listings', str(options['listings']), '--seed', str(options['seed']),
+        ]
+        result = subprocess.run(command, env=env, cwd=settings.BASE_DIR, capture_output=True, text=True)
+        if result.returncode:
+            raise CommandError(f"Mode {mode} failed:\n{result.stderr}")
+        return json.loads(result.stdout.strip().splitlines()[-1])
+
+    def run_mode(self, options):
+        interface, async_views = MODES[options['mode']]
+        if settings.ASYNC_READ_VIEWS != async_views:
+            raise CommandError("Mode must be started with matching AUCTIONS_ASYNC_READ_VIEWS.")
+
+        with override_settings(DEBUG=False, ALLOWED_HOSTS=['localhost']), isolated_database():
+            cookie, paths = self.seed(random.Random(options['seed']), options['listings'])
+            workload = [paths[i % len(paths)] for i in range(options['requests'])]
+            random.Random(options['seed']).shuffle(workload)
+
+            if interface == 'wsgi':
+                latencies, statuses, elapsed = self.run_wsgi(workload, cookie, options['concurrency'])
+            else:
+                latencies, statuses, elapsed = asyncio.run(self.run_asgi(workload, cookie, options['concurrency']))
+
+        errors = sum(1 for status in statuses if status != 200)
+        return {
+            'mode': options['mode'],
+            'concurrency': options['concurrency'],
+            'requests': len(workload),
+            'errors': errors,
+            'elapsed_s': round(elapsed, 3),
+            'throughput_rps': round(len(workload) / elapsed, 1) if elapsed else 0.0,
+            'latency': summarize(latencies),
+        }
+
+    def seed(self, rng, listing_count):
+        '''
+        Creates users, listings with comments and watchlist of logged user.
+        Returns session cookie of logged user and request paths.
+        '''
+        password = make_password('benchmark')
+        User.objects.bulk_create([User(username=f'bench_user_{i}', password=password) for i in range(20)])
+        users = list(User.objects.order_by('id'))
+        Contact.objects.bulk_create([Contact(user=user) for user in users])
+        categories = [Category.objects.create(name=f'Category {i}') for i in range(10)]
+
+        Listing.objects.bulk_create([
+            Listing(title=f'Listing {i}', description='Benchmark listing', starting_price=1.0,
+                    current_price=1.0, user=rng.choice(users), category=rng.choice(categories))
+            for i in range(listing_count)
+        ])
+        listings = list(Listing.objects.values_list('id', flat=True))
+        Comment.objects.bulk_create([
+            Comment(content='Benchmark comment', author=rng.choice(users), listing_id=rng.choice(listings))
+            for _ in range(listing_count * 5)
+        ])
+
+        logged_user = users[0]
+        Watchlist.objects.bulk_create([
+            Watchlist(user=logged_user, listing_id=listing_id) for listing_id in rng.sample(listings, min(50, len(listings)))
+        ])
+        client = Client()
+        client.force_login(logged_user)
+        cookie = f'{settings.SESSION_COOKIE_NAME}={client.cookies[settings.SESSION_COOKIE_NAME].value}'
+
+        paths = [reverse('index'), reverse('categories_view'), reverse('watchlist_view')]
+        paths += [f"{reverse('browse_listings_category')}?category_id={category.id}" for category in categories[:3]]
+        paths += [reverse('single_listing_view', args=[listing_id]) for listing_id in rng.sample(listings, 10)]
+        return cookie, paths
+
+    def run_wsgi(self, workload, cookie, concurrency):
+        from django.core.wsgi import get_wsgi_application
+        application = get_wsgi_application()
+
+        def request(path):
+            path_info, _, query_string = path.partition('?')
+            environ = {
+                'REQUEST_METHOD': 'GET', 'PATH_INFO': path_info, 'QUERY_STRING': query_string,
+                'SERVER_NAME': 'localhost', 'SERVER_PORT': '80', 'HTTP_HOST': 'localhost',
+                'HTTP_COOKIE': cookie, 'wsgi.input': io.BytesIO(), 'wsgi.errors': sys.stderr,
+                'wsgi.url_scheme': 'http', 'wsgi.version': (1, 0),
+                'wsgi.multithread': True, 'wsgi.multiprocess': False, 'wsgi.run_once': False,
+            }
+            status = []
+            with Timer() as timer:
+                response = application(environ, lambda code, headers, exc_info=None: status.append(int(code[:3])))
+                for _ in response:
+                    pass
+                response.close()
+            return timer.elapsed, status[0]
+
+        with Timer() as timer:
+            with ThreadPoolExecutor(max_workers=concurrency) as pool:
+                results = list(pool.map(request, workload))
+        close_old_connections()
+        return [result[0] for result in results], [result[1] for result in results], timer.elapsed
+
+    async def run_asgi(self, workload, cookie, concurrency):
+        from commerce.asgi import application
+
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def request(path):
+            path_info, _, query_string = path.partition('?')
+            scope = {
+                'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1',
+                'method': 'GET', 'scheme': 'http', 'path': path_info, 'raw_path': path_info.encode(),
+                'query_string': query_string.encode(), 'root_path': '',
+                'headers': [(b'host', b'localhost'), (b'cookie', cookie.encode())],
+                'server': ('localhost', 80), 'client': ('127.0.0.1', 0),
+            }
+            status = []
+
+            async def receive():
+                return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+            async def send(message):
+                if message['type'] == 'http.response.start':
+                    status.append(message['status'])
+
+            async with semaphore:
+                with Timer() as timer:
+                    await application(scope, receive, send)
+            return timer.elapsed, status[0]
+
+        with Timer() as timer:
+            results = await asyncio.gather(*(request(path) for path in workload))
+        return [result[0] for result in results], [result[1] for result in results], timer.elapsed
+
+    def print_report(self, reports):
+        for report in reports:
+            stats = report['latency']
+            self.stdout.write(
+                f"{report['mode']:<10} {report['requests']} requests, concurrency {report['concurrency']}: "
+                f"{report['throughput_rps']} req/s, p50={stats['p50_ms']}ms p95={stats['p95_ms']}ms "
+                f"p99={stats['p99_ms']}ms max={stats['max_ms']}ms, errors={report['errors']}"
+            )
@@ -0,0 +1,50 @@
+from django.core.management.base import BaseCommand
+
+from auctions.images import generate_variants, get_pool, save_widths, variant_job
+from auctions.models import Listing
+
+
+class Command(BaseCommand):
+    help = "Generates responsive WebP/JPEG variants of existing listing photos on process pool."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help="Regenerates variants of all photos.")
+        parser.add_argument('--chunk-size', type=int, default=100, help="Number of photos submitted at once.")
+
+    def handle(self, *args, **options):
+        listings = Listing.objects.exclude(photo='default.jpg')
+        if not options['force']:
+            listings = listings.filter(photo_widths='')
+
+        pool = get_pool()
+        done = 0
+        failed = 0
+        chunk = []
+        rows = listings.values_list('id', 'photo').order_by('id').iterator(chunk_size=options['chunk_size'])
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) == options['chunk_size']:
+                chunk_done, chunk_failed = self.process(pool, chunk)
+                done, failed = done + chunk_done, failed + chunk_failed
+                chunk = []
+        if chunk:
+            chunk_done, chunk_failed = self.process(pool, chunk)
+            done, failed = done + chunk_done, failed + chunk_failed
+
+        self.stdout.write(self.style.SUCCESS(f"Generated variants of {done} photo(s), {failed} failed."))
+
+    def process(self, pool, chunk):
+        futures = [
+            (listing_id, photo_name, pool.submit(generate_variants, *variant_job(photo_name)))
+            for listing_id, photo_name in chunk
+        ]
+        done = 0
+        failed = 0
+        for listing_id, photo_name, future in futures:
+            try:
+                save_widths(listing_id, photo_name, future.result())
+                done += 1
+            except Exception as error:
+                self.stderr.write(f"Listing {listing_id} ({photo_name}): {error}")
+                failed += 1
+        return done, failed
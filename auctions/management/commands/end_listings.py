@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from auctions.bidding import end_listings
+from auctions.models import Listing
+
+
+class Command(BaseCommand):
+    help = "Ends many auctions in one pass. User with top bid becomes winner of each listing."
+
+    def add_arguments(self, parser):
+        parser.add_argument('listing_ids', nargs='*', type=int, help="Ids of listings to end.")
+        parser.add_argument('--seller', help="Ends all listings of user with this username.")
+
+    def handle(self, *args, **options):
+        if not options['listing_ids'] and not options['seller']:
+            raise CommandError("Provide listing ids or --seller.")
+
+        listings = Listing.objects.all()
+        if options['listing_ids']:
+            listings = listings.filter(id__in=options['listing_ids'])
+        if options['seller']:
+            listings = listings.filter(user__username=options['seller'])
+
+        ended = end_listings(listings)
+        self.stdout.write(self.style.SUCCESS(f"Ended {ended} listing(s)."))
@@ -0,0 +1,146 @@
+import re
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, setup_test_environment, teardown_test_environment
+from django.urls import reverse
+
+from auctions.benchmark import isolated_database
+from auctions.models import Bid, Category, Comment, Contact, Listing, User, Watchlist
+
+
+# "SCAN table" without index is full table scan.
+# "SCAN table USING (COVERING) INDEX" walks index in order and stops at LIMIT,
+# virtual tables (FTS5) are searched by their own index.
+FULL_SCAN = re.compile(r'\bSCAN (?:TABLE )?\w+\b(?! USING)(?! VIRTUAL)')
+
+EXPLAINED_STATEMENTS = ('SELECT', 'UPDATE', 'DELETE')
+
+
+class Command(BaseCommand):
+    help = (
+        "Requests every auctions view in throwaway database, runs EXPLAIN QUERY PLAN "
+        "on each query and fails if any of them does full table scan."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verbose-plans', action='store_true', help="Print plan of every query.")
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError("EXPLAIN QUERY PLAN check is written for SQLite.")
+
+        setup_test_environment()
+        try:
+            with isolated_database():
+                queries = self.capture_view_queries()
+                problems = self.explain(queries, options['verbose_plans'])
+        finally:
+            teardown_test_environment()
+
+        if problems:
+            for view, sql, line in problems:
+                self.stdout.write(self.style.ERROR(f"{view}: {line}\n    {sql}"))
+            raise CommandError(f"{len(problems)} query plan(s) with full table scan.")
+        self.stdout.write(self.style.SUCCESS(f"No full table scans in {len(queries)} views."))
+
+    def capture_view_queries(self):
+        '''
+        Seeds small data set, requests every view
+        and returns captured SQL grouped by URL name.
+        '''
+        seller = User.objects.create_user('seller', 'seller@example.com', 'password')
+        buyer = User.objects.create_user('buyer', 'buyer@example.com', 'password')
+        Contact.objects.create(user=seller)
+        Contact.objects.create(user=buyer)
+        category = Category.objects.create(name='Books')
+        listings = [
+            Listing.objects.create(
+                title=f'Book {i}', description='Good book', starting_price=1, current_price=1 + i,
+                user=seller, category=category
+            )
+            for i in range(30)
+        ]
+        listing = listings[0]
+        Bid.objects.create(value=2, user=buyer, listing=listing)
+        comment = Comment.objects.create(content='Is it new?', listing=listing, author=buyer)
+        Watchlist.objects.create(user=buyer, listing=listings[1])
+
+        anonymous = Client()
+        seller_client = Client()
+        seller_client.force_login(seller)
+        buyer_client = Client()
+        buyer_client.force_login(buyer)
+
+        first_page = anonymous.get(reverse('index')).context['listings']
+        by_price = {'sort': 'price', 'min_price': 2, 'max_price': 25}
+        first_price_page = anonymous.get(reverse('index'), by_price).context['listings']
+
+        requests = [
+            ('index', anonymous, 'get', reverse('index'), {}),
+            ('index (next page)', anonymous, 'get', reverse('index'), {'cursor': first_page.next_cursor}),
+            ('index (by price)', anonymous, 'get', reverse('index'), by_price),
+            ('index (by price, next page)', anonymous, 'get', reverse('index'),
+             {**by_price, 'cursor': first_price_page.next_cursor}),
+            ('index (category by price)', anonymous, 'get', reverse('index'),
+             {'category': category.id, 'sort': 'price_desc', 'max_price': 25}),
+            ('single_listing_view', buyer_client, 'get', reverse('single_listing_view', args=[listing.id]), {}),
+            ('login', anonymous, 'get', reverse('login'), {}),
+            ('register', anonymous, 'get', reverse('register'), {}),
+            ('profile', buyer_client, 'get', reverse('profile'), {}),
+            ('profile_edit', buyer_client, 'get', reverse('profile_edit'), {}),
+            ('change_email', buyer_client, 'get', reverse('change_email'), {}),
+            ('change_password', buyer_client, 'get', reverse('change_password'), {}),
+            ('listings_view', seller_client, 'get', reverse('listings_view'), {}),
+            ('watchlist_view', buyer_client, 'get', reverse('watchlist_view'), {}),
+            ('add_listing', seller_client, 'get', reverse('add_listing'), {}),
+            ('categories_view', anonymous, 'get', reverse('categories_view'), {}),
+            ('browse_listings_category', anonymous, 'post', reverse('browse_listings_category'), {'category_id': category.id}),
+            ('browse_listings_category (by price)', anonymous, 'get', reverse('browse_listings_category'),
+             {'category_id': category.id, 'sort': 'price', 'min_price': 2}),
+            ('search', anonymous, 'get', reverse('search'), {'q': 'book', 'category_id': category.id, 'min_price': 1}),
+            ('api_listings', anonymous, 'get', reverse('api_listings'), {'category': category.id}),
+            ('api_listings (by price)', anonymous, 'get', reverse('api_listings'), {'sort': 'price_desc', 'min_price': 2}),
+            ('api_listing_detail', anonymous, 'get', reverse('api_listing_detail', args=[listing.id]), {}),
+            ('api_listing_bids', anonymous, 'get', reverse('api_listing_bids', args=[listing.id]), {}),
+            ('api_categories', anonymous, 'get', reverse('api_categories'), {}),
+            ('add_bid', buyer_client, 'post', reverse('add_bid'), {'bid_value': 3, 'listing_id': listing.id}),
+            ('add_comment', buyer_client, 'post', reverse('add_comment'), {
+                'listing_id': listing.id, 'comment_content': 'Still available?', 'comment_author': buyer.id
+            }),
+            ('add_reply', seller_client, 'post', reverse('add_reply'), {
+                'comment_id': comment.id, 'reply_content': 'Yes', 'listing_id': listing.id
+            }),
+            ('add_to_watchlist', buyer_client, 'post', reverse('add_to_watchlist'), {'listing_id': listing.id}),
+            ('remove_from_watchlist', buyer_client, 'post', reverse('remove_from_watchlist'), {'listing_id': listing.id}),
+            ('listing_deactivate', seller_client, 'post', reverse('listing_deactivate'), {'listing_id': listings[2].id}),
+            ('listing_activate', seller_client, 'post', reverse('listing_activate'), {'listing_id': listings[2].id}),
+            ('listing_end', seller_client, 'post', reverse('listing_end'), {'listing_id': listing.id}),
+            ('listing_delete', seller_client, 'post', reverse('listing_delete'), {'listing_id': listings[3].id}),
+            ('logout', buyer_client, 'get', reverse('logout'), {}),
+        ]
+
+        queries = defaultdict(list)
+        for name, client, method, url, data in requests:
+            with CaptureQueriesContext(connection) as captured:
+                getattr(client, method)(url, data)
+            queries[name].extend(query['sql'] for query in captured.captured_queries)
+        return queries
+
+    def explain(self, queries, verbose):
+        problems = []
+        with connection.cursor() as cursor:
+            for view, statements in queries.items():
+                for sql in statements:
+                    if not sql.lstrip().upper().startswith(EXPLAINED_STATEMENTS):
+                        continue
+                    cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+                    plan = [row[-1] for row in cursor.fetchall()]
+                    if verbose:
+                        self.stdout.write(f"{view}: {sql}\n    " + "\n    ".join(plan))
+                    for line in plan:
+                        if FULL_SCAN.search(line):
+                            problems.append((view, sql, line))
+        return problems
@@ -0,0 +1,54 @@
+import csv
+import json
+
+from django.core.management.base import BaseCommand
+
+from auctions.catalog import COLUMNS, FORMATS, format_row, guess_format, open_catalog
+from auctions.models import Listing
+
+
+class Command(BaseCommand):
+    help = (
+        "Exports listings to CSV or JSON Lines file (see auctions/catalog.py for columns), "
+        "streaming rows from database in chunks."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', nargs='?', default='-', help="Output file, stdout by default.")
+        parser.add_argument('--format', choices=FORMATS, help="File format, guessed from extension by default.")
+        parser.add_argument('--active', action='store_true', help="Exports only active listings.")
+        parser.add_argument('--category', help="Exports only listings of category with this name.")
+        parser.add_argument('--seller', help="Exports only listings of user with this username.")
+        parser.add_argument('--chunk-size', type=int, default=2000, help="Number of rows fetched from database at once.")
+
+    def handle(self, *args, **options):
+        listings = Listing.objects.all()
+        if options['active']:
+            listings = listings.filter(active=True)
+        if options['category']:
+            listings = listings.filter(category__name=options['category'])
+        if options['seller']:
+            listings = listings.filter(user__username=options['seller'])
+
+        # Values of columns ordered as COLUMNS, category and seller by name.
+        rows = listings.order_by('id').values_list(
+            'title', 'description', 'starting_price', 'current_price',
+            'category__name', 'user__username', 'date_added', 'active'
+        ).iterator(chunk_size=options['chunk_size'])
+
+        format = guess_format(options['path'], options['format'])
+        exported = 0
+        with open_catalog(options['path'], 'w') as file:
+            if format == 'csv':
+                writer = csv.DictWriter(file, fieldnames=COLUMNS)
+                writer.writeheader()
+                for values in rows:
+                    writer.writerow(format_row(values))
+                    exported += 1
+            else:
+                for values in rows:
+                    file.write(json.dumps(format_row(values), separators=(',', ':')) + '\n')
+                    exported += 1
+
+        if options['path'] != '-':
+            self.stdout.write(self.style.SUCCESS(f"Exported {exported} listing(s)."))
@@ -0,0 +1,153 @@
+import json
+from itertools import islice
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, transaction
+
+from auctions.benchmark import Timer
+from auctions.catalog import FORMATS, RowError, guess_format, open_catalog, parse_row, read_rows
+from auctions.models import Category, Listing, User
+
+
+# Number of usernames resolved with single query (below SQLite's variable limit).
+USERNAME_CHUNK = 500
+
+# Number of row errors printed to stderr, the rest is only counted (see --errors).
+PRINTED_ERRORS = 20
+
+
+class Command(BaseCommand):
+    help = (
+        "Imports listings from CSV or JSON Lines file (see auctions/catalog.py for columns), "
+        "streaming it in batches inserted with bulk_create. Invalid rows are reported "
+        "and skipped, the rest of their batch is imported."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Catalog file, '-' reads stdin.")
+        parser.add_argument('--format', choices=FORMATS, help="File format, guessed from extension by default.")
+        parser.add_argument('--seller', help="Username of seller of rows without seller column.")
+        parser.add_argument('--create-categories', action='store_true', help="Creates categories missing in database.")
+        parser.add_argument('--batch-size', type=int, default=5000, help="Number of rows inserted per transaction.")
+        parser.add_argument('--errors', help="Writes every row error to this file as JSON Lines.")
+        parser.add_argument('--dry-run', action='store_true', help="Only validates rows.")
+
+    def handle(self, *args, **options):
+        default_seller_id = None
+        if options['seller']:
+            default_seller_id = User.objects.filter(username=options['seller']).values_list('id', flat=True).first()
+            if default_seller_id is None:
+                raise CommandError(f"User {options['seller']} does not exist.")
+
+        # Categories are few, so all of them are resolved up front.
+        self.category_ids = dict(Category.objects.values_list('name', 'id'))
+        self.seller_ids = {}
+        self.create_categories = options['create_categories']
+        self.dry_run = options['dry_run']
+        # Names of categories created (or, with --dry-run, to be created).
+        self.new_categories = []
+
+        self.imported = 0
+        self.failed = 0
+        error_file = open(options['errors'], 'w', encoding='utf-8') if options['errors'] else None
+        self.error_file = error_file
+
+        try:
+            with open_catalog(options['path'], 'r') as file, Timer() as timer:
+                rows = read_rows(file, guess_format(options['path'], options['format']))
+                while True:
+                    batch = list(islice(rows, options['batch_size']))
+                    if not batch:
+                        break
+                    listings = self.parse_batch(batch, default_seller_id)
+                    if not options['dry_run']:
+                        self.insert_batch(listings)
+                    else:
+                        self.imported += len(listings)
+        finally:
+            if error_file:
+                error_file.close()
+
+        rate = round(self.imported / timer.elapsed) if timer.elapsed else 0
+        verb = "Validated" if options['dry_run'] else "Imported"
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {self.imported} listing(s) in {timer.elapsed:.1f}s ({rate} rows/s), {self.failed} row(s) failed."
+        ))
+        if self.new_categories:
+            verb = "Would create" if options['dry_run'] else "Created"
+            self.stdout.write(f"{verb} {len(self.new_categories)} new category(ies): {', '.join(self.new_categories)}.")
+
+    def parse_batch(self, batch, default_seller_id):
+        '''
+        Returns list of (line number, listing) pairs of valid rows of batch.
+        '''
+        self.resolve_sellers(row for _, row in batch if isinstance(row, dict))
+
+        listings = []
+        for line_number, row in batch:
+            try:
+                if isinstance(row, RowError):
+                    raise row
+                if self.create_categories:
+                    self.ensure_category(row.get('category'))
+                listings.append((line_number, parse_row(row, self.category_ids, self.seller_ids, default_seller_id)))
+            except RowError as error:
+                self.report(line_number, error)
+        return listings
+
+    def resolve_sellers(self, rows):
+        '''
+        Adds ids of sellers of rows not seen before to seller cache.
+        '''
+        usernames = {str(row['seller']) for row in rows if row.get('seller')} - set(self.seller_ids)
+        usernames = list(usernames)
+        for start in range(0, len(usernames), USERNAME_CHUNK):
+            self.seller_ids.update(
+                User.objects.filter(username__in=usernames[start:start + USERNAME_CHUNK]).values_list('username', 'id')
+            )
+
+    def ensure_category(self, name):
+        if name in (None, '') or str(name) in self.category_ids:
+            return
+        name = str(name)
+        if len(name) > Category._meta.get_field('name').max_length:
+            raise RowError("Category name is too long.")
+        self.new_categories.append(name)
+        if self.dry_run:
+            # Placeholder id, dry run never inserts anything.
+            self.category_ids[name] = -len(self.new_categories)
+        else:
+            self.category_ids[name] = Category.objects.create(name=name).id
+
+    def insert_batch(self, listings):
+        '''
+        Inserts batch with bulk_create in one transaction.
+        When database refuses it, rows are inserted one by one,
+        so only failing rows are skipped.
+        '''
+        try:
+            with transaction.atomic():
+                Listing.objects.bulk_create([listing for _, listing in listings])
+            self.imported += len(listings)
+            return
+        except DatabaseError:
+            pass
+
+        with transaction.atomic():
+            for line_number, listing in listings:
+                try:
+                    with transaction.atomic():
+                        listing.save(force_insert=True)
+                    self.imported += 1
+                except DatabaseError as error:
+                    listing.pk = None
+                    self.report(line_number, error)
+
+    def report(self, line_number, error):
+        self.failed += 1
+        if self.failed <= PRINTED_ERRORS:
+            self.stderr.write(f"Line {line_number}: {error}")
+        elif self.failed == PRINTED_ERRORS + 1 and not self.error_file:
+            self.stderr.write("More errors were not printed, use --errors to save all of them.")
+        if self.error_file:
+            self.error_file.write(json.dumps({'line': line_number, 'error': str(error)}) + '\n')
@@ -0,0 +1,51 @@
+import time
+from importlib import import_module
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+
+class Command(BaseCommand):
+    help = (
+        "Removes expired sessions in small batches, so purge never holds "
+        "database write lock for long. With --interval keeps running and purges periodically."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help="Number of sessions deleted per transaction.")
+        parser.add_argument('--interval', type=int, help="Repeats purge every given number of seconds.")
+
+    def handle(self, *args, **options):
+        while True:
+            removed = self.purge(options['batch_size'])
+            if removed is None:
+                self.stdout.write("Sessions are not stored in database, nothing to purge.")
+                return
+            self.stdout.write(f"Removed {removed} expired sessions.")
+
+            if not options['interval']:
+                return
+            time.sleep(options['interval'])
+
+    def purge(self, batch_size):
+        '''
+        Returns number of removed sessions
+        or None if session engine doesn't keep sessions in database.
+        '''
+        session_store = import_module(settings.SESSION_ENGINE).SessionStore
+        if not hasattr(session_store, 'get_model_class'):
+            # E.g. signed cookies expire on their own, cache and file backends clean up themselves.
+            session_store.clear_expired()
+            return None
+
+        # Expiry date is indexed, so each batch is found without full scan.
+        expired = session_store.get_model_class().objects.filter(expire_date__lt=timezone.now())
+        removed = 0
+        while True:
+            with transaction.atomic():
+                keys = list(expired.values_list('session_key', flat=True)[:batch_size])
+                if not keys:
+                    return removed
+                removed += expired.filter(session_key__in=keys).delete()[0]
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from auctions.benchmark import Timer
+from auctions.bidding import refresh_bid_stats
+from auctions.models import Listing
+
+
+class Command(BaseCommand):
+    help = (
+        "Recomputes bid count and top bid of listings from their bids, in batches. "
+        "Run it after bids were changed outside place_bid (e.g. raw SQL or data import)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('listing_ids', nargs='*', type=int, help="Ids of listings to repair, all by default.")
+
+    def handle(self, *args, **options):
+        listings = Listing.objects.all()
+        if options['listing_ids']:
+            listings = listings.filter(id__in=options['listing_ids'])
+
+        with Timer() as timer:
+            repaired = refresh_bid_stats(listings)
+        self.stdout.write(self.style.SUCCESS(f"Recomputed bid statistics of {repaired} listing(s) in {timer.elapsed:.1f}s."))
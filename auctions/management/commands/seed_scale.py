@@ -0,0 +1,299 @@
+import datetime
+import math
+import random
+from bisect import bisect
+from itertools import accumulate
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.utils import timezone
+
+from auctions import fts
+from auctions.benchmark import Timer
+from auctions.models import Bid, Category, Comment, Contact, Listing, PriceField, User, Watchlist
+
+
+# Number of listings generated (with their bids and comments) per transaction.
+CHUNK_SIZE = 10000
+
+# Highest price in cents, bidding on listing stops before passing it.
+MAX_CENTS = int(PriceField.MAX_VALUE * 100)
+
+# Pragmas speeding up bulk load: no fsync, rollback journal and temp tables
+# in memory, bigger page cache. Previous values are restored afterwards.
+LOAD_PRAGMAS = {
+    'synchronous': 'OFF',
+    'journal_mode': 'MEMORY',
+    'temp_store': 'MEMORY',
+    'cache_size': '-262144',
+}
+
+WORDS = (
+    'vintage', 'new', 'used', 'rare', 'classic', 'wooden', 'leather', 'silver', 'golden', 'antique',
+    'handmade', 'modern', 'small', 'large', 'retro', 'signed', 'boxed', 'mint', 'original', 'limited',
+    'camera', 'watch', 'guitar', 'lamp', 'chair', 'book', 'bicycle', 'vase', 'poster', 'jacket',
+    'phone', 'record', 'clock', 'painting', 'table', 'ring', 'console', 'radio', 'mirror', 'bag',
+)
+
+CATEGORY_NAMES = (
+    'Electronics', 'Fashion', 'Home', 'Books', 'Toys', 'Sports', 'Music', 'Art', 'Garden', 'Jewelry',
+    'Collectibles', 'Motors', 'Health', 'Beauty', 'Pets', 'Tools', 'Games', 'Photography', 'Antiques', 'Crafts',
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Generates deterministic synthetic data for scale testing: users with contacts, categories, "
+        "listings, bids, comments and watchlists. Categories and sellers are Zipf distributed "
+        "(few hot ones), numbers of bids and comments per listing are log-normal (most listings get few, "
+        "some get hundreds). Every generated user has password 'password'."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--listings', type=int, default=10000, help="Number of listings.")
+        parser.add_argument('--users', type=int, help="Number of users (listings / 10 by default).")
+        parser.add_argument('--categories', type=int, default=50, help="Number of categories.")
+        parser.add_argument('--bids-per-listing', type=float, default=5.0, help="Mean number of bids per listing.")
+        parser.add_argument('--comments-per-listing', type=float, default=2.0, help="Mean number of comments per listing.")
+        parser.add_argument('--watchlist-per-user', type=float, default=5.0, help="Mean watchlist size.")
+        parser.add_argument('--days', type=int, default=365, help="Listings are spread over this many past days.")
+        parser.add_argument('--seed', type=int, default=1, help="Random seed, same seed gives same data (dates are relative to now).")
+        parser.add_argument('--append', action='store_true', help="Allows adding data to non-empty database.")
+
+    def handle(self, *args, **options):
+        if Listing.objects.exists() and not options['append']:
+            raise CommandError("Database already has listings, use --append to add generated data anyway.")
+        if options['listings'] < 1:
+            raise CommandError("Generate at least one listing.")
+
+        self.rng = random.Random(options['seed'])
+        self.counts = {}
+        user_count = options['users'] or max(10, options['listings'] // 10)
+
+        with Timer() as timer, self.load_mode():
+            users = self.generate_users(user_count)
+            categories = self.generate_categories(options['categories'])
+            listings = self.generate_listings(options, users, categories)
+            self.generate_watchlists(options, users, listings)
+            self.reset_sequences()
+
+        total = sum(self.counts.values())
+        self.stdout.write(', '.join(f"{name}: {count}" for name, count in self.counts.items()))
+        self.stdout.write(self.style.SUCCESS(
+            f"Generated {total} rows in {timer.elapsed:.1f}s ({round(total / timer.elapsed)} rows/s)."
+        ))
+
+    def load_mode(self):
+        '''
+        Returns context manager setting loading pragmas and suspending
+        full-text index triggers (index is rebuilt once at the end) on SQLite.
+        '''
+        command = self
+
+        class LoadMode:
+            def __enter__(self):
+                self.previous = {}
+                if connection.vendor != 'sqlite':
+                    return
+                with connection.cursor() as cursor:
+                    for pragma, value in LOAD_PRAGMAS.items():
+                        cursor.execute(f'PRAGMA {pragma}')
+                        self.previous[pragma] = cursor.fetchone()[0]
+                        cursor.execute(f'PRAGMA {pragma} = {value}')
+                    for statement in fts.DROP_TRIGGERS:
+                        cursor.execute(statement)
+
+            def __exit__(self, *exc_info):
+                if connection.vendor != 'sqlite':
+                    return
+                with connection.cursor() as cursor:
+                    command.stdout.write("Rebuilding full-text index...")
+                    for statement in fts.CREATE_TRIGGERS + [fts.REBUILD]:
+                        cursor.execute(statement)
+                    for pragma, value in self.previous.items():
+                        cursor.execute(f'PRAGMA {pragma} = {value}')
+
+        return LoadMode()
+
+    def insert(self, model, columns, rows):
+        '''
+        Inserts rows (tuples of database values ordered as columns)
+        with single executemany, skipping ORM object construction.
+        '''
+        if not rows:
+            return
+        quote = connection.ops.quote_name
+        sql = 'INSERT INTO {} ({}) VALUES ({})'.format(
+            quote(model._meta.db_table),
+            ', '.join(quote(model._meta.get_field(column).column) for column in columns),
+            ', '.join(['%s'] * len(columns))
+        )
+        with connection.cursor() as cursor:
+            cursor.executemany(sql, rows)
+        self.counts[model.__name__] = self.counts.get(model.__name__, 0) + len(rows)
+
+    def next_id(self, model):
+        last = model.objects.order_by('-id').values_list('id', flat=True).first()
+        return (last or 0) + 1
+
+    def zipf_weights(self, count, exponent):
+        '''
+        Returns cumulative weights of Zipf distribution, the first item is the hottest.
+        '''
+        return list(accumulate(1 / (rank ** exponent) for rank in range(1, count + 1)))
+
+    def pick(self, items, cumulative):
+        return items[bisect(cumulative, self.rng.random() * cumulative[-1])]
+
+    def lognormal_count(self, mean, sigma=1.2):
+        '''
+        Returns skewed non-negative count with given mean.
+        '''
+        if mean <= 0:
+            return 0
+        mu = math.log(mean) - sigma ** 2 / 2
+        return int(self.rng.lognormvariate(mu, sigma))
+
+    def text(self, word_count):
+        return ' '.join(self.rng.choice(WORDS) for _ in range(word_count))
+
+    def db_datetime(self, value):
+        return connection.ops.adapt_datetimefield_value(value)
+
+    def generate_users(self, count):
+        '''
+        Creates users (all with the same password) and their contacts.
+        Returns list of user ids.
+        '''
+        password = make_password('password')
+        joined = self.db_datetime(timezone.now())
+        first_id = self.next_id(User)
+        prefix = f'user{first_id}_'
+        ids = list(range(first_id, first_id + count))
+
+        with transaction.atomic():
+            for start in range(0, count, CHUNK_SIZE):
+                chunk = ids[start:start + CHUNK_SIZE]
+                self.insert(
+                    User,
+                    ('id', 'password', 'is_superuser', 'username', 'first_name', 'last_name',
+                     'email', 'is_staff', 'is_active', 'date_joined'),
+                    [(user_id, password, False, f'{prefix}{user_id}', '', '', f'{prefix}{user_id}@example.com',
+                      False, True, joined) for user_id in chunk]
+                )
+                self.insert(
+                    Contact,
+                    ('user', 'city', 'country'),
+                    [(user_id, self.rng.choice(('Warsaw', 'Krakow', 'Gdansk', 'Berlin', 'Prague')), 'Poland')
+                     for user_id in chunk]
+                )
+        return ids
+
+    def generate_categories(self, count):
+        '''
+        Returns list of category ids, the hottest first.
+        '''
+        first_id = self.next_id(Category)
+        names = [
+            CATEGORY_NAMES[i % len(CATEGORY_NAMES)] + (f' {i // len(CATEGORY_NAMES) + 1}' if i >= len(CATEGORY_NAMES) else '')
+            for i in range(count)
+        ]
+        ids = list(range(first_id, first_id + count))
+        with transaction.atomic():
+            self.insert(Category, ('id', 'name'), list(zip(ids, names)))
+        return ids
+
+    def generate_listings(self, options, users, categories):
+        '''
+        Creates listings with their bids and comments, chunk by chunk.
+        Returns list of listing ids.
+        '''
+        category_weights = self.zipf_weights(len(categories), 1.1)
+        seller_weights = self.zipf_weights(len(users), 0.8)
+        now = timezone.now()
+        span = datetime.timedelta(days=options['days']).total_seconds()
+
+        first_id = self.next_id(Listing)
+        next_bid_id = self.next_id(Bid)
+        ids = list(range(first_id, first_id + options['listings']))
+
+        for start in range(0, len(ids), CHUNK_SIZE):
+            listings, bids, comments = [], [], []
+            for listing_id in ids[start:start + CHUNK_SIZE]:
+                seller = self.pick(users, seller_weights)
+                added = now - datetime.timedelta(seconds=self.rng.random() * span)
+                # Prices are database values, whole cents (see PriceField).
+                starting_price = round(math.exp(self.rng.uniform(0, 7)) * 100)
+
+                # Bids raise price step by step, the last one is the top bid.
+                price = starting_price
+                top_bidder = top_bid_id = last_bid_at = None
+                bid_count = 0
+                for _ in range(self.lognormal_count(options['bids_per_listing'])):
+                    bidder = self.rng.choice(users)
+                    if bidder == seller:
+                        continue
+                    next_price = round(price * self.rng.uniform(1.01, 1.1) + 100)
+                    if next_price > MAX_CENTS:
+                        break
+                    price = next_price
+                    bids.append((next_bid_id, price, bidder, listing_id))
+                    top_bidder, top_bid_id = bidder, next_bid_id
+                    bid_count += 1
+                    next_bid_id += 1
+                if bid_count:
+                    last_bid_at = self.db_datetime(added + (now - added) * self.rng.random())
+
+                # Older listings are more likely to be ended.
+                active = self.rng.random() > 0.4 * (now - added).total_seconds() / span
+                winner = str(top_bidder) if not active and top_bidder else None
+
+                listings.append((
+                    listing_id, self.text(3).capitalize()[:30], self.text(self.rng.randint(8, 30))[:500],
+                    starting_price, price, 'default.jpg', '', seller, self.pick(categories, category_weights),
+                    self.db_datetime(added), active, winner, bid_count, top_bid_id, last_bid_at,
+                    '%032x' % self.rng.getrandbits(128)
+                ))
+
+                for _ in range(self.lognormal_count(options['comments_per_listing'])):
+                    commented = added + datetime.timedelta(seconds=self.rng.random() * (now - added).total_seconds())
+                    reply = self.text(5) if self.rng.random() < 0.3 else None
+                    comments.append((self.db_datetime(commented), self.text(10)[:140], reply, listing_id,
+                                     self.rng.choice(users)))
+
+            with transaction.atomic():
+                self.insert(
+                    Listing,
+                    ('id', 'title', 'description', 'starting_price', 'current_price', 'photo', 'photo_widths',
+                     'user', 'category', 'date_added', 'active', 'winner', 'bid_count', 'top_bid', 'last_bid_at',
+                     'version'),
+                    listings
+                )
+                self.insert(Bid, ('id', 'value', 'user', 'listing'), bids)
+                self.insert(Comment, ('date_added', 'content', 'reply', 'listing', 'author'), comments)
+        return ids
+
+    def generate_watchlists(self, options, users, listings):
+        '''
+        Adds skewed number of listings (popular ones more often) to every user's watchlist.
+        '''
+        listing_weights = self.zipf_weights(len(listings), 0.6)
+        for start in range(0, len(users), CHUNK_SIZE):
+            rows = []
+            for user_id in users[start:start + CHUNK_SIZE]:
+                watched = {self.pick(listings, listing_weights)
+                           for _ in range(self.lognormal_count(options['watchlist_per_user'], sigma=0.8))}
+                rows.extend((user_id, listing_id) for listing_id in watched)
+            with transaction.atomic():
+                self.insert(Watchlist, ('user', 'listing'), rows)
+
+    def reset_sequences(self):
+        '''
+        Moves id sequences past explicitly inserted ids (no-op on SQLite).
+        '''
+        statements = connection.ops.sequence_reset_sql(no_style(), [User, Category, Listing, Bid])
+        with connection.cursor() as cursor:
+            for statement in statements:
+                cursor.execute(statement)
@@ -0,0 +1,49 @@
+import sqlite3
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from auctions.benchmark import Timer
+
+
+class Command(BaseCommand):
+    help = (
+        "Copies primary SQLite database to SQLite files standing in for read replicas "
+        "(see DATABASE_REPLICAS in settings) with online backup. With --interval keeps copying, "
+        "so replicas lag behind primary like real ones."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, help="Copies again every this many seconds, until interrupted.")
+
+    def handle(self, *args, **options):
+        if not settings.DATABASE_REPLICAS:
+            raise CommandError("No replicas configured, set AUCTIONS_REPLICA_DATABASES.")
+
+        primary = connections[DEFAULT_DB_ALIAS]
+        replicas = [connections[alias] for alias in settings.DATABASE_REPLICAS]
+        if any(connection.vendor != 'sqlite' for connection in [primary, *replicas]):
+            raise CommandError("Only SQLite replicas can be synced, real replicas are kept by database server.")
+
+        while True:
+            for replica in replicas:
+                with Timer() as timer:
+                    self.copy(primary.settings_dict['NAME'], replica.settings_dict['NAME'])
+                self.stdout.write(f"Copied primary to {replica.alias} in {timer.elapsed * 1000:.0f}ms.")
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
+
+    def copy(self, source_path, target_path):
+        '''
+        Copies consistent snapshot of source while it stays writable.
+        '''
+        source = sqlite3.connect(source_path)
+        target = sqlite3.connect(target_path)
+        try:
+            source.backup(target)
+        finally:
+            target.close()
+            source.close()
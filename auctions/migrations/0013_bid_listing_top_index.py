@@ -0,0 +1,17 @@
+# Generated by Django 3.1.3 on 2026-10-18 17:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auctions', '0012_auto_20201208_2058'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='bid',
+            index=models.Index(fields=['listing', '-value', 'id'], name='bid_listing_top_idx'),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 3.1.3 on 2026-10-18 17:48
+
+from django.db import migrations, models
+from django.db.models import Min
+
+
+def remove_duplicate_watchlist_positions(apps, schema_editor):
+    # Keeps the oldest position of every (user, listing) pair.
+    Watchlist = apps.get_model('auctions', 'Watchlist')
+    keep = Watchlist.objects.values('user_id', 'listing_id').annotate(keep_id=Min('id')).values('keep_id')
+    Watchlist.objects.exclude(id__in=keep).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auctions', '0014_listing_fts'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='category',
+            index=models.Index(fields=['name'], name='category_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['listing', 'date_added'], name='comment_listing_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='listing',
+            index=models.Index(condition=models.Q(active=True), fields=['date_added'], name='listing_active_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='listing',
+            index=models.Index(fields=['category', 'date_added'], name='listing_category_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='listing',
+            index=models.Index(fields=['user', 'date_added'], name='listing_user_date_idx'),
+        ),
+        migrations.RunPython(remove_duplicate_watchlist_positions, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='watchlist',
+            constraint=models.UniqueConstraint(fields=('user', 'listing'), name='watchlist_user_listing_unique'),
+        ),
+    ]
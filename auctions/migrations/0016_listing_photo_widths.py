@@ -0,0 +1,58 @@
+# Generated by Django 3.1.3 on 2026-10-18 17:49
+
+from django.db import migrations, models
+
+
+# Frozen copy of FTS trigger SQL (see auctions/fts.py), so later changes
+# to app code don't change what this migration does.
+CREATE_TRIGGERS = [
+    """
+    CREATE TRIGGER IF NOT EXISTS auctions_listing_fts_insert AFTER INSERT ON auctions_listing BEGIN
+        INSERT INTO auctions_listing_fts(rowid, title, description)
+        VALUES (new.id, new.title, new.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS auctions_listing_fts_delete AFTER DELETE ON auctions_listing BEGIN
+        INSERT INTO auctions_listing_fts(auctions_listing_fts, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS auctions_listing_fts_update AFTER UPDATE OF title, description ON auctions_listing BEGIN
+        INSERT INTO auctions_listing_fts(auctions_listing_fts, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+        INSERT INTO auctions_listing_fts(rowid, title, description)
+        VALUES (new.id, new.title, new.description);
+    END
+    """,
+    # Reindexes listings, in case rows changed while triggers were missing.
+    "INSERT INTO auctions_listing_fts(auctions_listing_fts) VALUES ('rebuild')",
+]
+
+
+def create_triggers(apps, schema_editor):
+    # FTS5 is SQLite feature, other databases are left untouched.
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for statement in CREATE_TRIGGERS:
+        schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auctions', '0015_hot_path_indexes'),
+    ]
+
+    operations = [
+        # Restores FTS triggers when this migration is reversed.
+        migrations.RunPython(migrations.RunPython.noop, create_triggers),
+        migrations.AddField(
+            model_name='listing',
+            name='photo_widths',
+            field=models.CharField(blank=True, default='', max_length=50),
+        ),
+        # Adding field rebuilds auctions_listing on SQLite, which drops FTS triggers.
+        migrations.RunPython(create_triggers, migrations.RunPython.noop),
+    ]
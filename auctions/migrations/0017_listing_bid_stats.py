@@ -0,0 +1,87 @@
+# Generated by Django 3.1.3 on 2026-10-18 18:19
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+import django.db.models.deletion
+
+
+# Frozen copy of FTS trigger SQL (see auctions/fts.py), so later changes
+# to app code don't change what this migration does.
+CREATE_TRIGGERS = [
+    """
+    CREATE TRIGGER IF NOT EXISTS auctions_listing_fts_insert AFTER INSERT ON auctions_listing BEGIN
+        INSERT INTO auctions_listing_fts(rowid, title, description)
+        VALUES (new.id, new.title, new.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS auctions_listing_fts_delete AFTER DELETE ON auctions_listing BEGIN
+        INSERT INTO auctions_listing_fts(auctions_listing_fts, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS auctions_listing_fts_update AFTER UPDATE OF title, description ON auctions_listing BEGIN
+        INSERT INTO auctions_listing_fts(auctions_listing_fts, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+        INSERT INTO auctions_listing_fts(rowid, title, description)
+        VALUES (new.id, new.title, new.description);
+    END
+    """,
+    # Reindexes listings, in case rows changed while triggers were missing.
+    "INSERT INTO auctions_listing_fts(auctions_listing_fts) VALUES ('rebuild')",
+]
+
+
+def create_triggers(apps, schema_editor):
+    # FTS5 is SQLite feature, other databases are left untouched.
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for statement in CREATE_TRIGGERS:
+        schema_editor.execute(statement)
+
+
+def fill_bid_stats(apps, schema_editor):
+    '''
+    Computes bid count and top bid of existing listings with one UPDATE.
+    Time of existing bids is unknown, so last bid time stays empty.
+    '''
+    Bid = apps.get_model('auctions', 'Bid')
+    Listing = apps.get_model('auctions', 'Listing')
+
+    bids = Bid.objects.filter(listing=OuterRef('pk')).order_by()
+    Listing.objects.update(
+        bid_count=Coalesce(Subquery(bids.values('listing').annotate(count=Count('id')).values('count')), 0),
+        top_bid_id=Subquery(bids.order_by('-value', 'id').values('id')[:1])
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auctions', '0016_listing_photo_widths'),
+    ]
+
+    operations = [
+        # Restores FTS triggers when this migration is reversed.
+        migrations.RunPython(migrations.RunPython.noop, create_triggers),
+        migrations.AddField(
+            model_name='listing',
+            name='bid_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='listing',
+            name='last_bid_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='listing',
+            name='top_bid',
+            field=models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='auctions.bid'),
+        ),
+        migrations.RunPython(fill_bid_stats, migrations.RunPython.noop),
+        # Adding fields rebuilds auctions_listing on SQLite, which drops FTS triggers.
+        migrations.RunPython(create_triggers, migrations.RunPython.noop),
+    ]
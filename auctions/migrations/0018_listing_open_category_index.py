@@ -0,0 +1,17 @@
+# Generated by Django 3.1.3 on 2026-10-18 18:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auctions', '0017_listing_bid_stats'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='listing',
+            index=models.Index(condition=models.Q(('active', True), ('winner__isnull', True)), fields=['category'], name='listing_open_category_idx'),
+        ),
+    ]
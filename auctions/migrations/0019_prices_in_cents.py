@@ -0,0 +1,90 @@
+# Generated by Django 3.1.3 on 2026-10-18 18:30
+
+import auctions.models
+from django.db import migrations, models
+
+
+# Frozen copy of FTS trigger SQL (see auctions/fts.py), so later changes
+# to app code don't change what this migration does.
+CREATE_TRIGGERS = [
+    """
+    CREATE TRIGGER IF NOT EXISTS auctions_listing_fts_insert AFTER INSERT ON auctions_listing BEGIN
+        INSERT INTO auctions_listing_fts(rowid, title, description)
+        VALUES (new.id, new.title, new.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS auctions_listing_fts_delete AFTER DELETE ON auctions_listing BEGIN
+        INSERT INTO auctions_listing_fts(auctions_listing_fts, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS auctions_listing_fts_update AFTER UPDATE OF title, description ON auctions_listing BEGIN
+        INSERT INTO auctions_listing_fts(auctions_listing_fts, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+        INSERT INTO auctions_listing_fts(rowid, title, description)
+        VALUES (new.id, new.title, new.description);
+    END
+    """,
+    # Reindexes listings, in case rows changed while triggers were missing.
+    "INSERT INTO auctions_listing_fts(auctions_listing_fts) VALUES ('rebuild')",
+]
+
+
+def create_triggers(apps, schema_editor):
+    # FTS5 is SQLite feature, other databases are left untouched.
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for statement in CREATE_TRIGGERS:
+        schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auctions', '0018_listing_open_category_index'),
+    ]
+
+    operations = [
+        # Restores FTS triggers when this migration is reversed.
+        migrations.RunPython(migrations.RunPython.noop, create_triggers),
+        # Prices become whole cents while columns still hold floats,
+        # listings without bids get current price.
+        migrations.RunSQL(
+            [
+                'UPDATE auctions_listing SET current_price = starting_price WHERE current_price IS NULL',
+                'UPDATE auctions_listing SET starting_price = ROUND(starting_price * 100), current_price = ROUND(current_price * 100)',
+                'UPDATE auctions_bid SET value = ROUND(value * 100)',
+            ],
+            [
+                'UPDATE auctions_listing SET starting_price = starting_price / 100.0, current_price = current_price / 100.0',
+                'UPDATE auctions_bid SET value = value / 100.0',
+            ],
+        ),
+        migrations.AlterField(
+            model_name='bid',
+            name='value',
+            field=auctions.models.PriceField(),
+        ),
+        migrations.AlterField(
+            model_name='listing',
+            name='current_price',
+            field=auctions.models.PriceField(),
+        ),
+        migrations.AlterField(
+            model_name='listing',
+            name='starting_price',
+            field=auctions.models.PriceField(),
+        ),
+        migrations.AddIndex(
+            model_name='listing',
+            index=models.Index(condition=models.Q(active=True), fields=['current_price'], name='listing_active_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='listing',
+            index=models.Index(condition=models.Q(active=True), fields=['category', 'current_price'], name='listing_category_price_idx'),
+        ),
+        # Altering fields rebuilds auctions_listing on SQLite, which drops FTS triggers.
+        migrations.RunPython(create_triggers, migrations.RunPython.noop),
+    ]
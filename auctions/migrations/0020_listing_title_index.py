@@ -0,0 +1,17 @@
+# Generated by Django 3.1.3 on 2026-10-18 18:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auctions', '0019_prices_in_cents'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='listing',
+            index=models.Index(fields=['title'], name='listing_title_idx'),
+        ),
+    ]
@@ -1,12 +1,64 @@
 import datetime
+import uuid
+from decimal import ROUND_HALF_UP, Decimal, InvalidOperation
+
+from django import forms
 from django.contrib.auth.models import AbstractUser
+from django.core import exceptions
 from django.db import models
+from django.db.models.functions import Cast
 from django.utils import timezone
 
+
+class PriceField(models.Field):
+    '''
+    Price stored as whole number of cents, exposed as Decimal with 2 places.
+    Comparisons and ordering in database are exact integer ones,
+    on every backend (SQLite stores DecimalField as floating point).
+    '''
+    description = "Price in cents"
+    empty_strings_allowed = False
+    # Highest price whose cents fit into signed 64-bit integer.
+    MAX_VALUE = Decimal(2 ** 63 // 100 - 1)
+
+    def get_internal_type(self):
+        return 'BigIntegerField'
+
+    def to_python(self, value):
+        if value is None:
+            return value
+        try:
+            # Floats go through str, so 0.1 becomes 0.10, not its binary approximation.
+            price = Decimal(str(value))
+            if price.is_finite() and abs(price) <= self.MAX_VALUE:
+                return price.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+        except (InvalidOperation, ValueError):
+            pass
+        raise exceptions.ValidationError("'%(value)s' is not a valid price.", code='invalid', params={'value': value})
+
+    def from_db_value(self, value, expression, connection):
+        if value is None:
+            return value
+        return Decimal(int(value)).scaleb(-2)
+
+    def get_prep_value(self, value):
+        value = super().get_prep_value(value)
+        if value is None:
+            return None
+        return int(self.to_python(value).scaleb(2))
+
+    def formfield(self, **kwargs):
+        return super().formfield(**{'form_class': forms.DecimalField, 'decimal_places': 2, **kwargs})
+
+
 class User(AbstractUser):
     pass
 
 
+def new_version():
+    return uuid.uuid4().hex
+
+
 class Contact(models.Model):
     '''
     Model for user's contact data.
@@ -20,10 +72,15 @@ class Contact(models.Model):
     country = models.CharField(max_length=30, blank=True, null=True)
     user = models.ForeignKey(User, on_delete=models.CASCADE)
 
+    class Meta:
+        indexes = [
+            # Admin search by city prefix (see auctions/admin.py).
+            models.Index(fields=['city'], name='contact_city_idx'),
+        ]
+
     def get_username(self):
-        user = User.objects.get(id=self.user_id)
-        username = user.username
-        return username
+        # Uses joined user when it was loaded with select_related.
+        return self.user.username
 
     def __str__(self):
         return "Contact card for: " + str(self.get_username())
@@ -36,6 +93,11 @@ class Category(models.Model):
     '''
     name = models.CharField(max_length=20)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['name'], name='category_name_idx'),
+        ]
+
     def __str__(self):
         return self.name
 
@@ -49,15 +111,57 @@ class Listing(models.Model):
     '''
     title = models.CharField(max_length=30)
     description = models.CharField(max_length=500)
-    starting_price = models.FloatField()
-    current_price = models.FloatField(blank=True, null=True)
+    starting_price = PriceField()
+    # Equals starting price until the first bid.
+    current_price = PriceField()
     photo = models.ImageField(upload_to='listing_images', default='default.jpg')
+    # Comma separated widths of generated photo variants, empty until they are ready.
+    photo_widths = models.CharField(max_length=50, blank=True, default='')
     # Connection with User
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     category = models.ForeignKey(Category, on_delete=models.CASCADE)
     date_added = models.DateTimeField(default=timezone.now)
     active = models.BooleanField(default=True)
     winner = models.CharField(max_length=30, blank=True, null=True)
+    # Bid statistics kept in step with bids by place_bid (see auctions/bidding.py),
+    # so pages show them without aggregating bids. Command repair_bid_stats recomputes them.
+    # Top bid has no database constraint and is never cascaded, so bids can be fast deleted.
+    bid_count = models.PositiveIntegerField(default=0)
+    top_bid = models.ForeignKey(
+        'Bid', on_delete=models.DO_NOTHING, db_constraint=False, blank=True, null=True, related_name='+'
+    )
+    last_bid_at = models.DateTimeField(blank=True, null=True)
+    # Replaced with new token by every write of listing (save and every UPDATE of it),
+    # so API ETags are derived from it without loading rows (see auctions/api.py).
+    version = models.CharField(max_length=32, default=new_version, editable=False)
+
+    class Meta:
+        indexes = [
+            # Listing feeds, newest first (id is appended to every SQLite index).
+            # Feed of active listings uses partial index, which holds active listings only.
+            models.Index(fields=['date_added'], condition=models.Q(active=True), name='listing_active_date_idx'),
+            models.Index(fields=['category', 'date_added'], name='listing_category_date_idx'),
+            models.Index(fields=['user', 'date_added'], name='listing_user_date_idx'),
+            # Active listings by price, globally and per category (see auctions/browsing.py).
+            models.Index(fields=['current_price'], condition=models.Q(active=True), name='listing_active_price_idx'),
+            models.Index(
+                fields=['category', 'current_price'], condition=models.Q(active=True),
+                name='listing_category_price_idx'
+            ),
+            # Numbers of open listings per category (see auctions/categories.py), counted from index only.
+            models.Index(
+                fields=['category'], condition=models.Q(active=True, winner__isnull=True),
+                name='listing_open_category_idx'
+            ),
+            # Admin search by title prefix (see auctions/admin.py).
+            models.Index(fields=['title'], name='listing_title_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        self.version = new_version()
+        if kwargs.get('update_fields') is not None:
+            kwargs['update_fields'] = {*kwargs['update_fields'], 'version'}
+        super().save(*args, **kwargs)
 
     def get_status(self):
         if self.active == 1:
@@ -69,20 +173,29 @@ class Listing(models.Model):
         return self.id
 
     def get_username(self):
-        user = User.objects.get(id=self.user_id)
-        username = user.username
-        return username
+        # Uses joined user when it was loaded with select_related.
+        return self.user.username
 
     def get_winner_username(self):
+        # Listing has to be annotated with winner_username(),
+        # so pages don't run query per sold listing.
         if self.winner:
-            user = User.objects.get(id=self.winner)
-            username = user.username
-            return username
+            return self.winner_username
 
     def __str__(self):
         return "Listing with id: " + str(self.get_id()) + " assigned author: " + str(self.get_username()) + " title: " + self.title
 
 
+def winner_username():
+    '''
+    Returns subquery of listing's winner username for annotation,
+    read by Listing.get_winner_username. Winner holds user id as text.
+    '''
+    return models.Subquery(
+        User.objects.filter(id=Cast(models.OuterRef('winner'), models.IntegerField())).values('username')[:1]
+    )
+
+
 class Comment(models.Model):
     '''
     Model for comment.
@@ -99,6 +212,12 @@ class Comment(models.Model):
     # Connection with User
     author = models.ForeignKey(User, on_delete=models.CASCADE)
 
+    class Meta:
+        indexes = [
+            # Comment section, newest first.
+            models.Index(fields=['listing', 'date_added'], name='comment_listing_date_idx'),
+        ]
+
     def get_id(self):
         return self.id
 
@@ -106,11 +225,8 @@ class Comment(models.Model):
         return self.listing_id
 
     def get_listing_author_username(self):
-        listing = Listing.objects.get(id=self.listing_id)
-        listing_author_id = listing.user_id
-        author = User.objects.get(id=listing_author_id)
-        username = author.username
-        return username
+        # Uses joined listing and its author when they were loaded with select_related.
+        return self.listing.user.username
 
     def __str__(self):
         return "Comment for listing of id: " + str(self.get_listing_id()) + " of author: " + str(self.get_listing_author_username())
@@ -121,12 +237,18 @@ class Bid(models.Model):
     Model for listing's bid.
     Contains bid offered and listing ID. 
     '''
-    value = models.FloatField()
+    value = PriceField()
     # Connection with User
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     # Connection with Listing
     listing = models.ForeignKey(Listing, on_delete=models.CASCADE)
 
+    class Meta:
+        indexes = [
+            # Top bid of listing is the first entry of this index.
+            models.Index(fields=['listing', '-value', 'id'], name='bid_listing_top_idx'),
+        ]
+
     def __str__(self):
         listing = str(self.listing)
         value = str(self.value)
@@ -144,9 +266,15 @@ class Watchlist(models.Model):
     # Connection with Listing
     listing = models.ForeignKey(Listing, on_delete=models.CASCADE)
 
+    class Meta:
+        constraints = [
+            # Listing can be added to user's watchlist only once.
+            models.UniqueConstraint(fields=['user', 'listing'], name='watchlist_user_listing_unique'),
+        ]
+
     def get_username(self):
-        user = User.objects.get(id=self.user_id)
-        return user.username
+        # Uses joined user when it was loaded with select_related.
+        return self.user.username
 
     def __str__(self):
         return "Position in watchlist of user: " + str(self.get_username())
\ No newline at end of file
@@ -0,0 +1,118 @@
+import datetime
+import json
+
+from django.conf import settings
+from django.core import signing
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+
+
+CURSOR_SALT = 'auctions.pagination.cursor'
+
+
+class CursorEncoder(DjangoJSONEncoder):
+    '''
+    Keeps microseconds of datetimes, so cursor matches stored value exactly.
+    '''
+    def default(self, o):
+        if isinstance(o, datetime.datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+class CursorSerializer:
+    '''
+    JSON serializer for cursor values which understands dates and decimals.
+    '''
+    def dumps(self, obj):
+        return json.dumps(obj, separators=(',', ':'), cls=CursorEncoder).encode('latin-1')
+
+    def loads(self, data):
+        return json.loads(data.decode('latin-1'))
+
+
+class KeysetPage:
+    '''
+    One page of rows fetched with keyset (cursor) pagination.
+    Iterates like a list and carries opaque token for the next page.
+    '''
+    def __init__(self, object_list, next_cursor):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __bool__(self):
+        return bool(self.object_list)
+
+
+def encode_cursor(values):
+    '''
+    Returns opaque, signed token for list of ordering values.
+    '''
+    return signing.dumps(values, salt=CURSOR_SALT, serializer=CursorSerializer, compress=True)
+
+
+def decode_cursor(cursor):
+    '''
+    Returns list of ordering values stored in token
+    or None if token is missing or was tampered with.
+    '''
+    if not cursor:
+        return None
+    try:
+        return signing.loads(cursor, salt=CURSOR_SALT, serializer=CursorSerializer)
+    except signing.BadSignature:
+        return None
+
+
+def keyset_filter(ordering, values):
+    '''
+    Builds filter selecting rows placed after given ordering values.
+    For ordering (-a, -b) and values (x, y) it returns:
+    a < x OR (a = x AND b < y)
+    '''
+    condition = Q()
+    equal = Q()
+    for field, value in zip(ordering, values):
+        name = field.lstrip('-')
+        lookup = 'lt' if field.startswith('-') else 'gt'
+        condition |= equal & Q(**{f'{name}__{lookup}': value})
+        equal &= Q(**{name: value})
+    return condition
+
+
+def keyset_paginate(queryset, cursor=None, ordering=('-date_added', '-id'), per_page=None):
+    '''
+    Returns KeysetPage with rows following cursor.
+    Ordering must end with unique field, so every row has stable position.
+    Each page costs one indexed range query, no matter how deep it is.
+    '''
+    if per_page is None:
+        per_page = settings.LISTINGS_PER_PAGE
+
+    queryset = queryset.order_by(*ordering)
+
+    # Cursor starts with ordering it was made for, cursors of other orderings are ignored.
+    key = ','.join(ordering)
+    values = decode_cursor(cursor)
+    if values is not None and len(values) == len(ordering) + 1 and values[0] == key:
+        queryset = queryset.filter(keyset_filter(ordering, values[1:]))
+
+    # Fetches one extra row to find out if there is next page.
+    rows = list(queryset[:per_page + 1])
+    next_cursor = None
+    if len(rows) > per_page:
+        rows = rows[:per_page]
+        last = rows[-1]
+        next_cursor = encode_cursor([key, *(getattr(last, field.lstrip('-')) for field in ordering)])
+
+    return KeysetPage(rows, next_cursor)
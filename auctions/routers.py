@@ -0,0 +1,111 @@
+'''
+Read/write splitting between primary database ('default')
+and read replicas (aliases in DATABASE_REPLICAS).
+
+Writes always go to primary. Reads made while handling request
+go to random replica, unless request has to see its own writes:
+- after its first write in the same request,
+- inside transaction on primary,
+- for REPLICA_STICKY_SECONDS after any write of the same client,
+  remembered in cookie set by replica_stickiness_middleware.
+Reads outside requests (management commands, shell) use primary.
+
+Replicas are kept up to date outside Django. Locally, SQLite file can stand
+in for replica, copied from primary with 'python manage.py sync_replicas'.
+'''
+import asyncio
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.utils.decorators import sync_and_async_middleware
+
+
+current_routing = ContextVar('current_routing', default=None)
+
+
+class RequestRouting:
+    def __init__(self, use_primary):
+        self.use_primary = use_primary
+        self.wrote = False
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        routing = current_routing.get()
+        if routing is None or routing.use_primary or not settings.DATABASE_REPLICAS:
+            return DEFAULT_DB_ALIAS
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return random.choice(settings.DATABASE_REPLICAS)
+
+    def db_for_write(self, model, **hints):
+        routing = current_routing.get()
+        if routing is not None:
+            routing.wrote = True
+            routing.use_primary = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same data as primary.
+        databases = {DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas get schema together with data from primary.
+        return db not in settings.DATABASE_REPLICAS
+
+
+@sync_and_async_middleware
+def replica_stickiness_middleware(get_response):
+    '''
+    Routes reads of request (see ReplicaRouter) and keeps client
+    on primary for REPLICA_STICKY_SECONDS after it writes.
+    Works with both sync and async views.
+    '''
+    if not settings.DATABASE_REPLICAS:
+        raise MiddlewareNotUsed()
+
+    if asyncio.iscoroutinefunction(get_response):
+        async def middleware(request):
+            routing = start_routing(request)
+            token = current_routing.set(routing)
+            try:
+                response = await get_response(request)
+            finally:
+                current_routing.reset(token)
+            return finish_routing(response, routing)
+
+    else:
+        def middleware(request):
+            routing = start_routing(request)
+            token = current_routing.set(routing)
+            try:
+                response = get_response(request)
+            finally:
+                current_routing.reset(token)
+            return finish_routing(response, routing)
+
+    return middleware
+
+
+def start_routing(request):
+    # Unsafe methods are writes, their reads go to primary from the start.
+    use_primary = (
+        request.method not in ('GET', 'HEAD', 'OPTIONS')
+        or settings.REPLICA_STICKY_COOKIE in request.COOKIES
+    )
+    return RequestRouting(use_primary)
+
+
+def finish_routing(response, routing):
+    if routing.wrote:
+        response.set_cookie(
+            settings.REPLICA_STICKY_COOKIE, '1',
+            max_age=settings.REPLICA_STICKY_SECONDS, httponly=True, samesite='Lax'
+        )
+    return response
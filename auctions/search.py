@@ -0,0 +1,89 @@
+from django.conf import settings
+from django.db import NotSupportedError, connection
+
+from .cards import load_listings
+from .models import Listing
+from .pagination import KeysetPage, decode_cursor, encode_cursor
+
+
+def fts_query(text):
+    '''
+    Turns user's text into safe FTS5 query.
+    Every word is quoted (so FTS5 operators and punctuation are not interpreted)
+    and all words must match. Last word matches as prefix, e.g. "iph" finds "iphone".
+    '''
+    words = [word.replace('"', '""') for word in text.split()]
+    if not words:
+        return None
+    terms = [f'"{word}"' for word in words]
+    terms[-1] += '*'
+    return ' '.join(terms)
+
+
+def search_listings(text, category_id=None, min_price=None, max_price=None, cursor=None, per_page=None):
+    '''
+    Returns KeysetPage of active listings matching text, best matches first.
+    Matching and bm25 ranking are done by FTS5 index, filters are applied
+    in the same query, and only listings of returned page are loaded.
+    '''
+    if connection.vendor != 'sqlite':
+        raise NotSupportedError("Listing search requires SQLite with FTS5.")
+
+    if per_page is None:
+        per_page = settings.LISTINGS_PER_PAGE
+
+    query = fts_query(text)
+    if query is None:
+        return KeysetPage([], None)
+
+    conditions = ["auctions_listing_fts MATCH %s", "l.active = 1"]
+    params = [query]
+    # Raw SQL compares stored cents, so prices are converted like ORM does.
+    price_field = Listing._meta.get_field('current_price')
+    if category_id is not None:
+        conditions.append("l.category_id = %s")
+        params.append(category_id)
+    if min_price is not None:
+        conditions.append("l.current_price >= %s")
+        params.append(price_field.get_prep_value(min_price))
+    if max_price is not None:
+        conditions.append("l.current_price <= %s")
+        params.append(price_field.get_prep_value(max_price))
+
+    # Next page starts after (rank, id) of last row of previous page.
+    after = ""
+    values = decode_cursor(cursor)
+    if values is not None and len(values) == 2:
+        after = "WHERE rank > %s OR (rank = %s AND id > %s)"
+        params += [values[0], values[0], values[1]]
+
+    sql = f"""
+        SELECT id, rank FROM (
+            SELECT l.id AS id, bm25(auctions_listing_fts) AS rank
+            FROM auctions_listing_fts
+            JOIN auctions_listing l ON l.id = auctions_listing_fts.rowid
+            WHERE {' AND '.join(conditions)}
+        )
+        {after}
+        ORDER BY rank, id
+        LIMIT %s
+    """
+    params.append(per_page + 1)
+
+    with connection.cursor() as db_cursor:
+        db_cursor.execute(sql, params)
+        rows = db_cursor.fetchall()
+
+    next_cursor = None
+    if len(rows) > per_page:
+        rows = rows[:per_page]
+        listing_id, rank = rows[-1]
+        next_cursor = encode_cursor([rank, listing_id])
+
+    # Card versions are read before rows (see auctions/cards.py).
+    listings, card_versions = load_listings(
+        [listing_id for listing_id, _ in rows], Listing.objects.select_related('category')
+    )
+    page = KeysetPage(listings, next_cursor)
+    page.card_versions = card_versions
+    return page
@@ -0,0 +1,116 @@
+'''
+Serving static and media files from Python app, for deployments without CDN
+or separate web server.
+
+Responses carry ETag and Last-Modified, so repeated requests are answered
+with 304 Not Modified, and Cache-Control, so browsers and proxies can cache them.
+Static files with content hash in name are cached forever, precompressed
+.br/.gz siblings are sent to clients which accept them.
+'''
+import mimetypes
+import os
+import re
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date
+from django.views.decorators.http import require_safe
+
+
+# Name with content hash added by ManifestStaticFilesStorage, e.g. styles.55e7cbb9ba48.css.
+HASHED_NAME = re.compile(r'\.[0-9a-f]{12}\.[^./]+$')
+
+IMMUTABLE = 'public, max-age=31536000, immutable'
+
+# Precompressed variants in order of preference.
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+
+def accepted_encodings(request):
+    '''
+    Returns content codings from Accept-Encoding header which are not refused with q=0.
+    '''
+    accepted = set()
+    for part in request.META.get('HTTP_ACCEPT_ENCODING', '').split(','):
+        coding, *params = [item.strip() for item in part.split(';')]
+        quality = 1.0
+        for param in params:
+            if param.startswith('q='):
+                try:
+                    quality = float(param[2:])
+                except ValueError:
+                    quality = 0.0
+        if coding and quality > 0:
+            accepted.add(coding.lower())
+    return accepted
+
+
+def file_response(request, root, path, cache_control, precompressed=False):
+    '''
+    Returns streamed file from root directory, or 304 when client's copy is fresh.
+    '''
+    try:
+        full_path = safe_join(root, path)
+    except SuspiciousFileOperation:
+        raise Http404("File not found.")
+    if not os.path.isfile(full_path):
+        raise Http404("File not found.")
+
+    content_type, _ = mimetypes.guess_type(full_path)
+    served_path, encoding = full_path, None
+    if precompressed:
+        accepted = accepted_encodings(request)
+        for coding, extension in ENCODINGS:
+            if coding in accepted and os.path.isfile(full_path + extension):
+                served_path, encoding = full_path + extension, coding
+                break
+
+    stat = os.stat(served_path)
+    etag = '"%x-%x%s"' % (stat.st_mtime_ns, stat.st_size, f'-{encoding}' if encoding else '')
+    last_modified = int(stat.st_mtime)
+
+    not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if not_modified is not None:
+        response = not_modified
+    else:
+        response = FileResponse(open(served_path, 'rb'), content_type=content_type or 'application/octet-stream')
+        response['Content-Length'] = stat.st_size
+        if encoding:
+            response['Content-Encoding'] = encoding
+
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    response['Cache-Control'] = cache_control
+    if precompressed:
+        patch_vary_headers(response, ('Accept-Encoding',))
+    return response
+
+
+@require_safe
+def serve_static(request, path):
+    '''
+    Serves file collected to STATIC_ROOT by collectstatic.
+    In development falls back to app static directories.
+    '''
+    root = settings.STATIC_ROOT
+    if settings.DEBUG and not (root and os.path.isfile(os.path.join(root, path))):
+        from django.contrib.staticfiles.views import serve
+        return serve(request, path)
+
+    if HASHED_NAME.search(path):
+        cache_control = IMMUTABLE
+    else:
+        cache_control = f'public, max-age={settings.STATIC_CACHE_MAX_AGE}'
+    return file_response(request, root, path, cache_control, precompressed=True)
+
+
+@require_safe
+def serve_media(request, path):
+    '''
+    Serves uploaded file (e.g. listing photo) from MEDIA_ROOT.
+    '''
+    cache_control = f'public, max-age={settings.MEDIA_CACHE_MAX_AGE}'
+    return file_response(request, settings.MEDIA_ROOT, path, cache_control)
@@ -0,0 +1,33 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .cards import bump_card_generation, bump_card_version
+from .categories import invalidate_categories
+from .models import Bid, Category, Listing
+
+
+@receiver([post_save, post_delete], sender=Listing)
+def invalidate_listing_card(sender, instance, **kwargs):
+    '''
+    Listing was saved (e.g. activated, deactivated, edited) or deleted.
+    '''
+    bump_card_version(instance.id)
+
+
+@receiver(post_save, sender=Bid)
+def invalidate_bid_listing(sender, instance, **kwargs):
+    '''
+    Bid was saved, API's bid history of listing changed.
+    Deleted bids are handled by BidAdmin: post_delete receiver would stop
+    bids of deleted listing from being fast deleted (one query).
+    '''
+    bump_card_version(instance.listing_id)
+
+
+@receiver([post_save, post_delete], sender=Category)
+def invalidate_all_cards(sender, instance, **kwargs):
+    '''
+    Category name is shown on every card and categories are kept in registry.
+    '''
+    bump_card_generation()
+    invalidate_categories()
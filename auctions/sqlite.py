@@ -0,0 +1,32 @@
+'''
+SQLite tuning applied to every new connection (see SQLITE_PRAGMAS in settings).
+
+In production mode (AUCTIONS_SQLITE_PRODUCTION=1) database runs in WAL mode,
+so readers never wait for writer, commits fsync only at checkpoints
+(synchronous=NORMAL), writers wait for lock instead of failing (busy_timeout)
+and pages are read through memory map and bigger page cache.
+'''
+from django.conf import settings
+
+
+def apply_pragmas(sender, connection, **kwargs):
+    '''
+    Receiver of connection_created signal.
+    '''
+    if connection.vendor != 'sqlite' or not settings.SQLITE_PRAGMAS:
+        return
+    with connection.cursor() as cursor:
+        for pragma, value in settings.SQLITE_PRAGMAS.items():
+            cursor.execute(f'PRAGMA {pragma} = {value}')
+
+
+def current_pragmas(connection):
+    '''
+    Returns current values of configured pragmas of connection.
+    '''
+    values = {}
+    with connection.cursor() as cursor:
+        for pragma in settings.SQLITE_PRAGMAS:
+            cursor.execute(f'PRAGMA {pragma}')
+            values[pragma] = cursor.fetchone()[0]
+    return values
@@ -0,0 +1,62 @@
+import gzip
+import os
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+COMPRESSIBLE_EXTENSIONS = ('.css', '.js', '.svg', '.ico', '.txt', '.html', '.json', '.xml', '.map')
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    '''
+    Static files storage used by collectstatic.
+    Files get content-hashed names (e.g. styles.55e7cbb9ba48.css),
+    so they can be cached forever, and compressible ones get
+    precompressed .gz (and .br, when brotli package is installed) siblings,
+    so they are never compressed at request time.
+    '''
+    def url_converter(self, name, hashed_files, template=None):
+        '''
+        Leaves references to files missing from static files untouched
+        (e.g. images referenced by mdb.min.css, which are not shipped with app)
+        instead of failing whole collectstatic.
+        '''
+        converter = super().url_converter(name, hashed_files, template)
+
+        def safe_converter(matchobj):
+            try:
+                return converter(matchobj)
+            except ValueError:
+                return matchobj.group(0)
+        return safe_converter
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run=dry_run, **options)
+        if dry_run:
+            return
+
+        for name in set(self.hashed_files.values()):
+            if name.endswith(COMPRESSIBLE_EXTENSIONS):
+                self.compress(name)
+
+    def compress(self, name):
+        path = self.path(name)
+        with open(path, 'rb') as source:
+            content = source.read()
+
+        variants = [('.gz', gzip.compress(content, compresslevel=9))]
+        if brotli is not None:
+            variants.append(('.br', brotli.compress(content)))
+
+        for extension, compressed in variants:
+            # Keeps only variants which are actually smaller.
+            if len(compressed) < len(content):
+                with open(path + extension, 'wb') as target:
+                    target.write(compressed)
+            elif os.path.exists(path + extension):
+                os.remove(path + extension)
@@ -1,5 +1,9 @@
 from django import template
 from django.contrib.humanize.templatetags.humanize import intcomma
+from django.utils.safestring import mark_safe
+
+from auctions.cards import render_cards
+from auctions.images import get_widths, variant_url
 
 
 register = template.Library()
@@ -15,4 +19,24 @@ def prepend_dollars(dollars):
         dollars = round(float(dollars), 2)
         return "$%s%s" % (intcomma(int(dollars)), ("%0.2f" % dollars)[-3:])
     else:
-        return ''
\ No newline at end of file
+        return ''
+
+
+@register.simple_tag
+def listing_cards(listings, logged_user_id=None, show_category=True):
+    '''
+    Renders listing cards, reusing cached ones.
+    '''
+    return mark_safe(''.join(render_cards(listings, logged_user_id, show_category)))
+
+
+
+@register.filter
+def photo_srcset(listing, extension):
+    '''
+    Returns srcset of listing's photo variants in given format
+    or empty string if they are not ready yet.
+    '''
+    return ', '.join(
+        f"{variant_url(listing.photo.name, width, extension)} {width}w" for width in get_widths(listing)
+    )
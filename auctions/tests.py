@@ -1,3 +1,1456 @@
-from django.test import TestCase
+import asyncio
+import importlib
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+from decimal import Decimal
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.contrib import admin
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import CommandError, call_command
+from django.db import OperationalError, connection, connections, router, transaction
+from django.http import HttpResponse
+from django.test import AsyncClient, RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import clear_url_caches, resolve, reverse
+from django.utils import timezone
+from PIL import Image
+
+from commerce import urls as root_urls
+
+from . import urls
+from .bidding import BidResult, end_listings, place_bid, refresh_bid_stats, top_bids
+from .browsing import ListingFilters, parse_price
+from .cards import bump_card_version, get_cache as card_cache, render_cards, version_key
+from .categories import get_categories, get_listing_counts
+from .images import NO_VARIANTS, generate_variants, get_widths, save_widths, variant_job, variant_name
+from .live import Broker, InMemoryBroker
+from .management.commands.explain_views import FULL_SCAN
+from .models import Bid, Category, Comment, Contact, Listing, PriceField, User, Watchlist
+from .routers import replica_stickiness_middleware
+from .search import search_listings
+from .serving import IMMUTABLE
+from .sqlite import apply_pragmas, current_pragmas
+from .timing import recent_timings
+from .views import get_feed_page
+
+
+class SingleListingViewTests(TestCase):
+    '''
+    Number of queries on listing page must not depend on number of comments.
+    '''
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = User.objects.create_user('seller', 'seller@example.com', 'password')
+        category = Category.objects.create(name='Books')
+        cls.quiet_listing = Listing.objects.create(
+            title='Quiet', description='Few comments', starting_price=1, current_price=1,
+            user=cls.seller, category=category
+        )
+        cls.popular_listing = Listing.objects.create(
+            title='Popular', description='Many comments', starting_price=1, current_price=1,
+            user=cls.seller, category=category
+        )
+
+        authors = [User.objects.create_user(f'author{i}', password='password') for i in range(10)]
+        Comment.objects.create(content='Only comment', listing=cls.quiet_listing, author=authors[0])
+        Comment.objects.bulk_create([
+            Comment(content=f'Comment {i}', listing=cls.popular_listing, author=authors[i % len(authors)])
+            for i in range(200)
+        ])
+
+    def test_anonymous_query_count_is_constant(self):
+        for listing in (self.quiet_listing, self.popular_listing):
+            # Watchlist, listing and page of comments with authors.
+            with self.assertNumQueries(3):
+                self.client.get(reverse('single_listing_view', args=[listing.id]))
+
+    @override_settings(SESSION_ENGINE='django.contrib.sessions.backends.cached_db')
+    def test_logged_in_query_count_is_constant(self):
+        self.client.force_login(self.seller)
+        for listing in (self.quiet_listing, self.popular_listing):
+            # Session is read from cache, so only user, then the same three queries.
+            with self.assertNumQueries(4):
+                self.client.get(reverse('single_listing_view', args=[listing.id]))
+
+    def test_comments_are_paginated_with_author_usernames(self):
+        response = self.client.get(reverse('single_listing_view', args=[self.popular_listing.id]))
+        comments = response.context['comments']
+        self.assertEqual(len(comments), 20)
+        self.assertTrue(comments.has_next)
+        self.assertContains(response, 'ADDED BY author')
+
+        seen = {comment.id for comment in comments}
+        cursor = comments.next_cursor
+        while cursor:
+            response = self.client.get(
+                reverse('single_listing_view', args=[self.popular_listing.id]), {'cursor': cursor}
+            )
+            page = response.context['comments']
+            seen.update(comment.id for comment in page)
+            cursor = page.next_cursor
+        self.assertEqual(len(seen), 200)
+
+
+class AdminChangelistTests(TestCase):
+    '''
+    Number of queries on admin changelists must not depend on number of rows.
+    '''
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        category = Category.objects.create(name='Books')
+        bidders = [User.objects.create_user(f'bidder{i}', password='password') for i in range(5)]
+        listings = [
+            Listing.objects.create(
+                title=f'Listing {i}', description='Listing', starting_price=1, current_price=1,
+                user=cls.admin, category=category
+            )
+            for i in range(5)
+        ]
+        Bid.objects.bulk_create([
+            Bid(value=i, user=bidders[i % 5], listing=listings[i % 5]) for i in range(50)
+        ])
+        Comment.objects.bulk_create([
+            Comment(content='Comment', listing=listings[i % 5], author=bidders[i % 5]) for i in range(50)
+        ])
+        Watchlist.objects.bulk_create([Watchlist(user=bidders[i], listing=listings[i]) for i in range(5)])
+
+    def assertChangelistQueriesConstant(self, model_name):
+        self.client.force_login(self.admin)
+        url = reverse(f'admin:auctions_{model_name}_changelist')
+        with CaptureQueriesContext(connection) as few:
+            self.client.get(url, {'id__lte': 1})
+        with CaptureQueriesContext(connection) as many:
+            self.client.get(url)
+        self.assertEqual(len(few), len(many))
+
+    def test_bid_changelist(self):
+        self.assertChangelistQueriesConstant('bid')
+
+    def test_comment_changelist(self):
+        self.assertChangelistQueriesConstant('comment')
+
+    def test_listing_changelist(self):
+        self.assertChangelistQueriesConstant('listing')
+
+    def test_watchlist_changelist(self):
+        self.assertChangelistQueriesConstant('watchlist')
+
+    def test_search_uses_indexes(self):
+        Contact.objects.create(user=self.admin, city='Krakow')
+        # Search is case-sensitive, so that it can use indexes (see IndexedSearchMixin).
+        for model, term, expected in (
+            (Listing, 'Listing 1', 1), (Listing, 'listing', 0), (Bid, 'bidder1', 10),
+            (Comment, 'Listing', 50), (Watchlist, 'bidder', 0), (Category, 'Bo', 1),
+            (Contact, 'Kra', 1), (Contact, 'admin', 1),
+        ):
+            with self.subTest(model=model.__name__, term=term):
+                model_admin = admin.site._registry[model]
+                queryset, _ = model_admin.get_search_results(None, model_admin.get_queryset(None), term)
+                self.assertEqual(queryset.count(), expected)
+                self.assertIsNone(FULL_SCAN.search(queryset.explain()))
+
+    def test_str_uses_joined_objects(self):
+        bid = Bid.objects.select_related('listing__user').first()
+        with self.assertNumQueries(0):
+            str(bid)
+
+
+class ApiTests(TestCase):
+    '''
+    Unchanged API resources must be answered with 304,
+    ETags must follow database, not process local state.
+    '''
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = User.objects.create_user('seller', password='password')
+        cls.bidder = User.objects.create_user('bidder', password='password')
+        cls.category = Category.objects.create(name='Books')
+        cls.listing = Listing.objects.create(
+            title='Book', description='Old book', starting_price=1, current_price=3,
+            user=cls.seller, category=cls.category
+        )
+        Bid.objects.bulk_create([Bid(value=value, user=cls.bidder, listing=cls.listing) for value in (2, 3)])
+
+    def test_detail_is_not_modified(self):
+        url = reverse('api_listing_detail', args=[self.listing.id])
+        response = self.client.get(url)
+        self.assertEqual(response.json()['title'], 'Book')
+
+        with self.assertNumQueries(1):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_etags_do_not_depend_on_cache(self):
+        url = reverse('api_listing_bids', args=[self.listing.id])
+        etag = self.client.get(url)['ETag']
+        cache.clear()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        # Bid changes listing's bid state, whichever process handled it.
+        place_bid(self.bidder.id, self.listing.id, 4)
+        cache.clear()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'][0]['value'], 4)
+
+    def test_unknown_listing_is_not_cached(self):
+        missing = self.listing.id + 1000
+        for name in ('api_listing_detail', 'api_listing_bids'):
+            response = self.client.get(reverse(name, args=[missing]))
+            self.assertEqual(response.status_code, 404)
+        self.assertIsNone(cache.get(version_key(missing)))
+
+    def test_changed_listing_gets_new_etag(self):
+        url = reverse('api_listing_detail', args=[self.listing.id])
+        etag = self.client.get(url)['ETag']
+
+        self.listing.title = 'New book'
+        self.listing.save()
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['title'], 'New book')
+
+    def test_feed_is_not_modified_after_reading_page_keys(self):
+        url = reverse('api_listings')
+        etag = self.client.get(url)['ETag']
+
+        # Page keys only.
+        with self.assertNumQueries(1):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_not_modified_skips_loading_rows(self):
+        # Categories come from registry in process memory, with no queries at all.
+        for name, args in (('api_listings', []), ('api_listing_detail', [self.listing.id])):
+            with self.subTest(name):
+                url = reverse(name, args=args)
+                with CaptureQueriesContext(connection) as full:
+                    etag = self.client.get(url)['ETag']
+                with CaptureQueriesContext(connection) as conditional:
+                    response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 304)
+                self.assertLess(len(conditional), len(full))
+
+    def test_writes_change_etags(self):
+        requests = [
+            (reverse('api_listings'), {'fields': 'id,category'}),
+            (reverse('api_listing_detail', args=[self.listing.id]), {'fields': 'id,category'}),
+            (reverse('api_listing_detail', args=[self.listing.id]), {'fields': 'id,current_price'}),
+            (reverse('api_categories'), {}),
+        ]
+        etags = [self.client.get(url, data)['ETag'] for url, data in requests]
+
+        # Bid is written with UPDATE, category name is joined.
+        place_bid(self.bidder.id, self.listing.id, 4)
+        self.category.name = 'Old books'
+        self.category.save()
+
+        for (url, data), etag in zip(requests, etags):
+            with self.subTest(url=url, data=data):
+                response = self.client.get(url, data, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+
+    def test_field_selection(self):
+        response = self.client.get(reverse('api_listing_detail', args=[self.listing.id]), {'fields': 'id,current_price'})
+        self.assertEqual(response.json(), {'id': self.listing.id, 'current_price': 3})
+
+        response = self.client.get(reverse('api_listing_bids', args=[self.listing.id]), {'fields': 'value,bidder'})
+        self.assertEqual(response.json()['results'], [{'value': 3, 'bidder': 'bidder'}, {'value': 2, 'bidder': 'bidder'}])
+
+        response = self.client.get(reverse('api_categories'), {'fields': 'password'})
+        self.assertEqual(response.status_code, 400)
+
+
+@override_settings(REQUEST_TIMING=True)
+class RequestTimingTests(TestCase):
+    '''
+    Timing middleware reports queries and render time of every request.
+    '''
+    def test_server_timing_header(self):
+        Category.objects.create(name='Books')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('categories_view'))
+
+        header = response['Server-Timing']
+        self.assertIn(f'db;desc="{len(queries)} queries"', header)
+        self.assertIn('tpl;dur=', header)
+
+        entry = recent_timings()[-1]
+        self.assertEqual(entry['view'], 'categories_view')
+        self.assertEqual(entry['queries'], len(queries))
+        self.assertGreater(entry['template_ms'], 0)
+
+    @override_settings(REQUEST_TIMING=False)
+    def test_no_header_when_timing_is_off(self):
+        response = self.client.get(reverse('categories_view'))
+        self.assertNotIn('Server-Timing', response)
+
+
+class BidStatsTests(TestCase):
+    '''
+    Listing's bid statistics follow its bids and are shown without extra queries.
+    '''
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = User.objects.create_user('seller', password='password')
+        cls.bidders = [User.objects.create_user(f'bidder{i}', password='password') for i in range(2)]
+        cls.listing = Listing.objects.create(
+            title='Book', description='Old book', starting_price=1, current_price=1,
+            user=cls.seller, category=Category.objects.create(name='Books')
+        )
+
+    def test_place_bid_updates_stats(self):
+        place_bid(self.bidders[0].id, self.listing.id, 2)
+        result = place_bid(self.bidders[1].id, self.listing.id, 3)
+        place_bid(self.bidders[0].id, self.listing.id, 3)
+
+        self.listing.refresh_from_db()
+        self.assertEqual(self.listing.bid_count, 2)
+        self.assertEqual(self.listing.top_bid_id, result.bid.id)
+        self.assertIsNotNone(self.listing.last_bid_at)
+
+    def test_refresh_recomputes_stats(self):
+        Bid.objects.bulk_create([
+            Bid(value=value, user=self.bidders[value % 2], listing=self.listing) for value in (2, 5, 5, 4)
+        ])
+        self.assertEqual(refresh_bid_stats(Listing.objects.all()), 1)
+
+        self.listing.refresh_from_db()
+        self.assertEqual(self.listing.bid_count, 4)
+        # The earliest of equal top bids wins.
+        self.assertEqual(self.listing.top_bid, Bid.objects.filter(value=5).order_by('id').first())
+
+        Bid.objects.all().delete()
+        refresh_bid_stats(Listing.objects.all())
+        self.listing.refresh_from_db()
+        self.assertEqual((self.listing.bid_count, self.listing.top_bid_id), (0, None))
+
+    def test_refresh_reads_bids_once_per_batch(self):
+        place_bid(self.bidders[0].id, self.listing.id, 2)
+        last_bid_at = Listing.objects.get(id=self.listing.id).last_bid_at
+        Listing.objects.bulk_create([
+            Listing(
+                title=f'Book {i}', description='Book', starting_price=1, current_price=1, user=self.seller,
+                category=self.listing.category, last_bid_at=last_bid_at
+            )
+            for i in range(30)
+        ])
+        listings = list(Listing.objects.exclude(id=self.listing.id).order_by('id'))
+        Bid.objects.bulk_create([
+            Bid(value=value, user=self.bidders[0], listing=listing)
+            for listing in listings[:20] for value in range(1, listing.id % 5 + 2)
+        ])
+        Bid.objects.filter(listing=self.listing).delete()
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(refresh_bid_stats(Listing.objects.all()), 31)
+        # Ids, bid stats, reset of listings without bids and bulk update.
+        self.assertLessEqual(len(queries), 6)
+
+        for listing in Listing.objects.select_related('top_bid'):
+            bids = list(top_bids(listing.id))
+            self.assertEqual(listing.bid_count, len(bids))
+            self.assertEqual(listing.top_bid, bids[0] if bids else None)
+            self.assertEqual(listing.last_bid_at, last_bid_at if bids else None)
+
+    def test_winning_bidder_is_shown(self):
+        place_bid(self.bidders[0].id, self.listing.id, 2)
+        self.client.force_login(self.bidders[0])
+        response = self.client.get(reverse('single_listing_view', args=[self.listing.id]))
+        self.assertContains(response, 'BIDS: 1')
+        self.assertContains(response, 'YOUR BID IS WINNING')
+
+        self.client.force_login(self.bidders[1])
+        response = self.client.get(reverse('single_listing_view', args=[self.listing.id]))
+        self.assertNotContains(response, 'YOUR BID IS WINNING')
+
+
+class PlaceBidTests(TestCase):
+    '''
+    Bid placement reports why bid was refused and keeps listing's bid statistics.
+    '''
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = User.objects.create_user('seller', password='password')
+        cls.bidder = User.objects.create_user('bidder', password='password')
+        cls.listing = Listing.objects.create(
+            title='Book', description='Old book', starting_price=1, current_price=1,
+            user=cls.seller, category=Category.objects.create(name='Books')
+        )
+
+    def test_statuses(self):
+        result = place_bid(self.bidder.id, self.listing.id, '2.50')
+        self.assertEqual(result.status, BidResult.ACCEPTED)
+        self.assertEqual(result.current_price, Decimal('2.50'))
+        self.assertEqual(result.bid.value, Decimal('2.50'))
+
+        for value in ('2.50', '2'):
+            result = place_bid(self.bidder.id, self.listing.id, value)
+            self.assertEqual(result.status, BidResult.OUTBID)
+            self.assertEqual(result.current_price, Decimal('2.50'))
+            self.assertIsNone(result.bid)
+
+        self.assertEqual(place_bid(self.seller.id, self.listing.id, 10).status, BidResult.OWN_LISTING)
+        self.assertEqual(place_bid(self.bidder.id, self.listing.id + 1, 10).status, BidResult.NOT_FOUND)
+
+        Listing.objects.filter(id=self.listing.id).update(active=False)
+        self.assertEqual(place_bid(self.bidder.id, self.listing.id, 10).status, BidResult.CLOSED)
+
+        self.assertEqual(Bid.objects.count(), 1)
+        self.listing.refresh_from_db()
+        self.assertEqual(self.listing.current_price, Decimal('2.50'))
+
+    def test_accepted_bids_update_stats(self):
+        first = place_bid(self.bidder.id, self.listing.id, 2).bid
+        self.listing.refresh_from_db()
+        self.assertEqual((self.listing.bid_count, self.listing.top_bid_id), (1, first.id))
+        first_bid_at = self.listing.last_bid_at
+        self.assertIsNotNone(first_bid_at)
+
+        second = place_bid(self.bidder.id, self.listing.id, 3).bid
+        place_bid(self.bidder.id, self.listing.id, 3)
+        self.listing.refresh_from_db()
+        self.assertEqual((self.listing.bid_count, self.listing.top_bid_id), (2, second.id))
+        self.assertGreaterEqual(self.listing.last_bid_at, first_bid_at)
+
+
+class ConcurrentBidTests(TransactionTestCase):
+    '''
+    Committed bids invalidate cards, concurrent bids never both win.
+    Data is committed, so callbacks run and other threads see it.
+    '''
+    def setUp(self):
+        self.seller = User.objects.create_user('seller', password='password')
+        self.bidders = [User.objects.create_user(f'bidder{i}', password='password') for i in range(2)]
+        self.listing = Listing.objects.create(
+            title='Book', description='Old book', starting_price=1, current_price=1,
+            user=self.seller, category=Category.objects.create(name='Books')
+        )
+
+    def test_accepted_bid_bumps_card_version(self):
+        bump_card_version(self.listing.id)
+        version = card_cache().get(version_key(self.listing.id))
+
+        place_bid(self.bidders[0].id, self.listing.id, 1)
+        self.assertEqual(card_cache().get(version_key(self.listing.id)), version)
+
+        place_bid(self.bidders[0].id, self.listing.id, 2)
+        self.assertNotEqual(card_cache().get(version_key(self.listing.id)), version)
+
+    def test_one_of_equal_bids_wins(self):
+        barrier = threading.Barrier(2)
+        statuses = []
+
+        def bid(user):
+            barrier.wait()
+            try:
+                # In-memory test database locks whole tables, so loser of the lock
+                # retries, as client would. It has to be outbid then.
+                for _ in range(100):
+                    try:
+                        statuses.append(place_bid(user.id, self.listing.id, 5).status)
+                        return
+                    except OperationalError:
+                        time.sleep(0.01)
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=bid, args=(user,)) for user in self.bidders]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(sorted(statuses), [BidResult.ACCEPTED, BidResult.OUTBID])
+        self.listing.refresh_from_db()
+        self.assertEqual((self.listing.current_price, self.listing.bid_count), (5, 1))
+        self.assertEqual(Bid.objects.get().id, self.listing.top_bid_id)
+
+
+class EndListingsTests(TransactionTestCase):
+    '''
+    Ending auctions picks the earliest of equal top bids and ends every listing only once.
+    Data is committed, so cards of ended listings get bumped.
+    '''
+    def setUp(self):
+        self.seller = User.objects.create_user('seller', password='password')
+        self.bidders = [User.objects.create_user(f'bidder{i}', password='password') for i in range(2)]
+        category = Category.objects.create(name='Books')
+        self.listings = [
+            Listing.objects.create(
+                title=f'Book {i}', description='Old book', starting_price=1, current_price=1,
+                user=self.seller, category=category
+            )
+            for i in range(3)
+        ]
+
+    def versions(self):
+        return [card_cache().get(version_key(listing.id)) for listing in self.listings]
+
+    def test_earliest_of_equal_top_bids_wins(self):
+        listing = self.listings[0]
+        Bid.objects.bulk_create([
+            Bid(value=5, user=self.bidders[1], listing=listing),
+            Bid(value=5, user=self.bidders[0], listing=listing),
+            Bid(value=3, user=self.bidders[0], listing=listing),
+        ])
+        self.assertEqual(end_listings(Listing.objects.filter(id=listing.id)), 1)
+        listing.refresh_from_db()
+        self.assertEqual((listing.winner, listing.active), (str(self.bidders[1].id), False))
+
+    def test_bulk_close_ends_each_listing_once(self):
+        place_bid(self.bidders[0].id, self.listings[0].id, 2)
+        place_bid(self.bidders[1].id, self.listings[1].id, 2)
+        bump_card_version(self.listings[2].id)
+        self.assertEqual(end_listings(Listing.objects.filter(id__in=[self.listings[0].id, self.listings[1].id])), 2)
+
+        winners = dict(Listing.objects.values_list('id', 'winner'))
+        self.assertEqual(winners, {
+            self.listings[0].id: str(self.bidders[0].id),
+            self.listings[1].id: str(self.bidders[1].id),
+            self.listings[2].id: None,
+        })
+
+        # Listing without bids ends without winner, further attempts change nothing.
+        versions = self.versions()
+        self.assertEqual(end_listings(Listing.objects.all()), 1)
+        self.assertFalse(Listing.objects.filter(active=True).exists())
+        self.assertEqual(self.versions()[:2], versions[:2])
+        self.assertNotEqual(self.versions()[2], versions[2])
+
+        versions = self.versions()
+        self.assertEqual(end_listings(Listing.objects.all()), 0)
+        self.assertEqual(self.versions(), versions)
+
+    def test_only_seller_can_end_listing(self):
+        listing = self.listings[0]
+        place_bid(self.bidders[0].id, listing.id, 2)
+
+        self.client.force_login(self.bidders[1])
+        response = self.client.post(reverse('listing_end'), {'listing_id': listing.id}, follow=True)
+        self.assertContains(response, 'This auction cannot be closed.')
+        listing.refresh_from_db()
+        self.assertTrue(listing.active)
+
+        self.client.force_login(self.seller)
+        response = self.client.post(reverse('listing_end'), {'listing_id': listing.id}, follow=True)
+        self.assertContains(response, 'Winner of this auction is bidder0.')
+        response = self.client.post(reverse('listing_end'), {'listing_id': listing.id}, follow=True)
+        self.assertContains(response, 'This auction has already ended or is suspended.')
+
+    def test_listing_without_bids_ends_once(self):
+        listing = self.listings[0]
+        self.client.force_login(self.seller)
+        response = self.client.post(reverse('listing_end'), {'listing_id': listing.id}, follow=True)
+        self.assertContains(response, 'There were no bids, so auction has no winner.')
+        listing.refresh_from_db()
+        self.assertEqual((listing.winner, listing.active), (None, False))
+
+        response = self.client.post(reverse('listing_end'), {'listing_id': listing.id}, follow=True)
+        self.assertContains(response, 'This auction has already ended or is suspended.')
+
+
+class CategoryRegistryTests(TestCase):
+    '''
+    Categories are read from process memory until any of them changes.
+    '''
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = User.objects.create_user('seller', password='password')
+        cls.books = Category.objects.create(name='Books')
+        cls.toys = Category.objects.create(name='Toys')
+        Listing.objects.bulk_create([
+            Listing(title='Book', description='Book', starting_price=1, current_price=1, user=cls.seller, category=cls.books, active=active)
+            for active in (True, True, False)
+        ])
+
+    def setUp(self):
+        cache.clear()
+
+    def test_registry_is_invalidated_on_save_and_delete(self):
+        self.assertEqual(get_categories(), [self.books, self.toys])
+        with self.assertNumQueries(0):
+            get_categories()
+
+        games = Category.objects.create(name='Games')
+        self.assertEqual(get_categories(), [self.books, games, self.toys])
+
+        games.delete()
+        self.assertEqual(get_categories(), [self.books, self.toys])
+
+    def test_registry_expires_without_invalidation(self):
+        get_categories()
+        # Change made by process which doesn't share cache with this one.
+        Category.objects.filter(id=self.toys.id).update(name='Games')
+        with override_settings(CATEGORY_REGISTRY_TIMEOUT=0):
+            self.assertEqual([category.name for category in get_categories()], ['Books', 'Games'])
+
+    def test_categories_page_shows_open_listing_counts(self):
+        get_categories()
+        # Counts of all categories with one grouped query.
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('categories_view'))
+        self.assertEqual(response.context['categories'], [(self.books, 2), (self.toys, 0)])
+        self.assertContains(response, '<strong>Books</strong> (2)', html=True)
+
+
+class CardCacheTests(TestCase):
+    '''
+    Card is never cached under newer version than data it was rendered from.
+    '''
+    @classmethod
+    def setUpTestData(cls):
+        cls.listing = Listing.objects.create(
+            title='Book', description='Old book', starting_price=1, current_price=1,
+            user=User.objects.create_user('seller', password='password'),
+            category=Category.objects.create(name='Books')
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_change_between_rows_and_render_is_not_cached(self):
+        page = get_feed_page(None)
+        # Bid commits after rows were read, before cards are rendered.
+        Listing.objects.filter(id=self.listing.id).update(current_price=5)
+        bump_card_version(self.listing.id)
+        self.assertIn('$1.00', render_cards(page)[0])
+
+        response = self.client.get(reverse('index'))
+        self.assertContains(response, '$5.00')
+
+
+class BrowsingTests(TestCase):
+    '''
+    Listings are filtered by exact price range and paginated in every sort order.
+    '''
+    @classmethod
+    def setUpTestData(cls):
+        seller = User.objects.create_user('seller', password='password')
+        cls.books = Category.objects.create(name='Books')
+        cls.toys = Category.objects.create(name='Toys')
+        Listing.objects.bulk_create([
+            Listing(
+                title=f'Listing {i}', description='Listing', starting_price='0.10', current_price=Decimal(i) / 10,
+                user=seller, category=cls.books if i % 2 else cls.toys
+            )
+            for i in range(1, 46)
+        ])
+
+    def browse(self, filters):
+        '''
+        Returns prices of all listings, following next page cursors.
+        '''
+        prices, cursor = [], None
+        while True:
+            page = filters.paginate(Listing.objects.filter(active=True), cursor)
+            prices += [listing.current_price for listing in page]
+            if not page.has_next:
+                return prices
+            cursor = page.next_cursor
+
+    def test_prices_are_exact(self):
+        # 0.1 + 0.2 is not 0.3 in floating point, in cents it is.
+        listing = Listing.objects.get(current_price='0.3')
+        self.assertEqual(listing.current_price, Decimal('0.30'))
+        self.assertEqual(Listing.objects.filter(current_price__gte=0.1 + 0.2).count(), 43)
+
+    def test_price_range_and_sorts(self):
+        prices = self.browse(ListingFilters(min_price=Decimal('1.5'), max_price=Decimal('3.5'), sort='price'))
+        self.assertEqual(prices, [Decimal(i) / 10 for i in range(15, 36)])
+
+        prices = self.browse(ListingFilters(category_id=self.books.id, sort='price_desc'))
+        self.assertEqual(prices, [Decimal(i) / 10 for i in range(45, 0, -2)])
+
+    def test_cursor_of_other_sort_is_ignored(self):
+        page = ListingFilters(sort='price').paginate(Listing.objects.all(), None)
+        page = ListingFilters(sort='price_desc').paginate(Listing.objects.all(), page.next_cursor)
+        self.assertEqual(page.object_list[0].current_price, Decimal('4.5'))
+
+    def test_filters_are_kept_in_next_page_link(self):
+        response = self.client.get(reverse('index'), {'sort': 'price', 'min_price': '0.5', 'max_price': 'x'})
+        self.assertEqual(response.context['listings'].object_list[0].current_price, Decimal('0.5'))
+        self.assertEqual(response.context['query_string'], 'min_price=0.50&sort=price')
+        self.assertContains(response, '?min_price=0.50&amp;sort=price&cursor=')
+
+    def test_out_of_range_and_sub_cent_prices_are_rejected(self):
+        self.assertEqual(parse_price('2.50'), Decimal('2.50'))
+        for value in ('100000000000000000', '1e17', '2.005', '-1', 'nan'):
+            self.assertIsNone(parse_price(value), value)
+
+        response = self.client.get(reverse('index'), {'min_price': '1e17', 'max_price': '100000000000000000'})
+        self.assertEqual(response.status_code, 200)
+        response = self.client.get(reverse('api_listings'), {'min_price': '1e17'})
+        self.assertEqual(response.status_code, 400)
+
+        bidder = User.objects.create_user('bidder', password='password')
+        self.client.force_login(bidder)
+        listing = Listing.objects.first()
+        for value in ('1e17', '2.005'):
+            self.client.post(reverse('add_bid'), {'bid_value': value, 'listing_id': listing.id})
+        self.assertFalse(Bid.objects.exists())
+
+
+@override_settings(LISTINGS_PER_PAGE=3)
+class KeysetPaginationTests(TestCase):
+    '''
+    Feed and watchlist pages follow cursors without duplicated or skipped
+    listings, also when ordering values tie, and ignore foreign cursors.
+    '''
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('user', password='password')
+        category = Category.objects.create(name='Lamps')
+        Listing.objects.bulk_create([
+            Listing(
+                title=f'Lamp {i}', description='Lamp', starting_price='1.00', current_price=Decimal(i // 4),
+                user=cls.user, category=category
+            )
+            for i in range(10)
+        ])
+        # Every listing was added at the same moment.
+        Listing.objects.update(date_added=timezone.now())
+        Watchlist.objects.bulk_create([Watchlist(user=cls.user, listing=listing) for listing in Listing.objects.all()])
+        cls.ids = list(Listing.objects.order_by('id').values_list('id', flat=True))
+
+    def browse(self, url, query=None):
+        '''
+        Returns ids of listings on all pages, following next page cursors.
+        '''
+        ids, query = [], dict(query or {})
+        while True:
+            listings = self.client.get(url, query).context['listings']
+            ids += [listing.id for listing in listings]
+            if not listings.has_next:
+                return ids
+            query['cursor'] = listings.next_cursor
+
+    def test_tied_values_are_paged_by_id(self):
+        self.client.force_login(self.user)
+        self.assertEqual(self.browse(reverse('index')), self.ids[::-1])
+        self.assertEqual(self.browse(reverse('watchlist_view')), self.ids[::-1])
+        self.assertEqual(self.browse(reverse('index'), {'sort': 'price'}), self.ids)
+        self.assertEqual(self.browse(reverse('index'), {'sort': 'price_desc'}), self.ids[::-1])
+
+    def test_tampered_and_foreign_cursors_start_from_first_page(self):
+        self.client.force_login(self.user)
+        first_page = self.ids[:-4:-1]
+        for url in (reverse('index'), reverse('watchlist_view')):
+            cursor = self.client.get(url).context['listings'].next_cursor
+            tampered = cursor[:-1] + ('A' if cursor[-1] != 'A' else 'B')
+            listings = self.client.get(url, {'cursor': tampered}).context['listings']
+            self.assertEqual([listing.id for listing in listings], first_page)
+
+        cursor = self.client.get(reverse('index'), {'sort': 'price'}).context['listings'].next_cursor
+        for url, query in ((reverse('index'), {}), (reverse('index'), {'sort': 'price_desc'}), (reverse('watchlist_view'), {})):
+            listings = self.client.get(url, {**query, 'cursor': cursor}).context['listings']
+            self.assertEqual([listing.id for listing in listings], first_page)
+
+
+class SearchTests(TestCase):
+    '''
+    Full-text search ranks matches, applies filters, pages by cursor
+    and follows listings' changes through FTS triggers.
+    '''
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = User.objects.create_user('seller', password='password')
+        cls.lamps = Category.objects.create(name='Lamps')
+        cls.books = Category.objects.create(name='Books')
+
+    def add(self, title, description='', price='1.00', category=None, active=True):
+        return Listing.objects.create(
+            title=title, description=description, starting_price=price, current_price=price,
+            user=self.seller, category=category or self.lamps, active=active
+        )
+
+    def search(self, text, **filters):
+        '''
+        Returns titles of all found listings, following next page cursors.
+        '''
+        titles, cursor = [], None
+        while True:
+            page = search_listings(text, cursor=cursor, **filters)
+            titles += [listing.title for listing in page]
+            if not page.has_next:
+                return titles
+            cursor = page.next_cursor
+
+    def test_best_matches_come_first(self):
+        self.add('Old chair', 'Wooden chair, would look good next to a lamp.')
+        self.add('Lamp', 'Brass lamp')
+        self.add('Lamp shade', 'Fits any lamp')
+        self.assertEqual(self.search('lamp'), ['Lamp', 'Lamp shade', 'Old chair'])
+        # All words must match, last one as prefix.
+        self.assertEqual(self.search('brass la'), ['Lamp'])
+        # FTS5 syntax is searched as plain text.
+        self.assertEqual(self.search('lamp OR "chair'), [])
+
+    def test_only_active_listings_are_found(self):
+        self.add('Lamp')
+        self.add('Ended lamp', active=False)
+        self.assertEqual(self.search('lamp'), ['Lamp'])
+
+    def test_category_and_price_filters(self):
+        self.add('Cheap lamp', price='0.30')
+        self.add('Lamp', price='5.00')
+        self.add('Lamp book', price='5.00', category=self.books)
+        self.assertEqual(self.search('lamp', category_id=self.books.id), ['Lamp book'])
+        self.assertEqual(sorted(self.search('lamp', min_price=Decimal('0.1') + Decimal('0.2'), max_price=Decimal('1'))),
+                         ['Cheap lamp'])
+        self.assertEqual(sorted(self.search('lamp', min_price=Decimal('5'))), ['Lamp', 'Lamp book'])
+
+    def test_pages_have_no_duplicates_or_gaps(self):
+        # Equal texts have equal rank, so pages are split by id.
+        for i in range(7):
+            self.add(f'Lamp {i}', 'Lamp')
+        with self.settings(LISTINGS_PER_PAGE=2):
+            self.assertEqual(self.search('lamp'), [f'Lamp {i}' for i in range(7)])
+
+        page = search_listings('lamp', per_page=2)
+        self.assertEqual(len(search_listings('lamp', cursor=page.next_cursor + 'x', per_page=10)), 7)
+
+    def test_index_follows_inserts_updates_and_deletes(self):
+        listing = self.add('Desk lamp')
+        self.assertEqual(self.search('desk'), ['Desk lamp'])
+
+        listing.title = 'Floor lamp'
+        listing.save()
+        self.assertEqual(self.search('desk'), [])
+        self.assertEqual(self.search('floor'), ['Floor lamp'])
+
+        # Bids update only prices, found listing shows current price.
+        Listing.objects.filter(id=listing.id).update(current_price=Decimal('9.99'))
+        self.assertEqual(list(search_listings('floor'))[0].current_price, Decimal('9.99'))
+
+        listing.delete()
+        self.assertEqual(self.search('floor'), [])
+        with connection.cursor() as db_cursor:
+            db_cursor.execute("SELECT count(*) FROM auctions_listing_fts WHERE auctions_listing_fts MATCH 'floor'")
+            self.assertEqual(db_cursor.fetchone(), (0,))
+
+
+class PhotoVariantTests(TestCase):
+    '''
+    Photos get smaller WebP and JPEG variants, pages list them in srcset
+    and fall back to original photo until they are ready.
+    '''
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = User.objects.create_user('seller', password='password')
+        cls.category = Category.objects.create(name='Phones')
+
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        settings = override_settings(MEDIA_ROOT=media_root.name, LISTING_PHOTO_WIDTHS=(200, 400, 800))
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def add(self, filename, size):
+        photo = io.BytesIO()
+        Image.new('RGB', size, 'red').save(photo, 'PNG')
+        name = default_storage.save(f'listing_images/{filename}', ContentFile(photo.getvalue()))
+        return Listing.objects.create(
+            title='Phone', description='Phone', starting_price=1, current_price=1,
+            user=self.seller, category=self.category, photo=name
+        )
+
+    def test_variants_are_smaller_than_original(self):
+        listing = self.add('phone.png', (500, 250))
+        self.assertEqual(generate_variants(*variant_job(listing.photo.name)), [200, 400])
+
+        for width in (200, 400):
+            for extension, format in (('webp', 'WEBP'), ('jpg', 'JPEG')):
+                with default_storage.open(variant_name(listing.photo.name, width, extension)) as file:
+                    with Image.open(file) as variant:
+                        self.assertEqual((variant.format, variant.size), (format, (width, width // 2)))
+        self.assertFalse(default_storage.exists(variant_name(listing.photo.name, 800, 'webp')))
+
+    def test_srcset_falls_back_to_original_photo(self):
+        listing = self.add('phone.png', (500, 250))
+        url = reverse('single_listing_view', args=[listing.id])
+        for page in (self.client.get(url), self.client.get(reverse('index'))):
+            self.assertContains(page, f'src="{listing.photo.url}"')
+            self.assertNotContains(page, 'srcset')
+
+        save_widths(listing.id, listing.photo.name, [200, 400])
+        webp = '/media/listing_images/variants/phone-200w.webp 200w, /media/listing_images/variants/phone-400w.webp 400w'
+        jpg = webp.replace('.webp', '.jpg')
+        for page in (self.client.get(url), self.client.get(reverse('index'))):
+            self.assertContains(page, f'src="{listing.photo.url}"')
+            self.assertContains(page, f'<source type="image/webp" srcset="{webp}"')
+            self.assertContains(page, f'srcset="{jpg}"')
+
+        # Variants of replaced photo are not recorded.
+        save_widths(listing.id, 'listing_images/old.png', [200])
+        listing.refresh_from_db()
+        self.assertEqual(get_widths(listing), [200, 400])
+
+    def test_backfill_command(self):
+        large = self.add('large.png', (900, 600))
+        small = self.add('small.png', (100, 100))
+        missing = self.add('missing.png', (300, 300))
+        default_storage.delete(missing.photo.name)
+
+        stdout, stderr = io.StringIO(), io.StringIO()
+        call_command('build_photo_variants', stdout=stdout, stderr=stderr)
+        self.assertIn("Generated variants of 2 photo(s), 1 failed.", stdout.getvalue())
+        self.assertIn(f"Listing {missing.id}", stderr.getvalue())
+
+        large.refresh_from_db()
+        small.refresh_from_db()
+        missing.refresh_from_db()
+        self.assertEqual((large.photo_widths, small.photo_widths, missing.photo_widths), ('200,400,800', NO_VARIANTS, ''))
+        self.assertEqual(get_widths(small), [])
+        self.assertTrue(default_storage.exists(variant_name(large.photo.name, 800, 'jpg')))
+
+        # Processed photos are skipped unless forced.
+        call_command('build_photo_variants', stdout=stdout, stderr=io.StringIO())
+        self.assertIn("Generated variants of 0 photo(s), 1 failed.", stdout.getvalue())
+
+
+class FileServingTests(SimpleTestCase):
+    '''
+    Static and media files are answered with 304 when client's copy is fresh,
+    hashed static files are cached forever and precompressed variants
+    are chosen by Accept-Encoding.
+    '''
+    def setUp(self):
+        root = tempfile.TemporaryDirectory()
+        self.addCleanup(root.cleanup)
+        self.static_root, self.media_root = os.path.join(root.name, 'static'), os.path.join(root.name, 'media')
+        settings = override_settings(STATIC_ROOT=self.static_root, MEDIA_ROOT=self.media_root)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+        self.write(self.static_root, 'styles.55e7cbb9ba48.css', b'body {}')
+        self.write(self.static_root, 'styles.55e7cbb9ba48.css.gz', b'gzip')
+        self.write(self.static_root, 'styles.55e7cbb9ba48.css.br', b'br')
+        self.write(self.static_root, 'styles.css', b'body {}')
+        self.write(self.media_root, 'listing_images/phone.jpg', b'photo')
+
+    def write(self, root, name, content):
+        path = os.path.join(root, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as file:
+            file.write(content)
+
+    def get(self, url, **headers):
+        '''
+        Returns response with its file already closed.
+        '''
+        response = self.client.get(url, **headers)
+        response.close()
+        return response
+
+    def test_fresh_copy_gets_not_modified(self):
+        for url in ('/static/styles.55e7cbb9ba48.css', '/static/styles.css', '/media/listing_images/phone.jpg'):
+            with self.subTest(url):
+                response = self.get(url)
+                self.assertEqual(response.status_code, 200)
+                etag = response['ETag']
+
+                response = self.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response['ETag'], etag)
+                self.assertEqual(response.content, b'')
+
+                self.assertEqual(self.get(url, HTTP_IF_NONE_MATCH='"other"').status_code, 200)
+
+    def test_only_hashed_names_are_immutable(self):
+        self.assertEqual(self.get('/static/styles.55e7cbb9ba48.css')['Cache-Control'], IMMUTABLE)
+        with self.settings(STATIC_CACHE_MAX_AGE=60, MEDIA_CACHE_MAX_AGE=120):
+            self.assertEqual(self.get('/static/styles.css')['Cache-Control'], 'public, max-age=60')
+            self.assertEqual(self.get('/media/listing_images/phone.jpg')['Cache-Control'], 'public, max-age=120')
+
+    def test_precompressed_variant_follows_accept_encoding(self):
+        url = '/static/styles.55e7cbb9ba48.css'
+        for accept_encoding, encoding, content in (
+            ('gzip, deflate, br', 'br', b'br'),
+            ('gzip, br;q=0', 'gzip', b'gzip'),
+            ('identity', None, b'body {}'),
+            ('', None, b'body {}'),
+        ):
+            with self.subTest(accept_encoding):
+                response = self.client.get(url, HTTP_ACCEPT_ENCODING=accept_encoding)
+                self.assertEqual(b''.join(response.streaming_content), content)
+                response.close()
+                self.assertEqual(response.get('Content-Encoding'), encoding)
+                self.assertEqual(response['Content-Type'], 'text/css')
+                self.assertIn('Accept-Encoding', response['Vary'])
+
+        # Each variant has its own ETag.
+        etags = {self.get(url, HTTP_ACCEPT_ENCODING=coding)['ETag'] for coding in ('br', 'gzip', '')}
+        self.assertEqual(len(etags), 3)
+
+    def test_missing_files_and_paths_outside_root(self):
+        for url in ('/static/missing.css', '/media/../static/styles.css', '/media/%2e%2e/static/styles.css'):
+            self.assertEqual(self.get(url).status_code, 404, url)
+
+
+class SeedScaleTests(TransactionTestCase):
+    '''
+    Generated data is consistent and its prices are valid PriceField values.
+    Loading pragmas can't be changed inside transaction, so test case can't use one.
+    '''
+    def test_generated_rows(self):
+        call_command('seed_scale', listings=300, users=20, categories=5, seed=3, stdout=io.StringIO())
+        self.assertEqual(
+            [model.objects.count() for model in (User, Contact, Category, Listing)], [20, 20, 5, 300]
+        )
+        self.assertTrue(Bid.objects.exists())
+        self.assertTrue(Comment.objects.exists())
+        self.assertTrue(Watchlist.objects.exists())
+
+        for listing in Listing.objects.select_related('top_bid'):
+            self.assertLessEqual(listing.current_price, PriceField.MAX_VALUE)
+            self.assertEqual(listing.bid_count, listing.bid_set.count())
+            if listing.bid_count:
+                self.assertEqual(listing.top_bid.value, listing.current_price)
+            if listing.winner:
+                self.assertEqual(listing.winner, str(listing.top_bid.user_id))
+                self.assertFalse(listing.active)
+
+        # Full-text index is rebuilt and its triggers are back.
+        title = Listing.objects.filter(active=True).values_list('title', flat=True).first()
+        self.assertTrue(search_listings(title))
+        self.assertTrue(Listing.objects.create(
+            title='Xylophone', description='Xylophone', starting_price=1, current_price=1,
+            user=User.objects.first(), category=Category.objects.first()
+        ))
+        self.assertEqual([listing.title for listing in search_listings('xylophone')], ['Xylophone'])
+
+        with self.assertRaises(CommandError):
+            call_command('seed_scale', listings=10, stdout=io.StringIO())
+
+    def test_prices_stop_at_max_value(self):
+        # So many bids would raise prices past 64-bit cents.
+        call_command('seed_scale', listings=5, users=10, bids_per_listing=2000, seed=1, stdout=io.StringIO())
+        self.assertTrue(Listing.objects.filter(bid_count__gt=600).exists())
+        for price in Listing.objects.values_list('current_price', flat=True):
+            self.assertLessEqual(price, PriceField.MAX_VALUE)
+
+
+class ImportListingsTests(TestCase):
+    def test_dry_run_does_not_create_categories(self):
+        User.objects.create_user('seller', password='password')
+        with tempfile.NamedTemporaryFile('w', suffix='.jsonl', delete=False) as file:
+            file.write(json.dumps({
+                'title': 'Book', 'description': 'Old book', 'starting_price': 1, 'category': 'Books', 'seller': 'seller'
+            }) + '\n')
+        self.addCleanup(os.remove, file.name)
+
+        out = io.StringIO()
+        call_command('import_listings', file.name, '--dry-run', '--create-categories', stdout=out)
+        self.assertIn('Validated 1 listing(s)', out.getvalue())
+        self.assertIn('Would create 1 new category(ies): Books.', out.getvalue())
+        self.assertFalse(Category.objects.exists())
+        self.assertFalse(Listing.objects.exists())
+
+    def test_export_and_import_give_back_the_same_listings(self):
+        seller = User.objects.create_user('seller', password='password')
+        books, lamps = Category.objects.create(name='Books'), Category.objects.create(name='Lamps')
+        Listing.objects.create(
+            title='Book', description='Old, "rare" book', starting_price='0.10', current_price='12345678901234.56',
+            user=seller, category=books
+        )
+        Listing.objects.create(
+            title='Lamp', description='Desk lamp\nwith bulb', starting_price=0, current_price=PriceField.MAX_VALUE,
+            user=seller, category=lamps, active=False
+        )
+        columns = ('title', 'description', 'starting_price', 'current_price', 'category__name', 'user__username',
+                   'date_added', 'active')
+        listings = list(Listing.objects.order_by('id').values_list(*columns))
+
+        for format in ('csv', 'jsonl'):
+            with self.subTest(format), tempfile.TemporaryDirectory() as directory:
+                path = os.path.join(directory, f'listings.{format}')
+                call_command('export_listings', path, stdout=io.StringIO())
+                Listing.objects.all().delete()
+
+                call_command('import_listings', path, stdout=io.StringIO(), stderr=io.StringIO())
+                self.assertEqual(list(Listing.objects.order_by('id').values_list(*columns)), listings)
+
+
+class LiveBrokerTests(SimpleTestCase):
+    def test_broker_has_to_implement_publish(self):
+        with self.assertRaises(TypeError):
+            Broker()
+
+    def test_in_memory_broker_delivers_to_subscribers(self):
+        async def receive():
+            broker = InMemoryBroker()
+            subscription = broker.subscribe('listing-1')
+            self.assertTrue(broker.has_subscribers('listing-1'))
+            broker.publish('listing-1', {'event': 'bid'})
+            message = await asyncio.wait_for(subscription.get(), 1)
+            subscription.close()
+            self.assertFalse(broker.has_subscribers('listing-1'))
+            return message
+
+        self.assertEqual(asyncio.run(receive()), {'event': 'bid'})
+
+
+class SqlitePragmaTests(TestCase):
+    @override_settings(SQLITE_PRAGMAS={'cache_size': -1234, 'busy_timeout': 4321})
+    def test_pragmas_are_applied_to_connection(self):
+        apply_pragmas(sender=None, connection=connection)
+        self.assertEqual(current_pragmas(connection), {'cache_size': -1234, 'busy_timeout': 4321})
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaRouterTests(SimpleTestCase):
+    '''
+    Reads of requests go to replica until request or its client writes.
+    '''
+    def request_routes(self, request, write=False):
+        routes = []
+
+        def view(request):
+            routes.append(router.db_for_read(Listing))
+            if write:
+                routes.append(router.db_for_write(Listing))
+                routes.append(router.db_for_read(Listing))
+            return HttpResponse()
+
+        response = replica_stickiness_middleware(view)(request)
+        return routes, response
+
+    def test_reads_outside_requests_use_primary(self):
+        self.assertEqual(router.db_for_read(Listing), 'default')
+
+    def test_writes_stick_to_primary(self):
+        factory = RequestFactory()
+        routes, response = self.request_routes(factory.get('/'))
+        self.assertEqual(routes, ['replica'])
+        self.assertNotIn('primary', response.cookies)
+
+        routes, response = self.request_routes(factory.get('/'), write=True)
+        self.assertEqual(routes, ['replica', 'default', 'default'])
+        self.assertEqual(response.cookies['primary']['max-age'], 5)
+
+        request = factory.get('/')
+        request.COOKIES['primary'] = '1'
+        routes, _ = self.request_routes(request)
+        self.assertEqual(routes, ['default'])
+
+        routes, _ = self.request_routes(factory.post('/'))
+        self.assertEqual(routes, ['default'])
+
+
+# Number of queries every URL may run, whatever the number of rows.
+# Logged in requests include session (read from database by default) and user queries.
+# Card pages read keys of page and then its rows (see auctions/cards.py).
+QUERY_BUDGETS = {
+    'index': 2,
+    'single_listing_view': 5,
+    'listing_events': 0,
+    'login': 0,
+    'logout': 4,
+    'register': 0,
+    'profile': 3,
+    'profile_edit': 2,
+    'change_email': 2,
+    'change_password': 2,
+    'listings_view': 3,
+    'listing_delete': 7,
+    'listing_deactivate': 4,
+    'listing_activate': 4,
+    'listing_end': 7,
+    'add_to_watchlist': 7,
+    'remove_from_watchlist': 5,
+    'watchlist_view': 4,
+    'add_listing': 2,
+    'categories_view': 0,
+    'browse_listings_category': 2,
+    'search': 2,
+    'request_timing': 2,
+    'add_reply': 4,
+    'add_comment': 5,
+    'add_bid': 7,
+    'api_listings': 2,
+    'api_listing_detail': 2,
+    'api_listing_bids': 2,
+    'api_categories': 0,
+}
+
+
+class QueryBudgetMixin:
+    '''
+    Requests every URL of auctions/urls.py and checks its number of queries
+    against QUERY_BUDGETS. Subclasses seed different amounts of data,
+    so budget holding for all of them means query count does not grow with rows.
+
+    Render times are collected and, when QUERY_BUDGET_REPORT environment
+    variable names a file, written there as JSON, so CI can keep them.
+    '''
+    size = None
+    timings = {}
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = User.objects.create_user('seller', 'seller@example.com', 'password')
+        cls.buyer = User.objects.create_user('buyer', 'buyer@example.com', 'password')
+        cls.staff = User.objects.create_user('staff', 'staff@example.com', 'password', is_staff=True)
+        Contact.objects.create(user=cls.seller)
+        Contact.objects.create(user=cls.buyer)
+        cls.category = Category.objects.create(name='Books')
+        cls.listing = Listing.objects.create(
+            title='Book', description='Good book', starting_price=1, current_price=2,
+            user=cls.seller, category=cls.category
+        )
+        Bid.objects.create(value=2, user=cls.buyer, listing=cls.listing)
+        cls.comment = Comment.objects.create(content='Is it new?', listing=cls.listing, author=cls.buyer)
+        cls.watched = Listing.objects.create(
+            title='Lamp', description='Desk lamp', starting_price=1, current_price=1,
+            user=cls.seller, category=cls.category
+        )
+        Watchlist.objects.create(user=cls.buyer, listing=cls.watched)
+        cls.seed()
+
+    @classmethod
+    def seed(cls):
+        pass
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        path = os.environ.get('QUERY_BUDGET_REPORT')
+        if path and cls.size:
+            report = {}
+            if os.path.exists(path):
+                with open(path, encoding='utf-8') as file:
+                    report = json.load(file)
+            report[cls.size] = cls.timings
+            with open(path, 'w', encoding='utf-8') as file:
+                json.dump(report, file, indent=2, sort_keys=True)
+
+    def requests(self):
+        '''
+        Returns (URL name, client, method, url, data) of every case.
+        '''
+        anonymous = self.client_class()
+        seller = self.client_class()
+        seller.force_login(self.seller)
+        buyer = self.client_class()
+        buyer.force_login(self.buyer)
+        # Separate client, so other cases stay logged in.
+        leaving = self.client_class()
+        leaving.force_login(self.buyer)
+        staff = self.client_class()
+        staff.force_login(self.staff)
+
+        listing = self.listing.id
+        return [
+            ('index', anonymous, 'get', reverse('index'), {'sort': 'price', 'min_price': '1', 'max_price': '5000'}),
+            ('single_listing_view', buyer, 'get', reverse('single_listing_view', args=[listing]), {}),
+            ('listing_events', anonymous, 'get', reverse('listing_events', args=[listing]), {}),
+            ('login', anonymous, 'get', reverse('login'), {}),
+            ('logout', leaving, 'get', reverse('logout'), {}),
+            ('register', anonymous, 'get', reverse('register'), {}),
+            ('profile', buyer, 'get', reverse('profile'), {}),
+            ('profile_edit', buyer, 'get', reverse('profile_edit'), {}),
+            ('change_email', buyer, 'get', reverse('change_email'), {}),
+            ('change_password', buyer, 'get', reverse('change_password'), {}),
+            ('listings_view', seller, 'get', reverse('listings_view'), {}),
+            ('listing_delete', seller, 'post', reverse('listing_delete'), {'listing_id': listing}),
+            ('listing_deactivate', seller, 'post', reverse('listing_deactivate'), {'listing_id': listing}),
+            ('listing_activate', seller, 'post', reverse('listing_activate'), {'listing_id': listing}),
+            ('listing_end', seller, 'post', reverse('listing_end'), {'listing_id': listing}),
+            ('add_to_watchlist', buyer, 'post', reverse('add_to_watchlist'), {'listing_id': listing}),
+            ('remove_from_watchlist', buyer, 'post', reverse('remove_from_watchlist'), {'listing_id': self.watched.id}),
+            ('watchlist_view', buyer, 'get', reverse('watchlist_view'), {}),
+            ('add_listing', seller, 'get', reverse('add_listing'), {}),
+            ('categories_view', anonymous, 'get', reverse('categories_view'), {}),
+            ('browse_listings_category', anonymous, 'post', reverse('browse_listings_category'),
+             {'category_id': self.category.id}),
+            ('search', anonymous, 'get', reverse('search'), {'q': 'book', 'category_id': self.category.id}),
+            ('request_timing', staff, 'get', reverse('request_timing'), {}),
+            ('add_reply', seller, 'post', reverse('add_reply'), {
+                'comment_id': self.comment.id, 'reply_content': 'Yes', 'listing_id': listing
+            }),
+            ('add_comment', buyer, 'post', reverse('add_comment'), {
+                'listing_id': listing, 'comment_content': 'Still available?', 'comment_author': self.buyer.id
+            }),
+            ('add_bid', buyer, 'post', reverse('add_bid'), {'bid_value': 1000, 'listing_id': listing}),
+            ('api_listings', anonymous, 'get', reverse('api_listings'), {'sort': 'price_desc', 'min_price': '0.5'}),
+            ('api_listing_detail', anonymous, 'get', reverse('api_listing_detail', args=[listing]), {}),
+            ('api_listing_bids', anonymous, 'get', reverse('api_listing_bids', args=[listing]), {}),
+            ('api_categories', anonymous, 'get', reverse('api_categories'), {}),
+        ]
+
+    def test_every_url_has_budget(self):
+        names = {pattern.name for pattern in urls.urlpatterns}
+        self.assertEqual(names, {name for name, *_ in self.requests()})
+        self.assertEqual(names, set(QUERY_BUDGETS))
+
+    def test_query_budgets(self):
+        # Budgets are for warm process caches, filled with this data set.
+        cache.clear()
+        get_categories()
+        get_listing_counts()
+
+        for name, client, method, url, data in self.requests():
+            with self.subTest(name), transaction.atomic():
+                # Every request starts from the same seeded data.
+                with self.assertNumQueries(QUERY_BUDGETS[name]):
+                    response = getattr(client, method)(url, data)
+                self.assertLess(response.status_code, 400)
+                transaction.set_rollback(True)
+
+                entry = recent_timings()[-1]
+                self.timings[name] = {
+                    'queries': entry['queries'],
+                    'template_ms': entry['template_ms'],
+                    'total_ms': entry['total_ms'],
+                }
+
+
+@override_settings(REQUEST_TIMING=True)
+class SmallQueryBudgetTests(QueryBudgetMixin, TestCase):
+    size = 'small'
+    timings = {}
+
+
+@override_settings(REQUEST_TIMING=True)
+class LargeQueryBudgetTests(QueryBudgetMixin, TestCase):
+    '''
+    Several pages of listings, watched listings and categories,
+    hundreds of bids and comments on the requested listing
+    and ended listings sold to different bidders.
+    '''
+    size = 'large'
+    timings = {}
+
+    @classmethod
+    def seed(cls):
+        bidders = [User.objects.create_user(f'bidder{i}', password='password') for i in range(20)]
+        Category.objects.bulk_create([Category(name=f'Category {i}') for i in range(30)])
+        categories = list(Category.objects.exclude(id=cls.category.id))
+        Listing.objects.bulk_create([
+            Listing(
+                title=f'Book {i}', description='Another book', starting_price=1, current_price=1,
+                user=cls.seller, category=categories[i % len(categories)] if i % 2 else cls.category
+            )
+            for i in range(100)
+        ])
+        listings = list(Listing.objects.exclude(id__in=[cls.listing.id, cls.watched.id]))
+        Bid.objects.bulk_create([
+            Bid(value=3 + i, user=bidders[i % len(bidders)], listing=cls.listing) for i in range(300)
+        ])
+        Comment.objects.bulk_create([
+            Comment(content=f'Comment {i}', listing=cls.listing, author=bidders[i % len(bidders)])
+            for i in range(300)
+        ])
+        Watchlist.objects.bulk_create([Watchlist(user=cls.buyer, listing=listing) for listing in listings[:60]])
+        sold = listings[60:80]
+        Bid.objects.bulk_create([
+            Bid(value=2, user=bidders[i % len(bidders)], listing=listing) for i, listing in enumerate(sold)
+        ])
+        Listing.objects.filter(id=cls.listing.id).update(current_price=302)
+        refresh_bid_stats(Listing.objects.filter(id__in=[cls.listing.id] + [listing.id for listing in sold]))
+        end_listings(Listing.objects.filter(id__in=[listing.id for listing in sold]))
+
+    def test_sold_listings_show_winner(self):
+        self.client.force_login(self.seller)
+        response = self.client.get(reverse('listings_view'))
+        self.assertContains(response, 'ITEM SOLD - BUYER: bidder0')
+        self.assertContains(response, 'ITEM SOLD - BUYER: bidder19')
+
+
+@override_settings(ASYNC_READ_VIEWS=True, REQUEST_TIMING=True)
+class AsyncViewTests(TransactionTestCase):
+    '''
+    Async read views (served under ASGI) render the same pages within the same
+    query budgets as sync ones. Their queries run in other threads with own
+    connections, so data has to be committed and queries are counted
+    by timing middleware, which follows request into those threads.
+    '''
+    ASYNC_VIEWS = (
+        'index', 'single_listing_view', 'watchlist_view', 'categories_view', 'browse_listings_category'
+    )
+
+    @classmethod
+    def reload_urls(cls):
+        # URLs pick views when imported, root URLconf keeps resolver of included ones.
+        importlib.reload(urls)
+        importlib.reload(root_urls)
+        clear_url_caches()
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reload_urls()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        cls.reload_urls()
+
+    def setUp(self):
+        cache.clear()
+        self.seller = User.objects.create_user('seller', password='password')
+        self.buyer = User.objects.create_user('buyer', password='password')
+        self.category = Category.objects.create(name='Books')
+        self.listing = Listing.objects.create(
+            title='Book', description='Good book', starting_price=1, current_price=2,
+            user=self.seller, category=self.category
+        )
+        Comment.objects.create(content='Is it new?', listing=self.listing, author=self.buyer)
+        Watchlist.objects.create(user=self.buyer, listing=self.listing)
+        get_categories()
+        get_listing_counts()
+
+    def assertWithinBudget(self, name, response):
+        entry = recent_timings()[-1]
+        self.assertEqual(entry['view'], name)
+        self.assertEqual(entry['queries'], QUERY_BUDGETS[name])
+
+    def test_read_views_are_async(self):
+        for name in self.ASYNC_VIEWS:
+            args = [self.listing.id] if name == 'single_listing_view' else []
+            self.assertTrue(asyncio.iscoroutinefunction(resolve(reverse(name, args=args)).func), name)
+
+    async def test_pages(self):
+        anonymous = AsyncClient()
+        buyer = AsyncClient()
+        await sync_to_async(buyer.force_login)(self.buyer)
+
+        # Async request factory of Django 3.1 reads query string only from URL
+        # and sends empty POST body, so category is passed in query string.
+        cases = [
+            ('index', anonymous, reverse('index') + '?sort=price&max_price=10'),
+            ('single_listing_view', buyer, reverse('single_listing_view', args=[self.listing.id])),
+            ('watchlist_view', buyer, reverse('watchlist_view')),
+            ('categories_view', anonymous, reverse('categories_view')),
+            ('browse_listings_category', anonymous,
+             f"{reverse('browse_listings_category')}?category_id={self.category.id}"),
+        ]
+        for name, client, url in cases:
+            with self.subTest(name):
+                response = await client.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertWithinBudget(name, response)
+                if name != 'categories_view':
+                    self.assertContains(response, 'Book')
+
+    async def test_watchlist_requires_login(self):
+        response = await AsyncClient().get(reverse('watchlist_view'))
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(response.url.startswith(reverse('login')))
+
+    async def test_unknown_category_is_not_found(self):
+        for category_id in (self.category.id + 1, 'abc'):
+            with self.subTest(category_id=category_id):
+                response = await AsyncClient().get(f"{reverse('browse_listings_category')}?category_id={category_id}")
+                self.assertEqual(response.status_code, 404)
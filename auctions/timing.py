@@ -0,0 +1,203 @@
+'''
+Per-request instrumentation: number and total time of SQL queries,
+template render time and total time of every request, keyed by URL name.
+
+Measurements are sent to client in Server-Timing header, kept in
+in-process ring buffer (see recent_timings and timing_summary)
+and optionally appended to JSON Lines file (REQUEST_TIMING_LOG).
+
+Request being measured is kept in context variable, so queries and templates
+are attributed to it also when they run in threads (sync_to_async).
+Query wrapper is installed on every database connection when it is opened
+(see AuctionsConfig.ready) and costs single context variable lookup
+when no request is measured.
+'''
+import asyncio
+import json
+import threading
+import time
+from collections import deque
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.template.backends.django import DjangoTemplates, Template
+from django.utils.decorators import sync_and_async_middleware
+
+from .benchmark import percentile
+
+
+current_timing = ContextVar('current_timing', default=None)
+
+_buffer = deque(maxlen=1000)
+_log_lock = threading.Lock()
+_log_file = None
+
+
+class RequestTiming:
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.queries = 0
+        self.sql_time = 0.0
+        self.template_time = 0.0
+        self.template_depth = 0
+
+
+def record_query(execute, sql, params, many, context):
+    '''
+    Execute wrapper adding query time to measured request.
+    '''
+    timing = current_timing.get()
+    if timing is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timing.sql_time += time.perf_counter() - start
+        timing.queries += 1
+
+
+def install_query_wrapper(connection, **kwargs):
+    # Inserted at the beginning, so connection.execute_wrapper() blocks,
+    # which pop the last wrapper on exit, never remove it.
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, record_query)
+
+
+class TimedTemplate(Template):
+    '''
+    Template measuring its render time. Templates rendered inside
+    other template (e.g. listing cards) are counted only once.
+    '''
+    def render(self, context=None, request=None):
+        timing = current_timing.get()
+        if timing is None:
+            return super().render(context, request)
+
+        timing.template_depth += 1
+        start = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            timing.template_depth -= 1
+            if not timing.template_depth:
+                timing.template_time += time.perf_counter() - start
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    '''
+    Django template backend returning TimedTemplate.
+    '''
+    def from_string(self, template_code):
+        return TimedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        return TimedTemplate(super().get_template(template_name).template, self)
+
+
+@sync_and_async_middleware
+def request_timing_middleware(get_response):
+    '''
+    Measures requests when REQUEST_TIMING is on.
+    Should be the first middleware, so it measures whole request.
+    Works with both sync and async views without thread switches.
+    '''
+    if not settings.REQUEST_TIMING:
+        raise MiddlewareNotUsed()
+
+    global _buffer
+    if _buffer.maxlen != settings.REQUEST_TIMING_BUFFER_SIZE:
+        _buffer = deque(_buffer, maxlen=settings.REQUEST_TIMING_BUFFER_SIZE)
+
+    if asyncio.iscoroutinefunction(get_response):
+        async def middleware(request):
+            timing = RequestTiming()
+            token = current_timing.set(timing)
+            try:
+                response = await get_response(request)
+            finally:
+                current_timing.reset(token)
+            finish(request, response, timing)
+            return response
+
+    else:
+        def middleware(request):
+            timing = RequestTiming()
+            token = current_timing.set(timing)
+            try:
+                response = get_response(request)
+            finally:
+                current_timing.reset(token)
+            finish(request, response, timing)
+            return response
+
+    return middleware
+
+
+def finish(request, response, timing):
+    total_time = time.perf_counter() - timing.start
+    match = request.resolver_match
+    entry = {
+        'time': time.time(),
+        'view': match.view_name if match else None,
+        'method': request.method,
+        'path': request.path,
+        'status': response.status_code,
+        'queries': timing.queries,
+        'sql_ms': round(timing.sql_time * 1000, 3),
+        'template_ms': round(timing.template_time * 1000, 3),
+        'total_ms': round(total_time * 1000, 3),
+    }
+
+    response['Server-Timing'] = (
+        f'db;desc="{timing.queries} queries";dur={entry["sql_ms"]}, '
+        f'tpl;dur={entry["template_ms"]}, '
+        f'total;dur={entry["total_ms"]}'
+    )
+
+    _buffer.append(entry)
+    if settings.REQUEST_TIMING_LOG:
+        write_log(entry)
+
+
+def write_log(entry):
+    global _log_file
+    line = json.dumps(entry, separators=(',', ':')) + '\n'
+    with _log_lock:
+        if _log_file is None:
+            _log_file = open(settings.REQUEST_TIMING_LOG, 'a', encoding='utf-8', buffering=1)
+        _log_file.write(line)
+
+
+def recent_timings():
+    '''
+    Returns measurements of recent requests, the oldest first.
+    '''
+    return list(_buffer)
+
+
+def timing_summary():
+    '''
+    Returns measurements from ring buffer aggregated by URL name,
+    views taking the most time in total first.
+    '''
+    by_view = {}
+    for entry in recent_timings():
+        by_view.setdefault(entry['view'] or entry['path'], []).append(entry)
+
+    summary = []
+    for view, entries in by_view.items():
+        totals = sorted(entry['total_ms'] for entry in entries)
+        count = len(entries)
+        summary.append({
+            'view': view,
+            'requests': count,
+            'mean_ms': round(sum(totals) / count, 3),
+            'p95_ms': percentile(totals, 0.95),
+            'max_ms': totals[-1],
+            'mean_queries': round(sum(entry['queries'] for entry in entries) / count, 2),
+            'mean_sql_ms': round(sum(entry['sql_ms'] for entry in entries) / count, 3),
+            'mean_template_ms': round(sum(entry['template_ms'] for entry in entries) / count, 3),
+        })
+    return sorted(summary, key=lambda row: row['mean_ms'] * row['requests'], reverse=True)
@@ -1,10 +1,16 @@
+from django.conf import settings
 from django.urls import path
 
-from . import views
+from . import api, async_views, views
+
+
+# Under ASGI read-heavy pages are served by async views.
+read_views = async_views if settings.ASYNC_READ_VIEWS else views
 
 urlpatterns = [
-    path("", views.index, name="index"),
-    path("listing/<str:id>", views.single_listing_view, name="single_listing_view"),
+    path("", read_views.index, name="index"),
+    path("listing/<str:id>", read_views.single_listing_view, name="single_listing_view"),
+    path("listing/<int:id>/events", views.listing_events, name="listing_events"),
     path("login", views.login_view, name="login"),
     path("logout", views.logout_view, name="logout"),
     path("register", views.register, name="register"),
@@ -21,14 +27,23 @@ urlpatterns = [
 
     path("watchlist/add", views.add_to_watchlist, name="add_to_watchlist"),
     path("watchlist/remove", views.remove_from_watchlist, name="remove_from_watchlist"),
-    path("watchlist/browse", views.watchlist_view, name="watchlist_view"),
+    path("watchlist/browse", read_views.watchlist_view, name="watchlist_view"),
 
     path("add", views.add_listing, name="add_listing"),
 
-    path("category", views.categories_view, name="categories_view"),
-    path("category/browse", views.browse_listings_category, name="browse_listings_category"),
+    path("category", read_views.categories_view, name="categories_view"),
+    path("category/browse", read_views.browse_listings_category, name="browse_listings_category"),
+
+    path("search", views.search, name="search"),
+
+    path("timing", views.request_timing, name="request_timing"),
 
     path("comment/reply", views.add_reply, name="add_reply"),
     path("comment/add", views.add_comment, name="add_comment"),
-    path("bid/add", views.add_bid, name="add_bid")
+    path("bid/add", views.add_bid, name="add_bid"),
+
+    path("api/v1/listings", api.listings, name="api_listings"),
+    path("api/v1/listings/<int:id>", api.listing_detail, name="api_listing_detail"),
+    path("api/v1/listings/<int:id>/bids", api.listing_bids, name="api_listing_bids"),
+    path("api/v1/categories", api.categories, name="api_categories")
 ]
\ No newline at end of file
@@ -1,31 +1,117 @@
+from django.conf import settings
 from django.contrib.auth import authenticate, login, logout
-from django.db import IntegrityError
-from django.http import HttpResponse, HttpResponseRedirect
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import Http404, HttpResponse, HttpResponseRedirect, JsonResponse
 from django.shortcuts import redirect, render
 from django.urls import reverse
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.core.files import File
 
-from .models import Bid, Category, Contact, Comment, Listing, User, Watchlist
+from .bidding import BidResult, end_listings, place_bid, top_bid
+from .browsing import ListingFilters, parse_price
+from .cards import load_listings
+from .categories import get_categories, get_category, get_listing_counts
+from .images import queue_photo_variants
+from .models import Bid, Contact, Comment, Listing, User, Watchlist, winner_username
+from .pagination import KeysetPage, keyset_paginate
+from .search import search_listings
+from .timing import recent_timings, timing_summary
+
+
+# Queries of read-heavy pages, shared with async views (see auctions/async_views.py).
+
+def get_card_page(queryset, cursor, filters=None):
+    '''
+    Returns page of listings shown as cards, newest first unless filters sort them otherwise.
+    Keys of page are read first, then card versions, then rows (see auctions/cards.py).
+    Category is joined, so each card gets its name without extra lookup.
+    '''
+    if filters is None:
+        filters = ListingFilters()
+    keys = filters.paginate(queryset.only('id', *(field.lstrip('-') for field in filters.ordering)), cursor)
+    listings, card_versions = load_listings(
+        [listing.id for listing in keys], Listing.objects.select_related('category')
+    )
+    page = KeysetPage(listings, keys.next_cursor)
+    page.card_versions = card_versions
+    return page
+
+
+def get_feed_page(cursor, filters=None):
+    '''
+    Returns page of active listings, newest first unless filters sort them otherwise.
+    '''
+    return get_card_page(Listing.objects.filter(active=True), cursor, filters)
+
+
+def get_listing(listing_id):
+    '''
+    Returns listing with its top bid joined, so bid state needs no more queries.
+    '''
+    return Listing.objects.select_related('top_bid').get(id=listing_id)
+
+
+def get_watchlist_entry(user_id, listing_id):
+    '''
+    Returns user's watchlist entry of listing or None.
+    '''
+    return Watchlist.objects.filter(user_id=user_id, listing_id=listing_id).first()
+
+
+def get_comments_page(listing_id, cursor):
+    '''
+    Returns page of listing's comments, newest first, with author's username joined.
+    '''
+    return keyset_paginate(
+        Comment.objects.filter(listing_id=listing_id).select_related('author').only(
+            'id', 'date_added', 'content', 'reply', 'listing', 'author__username'
+        ),
+        cursor,
+        per_page=settings.COMMENTS_PER_PAGE
+    )
+
+
+def get_category_page(category_id, cursor, filters=None):
+    '''
+    Returns page of active listings without winner with matching category_id,
+    newest first unless filters sort them otherwise.
+    '''
+    if filters is None:
+        filters = ListingFilters()
+    filters.category_id = category_id
+    return get_card_page(Listing.objects.filter(active=True, winner__isnull=True), cursor, filters)
+
+
+def get_watchlist_page(user_id, cursor):
+    '''
+    Returns page of listings watched by user which are still active or were won by user.
+    '''
+    return get_card_page(
+        Listing.objects.filter(watchlist__user_id=user_id).filter(Q(active=True) | Q(winner=str(user_id))),
+        cursor
+    )
 
 
 def index(request):
     '''
-    Renders page with all active listings.
+    Renders page with all active listings, optionally filtered by category
+    and price range and sorted by price.
     '''
-    # Gets all Listing objects.
-    listings = Listing.objects.all().order_by('-date_added')
-    # Gets all Category objects.
-    categories = Category.objects.all().order_by('name')
-    
+    filters = ListingFilters.from_query(request.GET)
+    listings = get_feed_page(request.GET.get('cursor'), filters)
+
     header_title = "All listings"
 
     return render(request, "auctions/browse_listings.html", {
         "listings": listings,
-        "categories": categories,
         "header_title": header_title,
-        "logged_user_id": "No winner"
+        "logged_user_id": "No winner",
+        "filters": filters,
+        "categories": get_categories(),
+        "query_string": filters.query_string(category=True)
     })
 
 
@@ -33,8 +119,8 @@ def categories_view(request):
     '''
     Renders page with all avaiable categories.
     '''
-    # Gets all Category objects.
-    categories = Category.objects.all().order_by('name')
+    counts = get_listing_counts()
+    categories = [(category, counts.get(category.id, 0)) for category in get_categories()]
 
     return render(request, "auctions/categories.html", {
         "categories": categories
@@ -46,53 +132,92 @@ def single_listing_view(request, id):
     Renders page for single listing.
     '''
     logged_user = request.user
-    
-    try:
-        watchlist = Watchlist.objects.get(user_id=logged_user.id, listing_id=id)
-    except Watchlist.DoesNotExist:
-        watchlist = None
-
-    listing = Listing.objects.get(id=id)
-    comments = Comment.objects.filter(listing_id=id)
 
-    user_ids = []
-    for comment in comments:
-        user_ids.append(comment.author_id)
-
-    user_ids = set(user_ids)
-
-    authors = User.objects.filter(id__in=user_ids)
+    watchlist = get_watchlist_entry(logged_user.id, id)
+    listing = get_listing(id)
+    comments = get_comments_page(id, request.GET.get('cursor'))
 
     return render(request, "auctions/listing_single_view.html", {
         "logged_user_id": logged_user.id,
         "listing": listing,
         "comments": comments,
-        "authors": authors,
         "watchlist": watchlist
     })
 
 
+def listing_events(request, id):
+    '''
+    Event stream of listing is served by ASGI app (see auctions/live.py).
+    When site runs under WSGI, responds with 204, so browser's EventSource
+    stops reconnecting and page works without live updates.
+    '''
+    return HttpResponse(status=204)
+
+
 def browse_listings_category(request):
     '''
     Renders page with all active listings matching selected category.
     '''
-    if request.method == 'POST':
-        # TODO check if int() function necessary
-        category_id = int(request.POST['category_id'])
-        category = Category.objects.get(id=category_id)
+    # Category comes from form on first page and from query string on next pages.
+    category_id = request.POST.get('category_id') or request.GET.get('category_id')
+
+    if category_id:
+        category = get_category(category_id)
+        if category is None:
+            raise Http404("Category does not exist.")
 
-        # Gets listings from Listing objects with matching category_id.
-        listings = Listing.objects.filter(category_id=category_id).order_by('-date_added')
+        filters = ListingFilters.from_query(request.GET, category_id=category.id)
+        listings = get_category_page(category.id, request.GET.get('cursor'), filters)
 
         return render(request, "auctions/browse_listings_category.html", {
             "listings": listings,
-            "category": category
+            "category": category,
+            "filters": filters,
+            "query_string": filters.query_string()
         })
 
     else:
         return redirect('categories_view')
 
 
+def search(request):
+    '''
+    Renders page with active listings matching searched text,
+    optionally limited to category and price range.
+    '''
+    text = request.GET.get('q', '').strip()
+
+    category_id = request.GET.get('category_id')
+    category_id = int(category_id) if category_id and category_id.isdigit() else None
+
+    listings = search_listings(
+        text,
+        category_id=category_id,
+        min_price=get_price_param(request, 'min_price'),
+        max_price=get_price_param(request, 'max_price'),
+        cursor=request.GET.get('cursor')
+    )
+
+    # Next page link keeps all search parameters.
+    query = request.GET.copy()
+    query.pop('cursor', None)
+
+    return render(request, "auctions/browse_listings.html", {
+        "listings": listings,
+        "header_title": f"Search results for: {text}" if text else "Search",
+        "logged_user_id": "No winner",
+        "query_string": query.urlencode(),
+        "search_text": text
+    })
+
+
+def get_price_param(request, name):
+    '''
+    Returns price from query string or None if it is missing or invalid.
+    '''
+    return parse_price(request.GET.get(name, ''))
+
+
 def register(request):
     '''
     Registers new user.
@@ -349,15 +474,20 @@ def add_listing(request):
             # Saves data about new listing provided in html form.
             title = request.POST["title"]
             description = request.POST["description"]
-            starting_price = float(request.POST["price"])
-            current_price = float(request.POST["price"])
+            starting_price = parse_price(request.POST["price"])
+            current_price = starting_price
             user_id = logged_user.id
 
+            # Checks if price is correct.
+            if starting_price is None:
+                messages.info(request, "Price has to be a non-negative number with at most 2 decimal places.")
+                return redirect('add_listing')
+
             # Gets category id from Category object.
             post_category = request.POST["category"]
 
             # Get category with id equal to id from POST method.
-            category = Category.objects.get(id=post_category)
+            category = get_category(post_category)
 
             # Checks if category is correct.
             if category:
@@ -370,10 +500,14 @@ def add_listing(request):
 
                 else:
                     # Creates new Listing instance.
-                    new_listing = Listing(title=title, description=description, starting_price=starting_price, user_id=user_id, category_id=category_id)
+                    new_listing = Listing(title=title, description=description, starting_price=starting_price, current_price=current_price, user_id=user_id, category_id=category_id)
                 
                 new_listing.save()
 
+                # Generates thumbnails of uploaded photo in background.
+                if new_listing.photo.name != 'default.jpg':
+                    transaction.on_commit(lambda: queue_photo_variants(new_listing))
+
                 return redirect('index')
             
             else:
@@ -388,7 +522,7 @@ def add_listing(request):
 
     else:
         # Renders page with form.
-        categories = Category.objects.all().order_by('name')
+        categories = get_categories()
 
         return render(request, "auctions/add_listing.html", {
             "categories": categories
@@ -403,13 +537,15 @@ def listings_view(request):
     logged_user = request.user
     user_id = logged_user.id
 
-    # Gets listings from Listing objects with matching user_id.
-    listings = Listing.objects.filter(user_id=user_id).order_by('-date_added')
-    categories = Category.objects.all().order_by('name')
+    # Gets listings from Listing objects with matching user_id,
+    # with username of winner of every sold one.
+    listings = (
+        Listing.objects.filter(user_id=user_id).select_related('category')
+        .annotate(winner_username=winner_username()).order_by('-date_added')
+    )
 
     return render(request, "auctions/listings_view.html", {
-        "listings": listings,
-        "categories": categories
+        "listings": listings
     })
 
 
@@ -492,21 +628,22 @@ def listing_end(request):
         user_id = logged_user.id
 
         # Gets listing id from POST method.
-        # and searches for Listing object with that id.
         listing_id = request.POST['listing_id']
-        listing = Listing.objects.get(id=listing_id)
 
-        # Gets bid with matching listing_id and value.
-        bid = Bid.objects.get(listing_id=listing.id, value=listing.current_price)
-       
-        # Listing winner gets user id from matching bid.
-        listing.winner = bid.user_id
-        listing.active = 0
-        listing.save()
+        # Ends listing if it belongs to logged user,
+        # user with top bid becomes winner.
+        ended = end_listings(Listing.objects.filter(id=listing_id, user_id=user_id))
 
-        winner = User.objects.get(id=listing.winner)
-        
-        messages.info(request, f"Auction succesfully closed. Winner of this auction is {winner.username}.")
+        if ended:
+            bid = top_bid(listing_id)
+            if bid:
+                messages.info(request, f"Auction succesfully closed. Winner of this auction is {bid.user.username}.")
+            else:
+                messages.info(request, "Auction succesfully closed. There were no bids, so auction has no winner.")
+        elif Listing.objects.filter(id=listing_id, user_id=user_id).exists():
+            messages.info(request, "This auction has already ended or is suspended.")
+        else:
+            messages.info(request, "This auction cannot be closed.")
         return redirect('listings_view')
 
     else:
@@ -589,30 +726,29 @@ def add_bid(request):
     if request.method == 'POST':
         if request.POST['bid_value'] and request.POST['listing_id']:
             # Saves data from POST method.
-            value = float(request.POST['bid_value'])
             listing_id = request.POST['listing_id']
+            value = parse_price(request.POST['bid_value'])
+            if value is None:
+                messages.info(request, 'Bid has to be a number with at most 2 decimal places.')
+                return redirect('single_listing_view', listing_id)
 
-            # Gets logged user.
-            logged_user = request.user
-
-            # Gets Listing object with matching id.
-            listing = Listing.objects.get(id=listing_id)
-            current_price = listing.current_price
-            # Checks if new bid is higher than current price.
-            if value > current_price:
-                # Updates current price of listing.
-                listing.current_price = value
-                listing.save()
-                # Creates new Bid object.
-                bid = Bid(value = value, user = logged_user, listing = listing)
-                bid.save()
+            # Raises current price and saves bid in one transaction,
+            # only if new bid is higher than current price.
+            result = place_bid(request.user.id, listing_id, value)
 
+            if result.accepted:
                 messages.info(request, 'Bid succesfully added.')
-                return redirect('single_listing_view', listing_id)
-
-            else:
+            elif result.status == BidResult.OUTBID:
                 messages.info(request, 'New bid has to be higher than current price.')
-                return redirect('single_listing_view', listing_id)
+            elif result.status == BidResult.OWN_LISTING:
+                messages.info(request, "You can't bid on your own listing.")
+            elif result.status == BidResult.CLOSED:
+                messages.info(request, 'This auction is not active.')
+            else:
+                messages.info(request, 'Such listing does not exist.')
+                return redirect('index')
+
+            return redirect('single_listing_view', listing_id)
 
         else:
             listing_id = request.POST['listing_id']
@@ -634,9 +770,9 @@ def add_to_watchlist(request):
             listing_id = request.POST['listing_id']
             listing = Listing.objects.get(id = listing_id)
 
-            # Creates watchlist object with connection to provided user and listing.
-            new_watchlist = Watchlist(user = logged_user, listing = listing)
-            new_watchlist.save()
+            # Creates watchlist object with connection to provided user and listing,
+            # unless listing is already on user's watchlist.
+            Watchlist.objects.get_or_create(user = logged_user, listing = listing)
 
             messages.info(request, 'Item successfully added to watchlist.')
             return redirect('single_listing_view', listing_id)
@@ -682,18 +818,25 @@ def watchlist_view(request):
     Allows logged user to view listings added to watchlist.
     '''
     logged_user = request.user
-    watchlist = Listing.objects.filter(watchlist__user=logged_user).order_by('title') #relationship query
 
-    # Get watchlist
-    # Get listings with user_id matching logged user and that are on watchlist
-    # Render template with list of listings limited by those filters
+    watchlist = get_watchlist_page(logged_user.id, request.GET.get('cursor'))
 
-    categories = Category.objects.all().order_by('name')
     header_title = "My watchlist"
 
     return render(request, "auctions/browse_listings.html", {
         "listings": watchlist,
-        "categories": categories,
         "header_title": header_title,
         "logged_user_id": str(logged_user.id)
-    })
\ No newline at end of file
+    })
+
+
+@staff_member_required
+def request_timing(request):
+    '''
+    Returns timings of recent requests aggregated by view
+    and the latest measurements (see auctions/timing.py).
+    '''
+    return JsonResponse({
+        "summary": timing_summary(),
+        "recent": recent_timings()[-50:]
+    })
@@ -13,4 +13,12 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'commerce.settings')
 
-application = get_asgi_application()
+# Serves read-heavy pages with async views (see auctions/async_views.py).
+os.environ.setdefault('AUCTIONS_ASYNC_READ_VIEWS', '1')
+
+django_application = get_asgi_application()
+
+# Event streams of listings are served outside of Django's request handler.
+from auctions.live import events_application  # noqa: E402
+
+application = events_application(django_application)
@@ -12,6 +12,8 @@ https://docs.djangoproject.com/en/3.0/ref/settings/
 
 import os
 
+from django.core.exceptions import ImproperlyConfigured
+
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
@@ -41,6 +43,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'auctions.timing.request_timing_middleware',
+    'auctions.routers.replica_stickiness_middleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -54,7 +58,8 @@ ROOT_URLCONF = 'commerce.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # Django templates measuring render time (see auctions/timing.py).
+        'BACKEND': 'auctions.timing.TimedDjangoTemplates',
         'DIRS': [],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -83,6 +88,35 @@ DATABASES = {
 
 AUTH_USER_MODEL = 'auctions.User'
 
+# Cache
+# https://docs.djangoproject.com/en/3.0/topics/cache/
+# Local-memory cache needs no external services, but every worker process
+# has its own. AUCTIONS_CACHE_DIR switches to file based cache in given
+# writable directory, shared by all worker processes.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'auctions',
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+        },
+    }
+}
+
+if os.environ.get('AUCTIONS_CACHE_DIR'):
+    CACHES['default'].update({
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ['AUCTIONS_CACHE_DIR'],
+    })
+
+# Whether default cache is seen by all worker processes. Features which
+# invalidate cached data across processes require it.
+SHARED_CACHE = CACHES['default']['BACKEND'] not in (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
 # Password validation
 # https://docs.djangoproject.com/en/3.0/ref/settings/#auth-password-validators
 
@@ -121,8 +155,137 @@ USE_TZ = True
 
 STATIC_URL = '/static/'
 
+# Directory collectstatic copies static files to.
+STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
+
+# Outside development collectstatic writes content-hashed, precompressed files
+# (run 'python manage.py collectstatic' before start).
+if not DEBUG:
+    STATICFILES_STORAGE = 'auctions.storage.CompressedManifestStaticFilesStorage'
+
+# Cache-Control max-age (in seconds) of static files without content hash
+# and of uploaded media files. Hashed static files are cached for a year.
+STATIC_CACHE_MAX_AGE = 60 * 60
+MEDIA_CACHE_MAX_AGE = 60 * 60 * 24
+
 MEDIA_ROOT = os.path.join(BASE_DIR, 'auctions/media')
 
 MEDIA_URL = '/media/'
 
-LOGIN_URL = '/login'
\ No newline at end of file
+LOGIN_URL = '/login'
+
+
+# Number of listings rendered on single page of listing feed.
+
+LISTINGS_PER_PAGE = 20
+
+# Number of comments rendered on single page of listing's comment section.
+
+COMMENTS_PER_PAGE = 20
+
+# Number of bids returned on single page of JSON API's bid history.
+
+API_PER_PAGE = 50
+
+# Cache alias and timeout (in seconds) of rendered listing cards.
+
+LISTING_CARD_CACHE = 'default'
+LISTING_CARD_TIMEOUT = 60 * 60
+
+# Widths (in pixels) of generated listing photo variants,
+# JPEG/WebP quality and number of worker processes generating them.
+
+LISTING_PHOTO_WIDTHS = (200, 400, 800, 1200)
+LISTING_PHOTO_QUALITY = 80
+PHOTO_VARIANT_WORKERS = 2
+
+# Broker delivering live listing updates (see auctions/live.py),
+# number of messages queued per subscriber and interval (in seconds)
+# of keepalive comments sent on idle event streams.
+
+LIVE_BROKER = 'auctions.live.InMemoryBroker'
+LIVE_QUEUE_SIZE = 16
+LIVE_KEEPALIVE = 15
+
+# Serves read-heavy pages with async views (auctions/async_views.py),
+# enabled by commerce/asgi.py, as under WSGI they would only add overhead.
+
+ASYNC_READ_VIEWS = os.environ.get('AUCTIONS_ASYNC_READ_VIEWS') == '1'
+
+# Session backend, one of:
+# 'db' - every request reads session from database,
+# 'cached_db' - sessions are read from cache, writes go through to database,
+# 'signed_cookies' - session is kept in signed cookie, database is never touched
+#   (but session cannot be revoked on server before it expires).
+# Expired database sessions are removed with 'python manage.py purge_sessions'.
+# 'cached_db' needs shared cache (see SHARED_CACHE), otherwise session ended
+# by logout in one worker would stay valid in cache of the others.
+
+SESSION_MODE = os.environ.get('AUCTIONS_SESSION_MODE', 'db')
+SESSION_ENGINE = {
+    'db': 'django.contrib.sessions.backends.db',
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+    'signed_cookies': 'django.contrib.sessions.backends.signed_cookies',
+}[SESSION_MODE]
+
+if SESSION_MODE == 'cached_db' and not SHARED_CACHE:
+    raise ImproperlyConfigured("AUCTIONS_SESSION_MODE=cached_db requires shared cache, set AUCTIONS_CACHE_DIR.")
+
+# Flashed messages are kept in cookie, so they never write session.
+
+MESSAGE_STORAGE = 'django.contrib.messages.storage.cookie.CookieStorage'
+
+# Measures SQL queries, template rendering and total time of every request
+# (see auctions/timing.py): sent in Server-Timing header, kept in ring buffer
+# of given size (summary at /timing for staff) and optionally appended
+# to JSON Lines file. Server-Timing reveals query counts to every client,
+# so it is on only in development, unless AUCTIONS_REQUEST_TIMING says otherwise.
+
+REQUEST_TIMING = os.environ.get('AUCTIONS_REQUEST_TIMING', '1' if DEBUG else '0') == '1'
+REQUEST_TIMING_BUFFER_SIZE = 1000
+REQUEST_TIMING_LOG = None
+
+# Time (in seconds) numbers of open listings per category are cached (see auctions/categories.py).
+# Categories themselves are reloaded at least this often, so processes which
+# don't share cache with the one that changed them catch up.
+
+CATEGORY_COUNTS_TIMEOUT = 60
+CATEGORY_REGISTRY_TIMEOUT = 60
+
+# SQLite production mode, turned on with AUCTIONS_SQLITE_PRODUCTION=1:
+# pragmas set on every new connection (see auctions/sqlite.py),
+# transactions started with BEGIN IMMEDIATE (see auctions/backends/sqlite3)
+# and connections kept open between requests.
+# Default mode keeps SQLite defaults.
+
+SQLITE_PRODUCTION = os.environ.get('AUCTIONS_SQLITE_PRODUCTION') == '1'
+SQLITE_PRAGMAS = {}
+if SQLITE_PRODUCTION:
+    SQLITE_PRAGMAS = {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'busy_timeout': 5000,
+        'mmap_size': 256 * 1024 * 1024,
+        'cache_size': -64 * 1024,
+    }
+    DATABASES['default']['ENGINE'] = 'auctions.backends.sqlite3'
+    DATABASES['default']['CONN_MAX_AGE'] = 600
+
+# Read replicas (see auctions/routers.py). Reads of requests go to replicas,
+# writes and reads of clients which wrote in last REPLICA_STICKY_SECONDS go to primary.
+# AUCTIONS_REPLICA_DATABASES lists comma separated SQLite files standing in
+# for replicas locally, refreshed from primary with 'python manage.py sync_replicas'.
+# Tests read replicas' data from primary (TEST MIRROR).
+
+DATABASE_REPLICAS = []
+for index, path in enumerate(filter(None, os.environ.get('AUCTIONS_REPLICA_DATABASES', '').split(',')), 1):
+    DATABASES[f'replica{index}'] = {
+        **DATABASES['default'],
+        'NAME': path,
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(f'replica{index}')
+
+DATABASE_ROUTERS = ['auctions.routers.ReplicaRouter']
+REPLICA_STICKY_SECONDS = 5
+REPLICA_STICKY_COOKIE = 'primary'